@@ -1,3 +1,50 @@
-from django.contrib import admin
+from collections import defaultdict
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from .instrumentacion import limpiar_registros, registros_recientes
+from .trazas import reiniciar_tramos, resumen_tramos
 
-# Register your models here.
+
+def instrumentacion_sql(request):
+    """
+    Consultas SQL de las últimas peticiones de este proceso (búfer de
+    InstrumentacionSQLMiddleware) y duraciones de los tramos (core.trazas)
+    """
+    if request.method == 'POST':
+        limpiar_registros()
+        reiniciar_tramos()
+        messages.success(request, 'Registros de instrumentación SQL y tramos vaciados.')
+        return redirect('instrumentacion_sql')
+
+    registros = registros_recientes()
+
+    # Promedios por vista, de la que más consultas hace a la que menos
+    por_vista = defaultdict(list)
+    for registro in registros:
+        por_vista[registro['vista'] or registro['ruta']].append(registro)
+    vistas = sorted(
+        (
+            {
+                'vista': vista,
+                'peticiones': len(filas),
+                'consultas_media': sum(fila['consultas'] for fila in filas) / len(filas),
+                'consultas_max': max(fila['consultas'] for fila in filas),
+                'bd_ms_media': sum(fila['tiempo_bd_ms'] for fila in filas) / len(filas),
+                'total_ms_media': sum(fila['tiempo_total_ms'] for fila in filas) / len(filas),
+                'duplicadas': sum(fila['duplicadas'] for fila in filas),
+            }
+            for vista, filas in por_vista.items()
+        ),
+        key=lambda fila: fila['consultas_media'],
+        reverse=True,
+    )
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Instrumentación SQL',
+        'registros': registros,
+        'vistas': vistas,
+        'tramos': resumen_tramos(),
+    }
+    return TemplateResponse(request, 'admin/instrumentacion_sql.html', context)
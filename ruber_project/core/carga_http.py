@@ -0,0 +1,448 @@
+"""
+Pruebas de carga HTTP de las vistas principales.
+
+Cada proceso de trabajo abre sesiones (una por turista) y repite un
+escenario: una mezcla de pasos con pesos, como el tráfico real (muchos
+listados y detalles, menos generación). Dos modos:
+
+- cliente: el cliente de pruebas de Django dentro del proceso, sin red;
+  cuenta las consultas SQL de cada petición.
+- servidor: peticiones HTTP a un servidor en marcha (runserver, gunicorn),
+  con inicio de sesión real por el formulario de login; las consultas se
+  leen de la cabecera X-Consultas-SQL si el servidor corre con DEBUG.
+
+Los ids de destinos, categorías e itinerarios salen de la base de datos
+antes de empezar (en modo servidor se asume la misma base que el servidor).
+Este módulo no importa modelos al cargarse: los procesos de trabajo
+configuran Django por su cuenta (ver inicializar_worker).
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+import http.cookiejar
+import itertools
+import random
+import statistics
+import time as reloj
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from core.trazas import Histograma, histogramas, reiniciar_tramos
+
+NOMBRE_TAREAS = 'Prueba de carga'
+MAX_IDS_CONTEXTO = 50000
+
+PALABRAS_BUSQUEDA = ['museo', 'playa', 'mercado', 'parque', 'plaza', 'mirador', 'barranco', 'miraflores',
+                     'arte', 'surf', 'huaca', 'cafe']
+
+
+class Peticion:
+
+    def __init__(self, endpoint, url, metodo='GET', datos=None, ajax=False):
+        self.endpoint = endpoint
+        self.url = url
+        self.metodo = metodo
+        self.datos = datos
+        self.ajax = ajax
+
+
+# ----- Pasos de los escenarios -----
+
+def _destino_popular(rng, contexto):
+    return rng.choices(contexto['destinos'], cum_weights=contexto['acumulados'])[0]
+
+
+def _punto_cercano(rng, contexto):
+    lat, lng = contexto['centro']
+    return lat + rng.uniform(-0.05, 0.05), lng + rng.uniform(-0.05, 0.05)
+
+
+def paso_lista(rng, contexto, sesion):
+    variante = rng.random()
+    if variante < 0.35:
+        parametros = {}
+    elif variante < 0.55:
+        parametros = {'q': rng.choice(PALABRAS_BUSQUEDA)}
+    elif variante < 0.7 and contexto['categorias']:
+        parametros = {'categoria': rng.choice(contexto['categorias'])}
+    elif variante < 0.85:
+        parametros = {'orden': rng.choice(['calificacion', 'precio']), 'dir': rng.choice(['asc', 'desc'])}
+    else:
+        lat, lng = _punto_cercano(rng, contexto)
+        parametros = {'lat': f'{lat:.5f}', 'lng': f'{lng:.5f}', 'radio': rng.choice([2, 5, 10])}
+    consulta = f'?{urllib.parse.urlencode(parametros)}' if parametros else ''
+    return Peticion('lista_destinos', f'/lugares/{consulta}')
+
+
+def paso_detalle(rng, contexto, sesion):
+    return Peticion('detalle_destino', f'/lugares/{_destino_popular(rng, contexto)}/')
+
+
+def paso_mapa(rng, contexto, sesion):
+    return Peticion('mapa_rutas', '/rutas/mapa/')
+
+
+def paso_ruta(rng, contexto, sesion):
+    lat, lng = _punto_cercano(rng, contexto)
+    parametros = {'lat': f'{lat:.5f}', 'lon': f'{lng:.5f}', 'destino': _destino_popular(rng, contexto)}
+    formato = rng.choice(['polyline', 'polyline', 'geojson', None])
+    if formato:
+        parametros['formato'] = formato
+    return Peticion('mapa_rutas:ruta', f'/rutas/mapa/?{urllib.parse.urlencode(parametros)}')
+
+
+def paso_formulario_generar(rng, contexto, sesion):
+    return Peticion('generar_itinerario', '/itinerarios/generar/')
+
+
+def paso_generar(rng, contexto, sesion):
+    inicio = date.today() + timedelta(days=rng.randint(1, 60))
+    datos = {
+        'nombre': NOMBRE_TAREAS,
+        'fecha_inicio': inicio.isoformat(),
+        'fecha_fin': (inicio + timedelta(days=rng.randint(0, 2))).isoformat(),
+    }
+    return Peticion('generar_itinerario:POST', '/itinerarios/generar/', metodo='POST', datos=datos, ajax=True)
+
+
+def paso_itinerario(rng, contexto, sesion):
+    itinerarios = contexto['itinerarios'].get(sesion)
+    if not itinerarios:
+        return paso_formulario_generar(rng, contexto, sesion)
+    return Peticion('detalle_itinerario', f'/itinerarios/{rng.choice(itinerarios)}/')
+
+
+# (peso, paso, requiere sesión)
+ESCENARIOS = {
+    # Visitantes y turistas que exploran el catálogo
+    'navegacion': [
+        (35, paso_lista, False),
+        (35, paso_detalle, False),
+        (5, paso_mapa, False),
+        (10, paso_ruta, False),
+        (10, paso_itinerario, True),
+        (5, paso_formulario_generar, True),
+    ],
+    # Turistas con sesión que arman y revisan su viaje
+    'planificacion': [
+        (15, paso_lista, False),
+        (20, paso_detalle, False),
+        (10, paso_ruta, False),
+        (10, paso_formulario_generar, True),
+        (5, paso_generar, True),
+        (40, paso_itinerario, True),
+    ],
+    # Cálculo de rutas desde el mapa
+    'mapa': [
+        (10, paso_mapa, False),
+        (80, paso_ruta, False),
+        (10, paso_detalle, False),
+    ],
+}
+
+
+def preparar_contexto(usuarios=None, sesiones=1, sesgo=1.0, semilla=42):
+    """
+    Ids que usan los escenarios (se lee de la base antes de lanzar los procesos)
+
+    Args:
+        usuarios: usernames de los turistas con sesión (por defecto los que tienen itinerarios)
+        sesiones: turistas a usar como máximo
+        sesgo: exponente de popularidad de los destinos (0 = todos iguales)
+    """
+    from itinerarios.models import Itinerario
+    from lugares.models import Categoria, Destino
+    from usuarios.models import Turista
+
+    rng = random.Random(semilla)
+    destinos = list(Destino.objects.filter(activo=True).order_by('id').values_list('id', 'latitud', 'longitud'))
+    if len(destinos) > MAX_IDS_CONTEXTO:
+        destinos = rng.sample(destinos, MAX_IDS_CONTEXTO)
+
+    turistas = Turista.objects.filter(is_active=True)
+    if usuarios:
+        turistas = turistas.filter(username__in=usuarios)
+    else:
+        turistas = turistas.filter(itinerarios__isnull=False).distinct()
+    turistas = list(turistas.order_by('id').values_list('id', 'username')[:sesiones])
+
+    itinerarios = defaultdict(list)
+    for turista_id, itinerario_id in Itinerario.objects.filter(
+        turista_id__in=[turista_id for turista_id, _ in turistas]
+    ).order_by('id').values_list('turista_id', 'id'):
+        if len(itinerarios[turista_id]) < 100:
+            itinerarios[turista_id].append(itinerario_id)
+
+    # Popularidad tipo Zipf sobre un orden al azar
+    pesos = [1 / (rango + 1) ** sesgo for rango in range(len(destinos))]
+    rng.shuffle(pesos)
+
+    centro = (
+        (statistics.fmean(float(lat) for _, lat, _ in destinos), statistics.fmean(float(lng) for _, _, lng in destinos))
+        if destinos else (-12.07, -77.04)
+    )
+    return {
+        'destinos': [destino_id for destino_id, _, _ in destinos],
+        'acumulados': list(itertools.accumulate(pesos)),
+        'centro': centro,
+        'categorias': list(Categoria.objects.values_list('id', flat=True)),
+        'turistas': turistas,
+        'itinerarios': {username: itinerarios[turista_id] for turista_id, username in turistas},
+    }
+
+
+def descartar_generaciones(turistas, desde):
+    """
+    Borra las tareas de generación que encoló la prueba (en cualquier
+    estado) y los itinerarios que produjeron, para no dejar datos de la
+    prueba en la base ni trabajo para el worker
+
+    Args:
+        turistas: ids de los turistas con sesión
+        desde: momento en que empezó la prueba
+
+    Returns:
+        (tareas, itinerarios) borrados
+    """
+    from django.db import transaction
+    from itinerarios.models import Itinerario, TareaGeneracion
+
+    tareas = TareaGeneracion.objects.filter(nombre=NOMBRE_TAREAS, turista_id__in=turistas, fecha_creacion__gte=desde)
+    with transaction.atomic():
+        itinerario_ids = list(tareas.filter(itinerario__isnull=False).values_list('itinerario_id', flat=True))
+        _, tareas_borradas = tareas.delete()
+        _, itinerarios_borrados = Itinerario.objects.filter(id__in=itinerario_ids).delete()
+    return (
+        tareas_borradas.get(TareaGeneracion._meta.label, 0),
+        itinerarios_borrados.get(Itinerario._meta.label, 0),
+    )
+
+# ----- Clientes -----
+
+class ClienteDjango:
+    """Cliente de pruebas de Django: sin red, cuenta las consultas SQL"""
+
+    def __init__(self):
+        from django.test import Client
+        # ALLOWED_HOSTS vacío con DEBUG solo acepta localhost
+        self.cliente = Client(SERVER_NAME='localhost', HTTP_ACCEPT_ENCODING='gzip')
+
+    def iniciar_sesion(self, username, password):
+        from usuarios.models import Turista
+        self.cliente.force_login(Turista.objects.get(username=username))
+
+    def pedir(self, peticion):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        extra = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if peticion.ajax else {}
+        with CaptureQueriesContext(connection) as consultas:
+            if peticion.metodo == 'POST':
+                respuesta = self.cliente.post(peticion.url, peticion.datos, **extra)
+            else:
+                respuesta = self.cliente.get(peticion.url, **extra)
+        return respuesta.status_code, len(consultas)
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHTTP:
+    """Peticiones reales a un servidor; la sesión vive en las cookies"""
+
+    def __init__(self, url_base, timeout=30):
+        self.url_base = url_base.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SinRedirecciones()
+        )
+
+    def _csrf(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def iniciar_sesion(self, username, password):
+        # La página de login deja la cookie csrftoken
+        self.pedir(Peticion('login', '/usuarios/login/'))
+        estado, _ = self.pedir(Peticion('login', '/usuarios/login/', metodo='POST',
+                                        datos={'username': username, 'password': password}))
+        if estado != 302 or not any(cookie.name == 'sessionid' for cookie in self.cookies):
+            raise RuntimeError(f'No se pudo iniciar sesión como {username} (HTTP {estado})')
+
+    def pedir(self, peticion):
+        url = self.url_base + peticion.url
+        cabeceras = {'Accept-Encoding': 'gzip', 'Referer': url}
+        datos = None
+        if peticion.ajax:
+            cabeceras['X-Requested-With'] = 'XMLHttpRequest'
+        if peticion.metodo == 'POST':
+            datos = urllib.parse.urlencode({**(peticion.datos or {}), 'csrfmiddlewaretoken': self._csrf()}).encode()
+            cabeceras['X-CSRFToken'] = self._csrf()
+
+        solicitud = urllib.request.Request(url, data=datos, headers=cabeceras, method=peticion.metodo)
+        try:
+            with self.opener.open(solicitud, timeout=self.timeout) as respuesta:
+                respuesta.read()
+                return respuesta.status, self._consultas(respuesta.headers)
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code, self._consultas(error.headers)
+
+    @staticmethod
+    def _consultas(cabeceras):
+        """Consultas SQL informadas por InstrumentacionSQLMiddleware (solo con DEBUG)"""
+        valor = cabeceras.get('X-Consultas-SQL')
+        return int(valor) if valor and valor.isdigit() else None
+
+
+# ----- Procesos de trabajo -----
+
+def inicializar_worker():
+    """Configura Django en el proceso si hace falta (arranque con spawn)"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def ejecutar_worker(parametros):
+    """
+    Un proceso de trabajo: abre su sesión y repite el escenario
+
+    Args:
+        parametros: dict con numero, modo, url, escenario, contexto,
+            sesion (username o None), password, peticiones, duracion,
+            calentamiento y semilla
+
+    Returns:
+        dict con muestras [(endpoint, estado HTTP, milisegundos, consultas o None)],
+        segundos medidos (sin el calentamiento) y tramos: histogramas de
+        core.trazas del proceso (solo en modo cliente; en modo servidor los
+        tramos quedan en el servidor)
+    """
+    inicializar_worker()
+    rng = random.Random(parametros['semilla'] * 1000 + parametros['numero'])
+    contexto = parametros['contexto']
+    sesion = parametros['sesion']
+
+    if parametros['modo'] == 'servidor':
+        cliente = ClienteHTTP(parametros['url'])
+    else:
+        cliente = ClienteDjango()
+    if sesion:
+        cliente.iniciar_sesion(sesion, parametros['password'])
+
+    pasos = [(peso, paso) for peso, paso, requiere_sesion in ESCENARIOS[parametros['escenario']]
+             if sesion or not requiere_sesion]
+    acumulados = list(itertools.accumulate(peso for peso, _ in pasos))
+
+    muestras = []
+    calentamiento = parametros['calentamiento']
+    fin = None
+    inicio_medicion = reloj.perf_counter()
+    for numero in itertools.count():
+        if numero == calentamiento:
+            reiniciar_tramos()
+            inicio_medicion = reloj.perf_counter()
+            fin = inicio_medicion + parametros['duracion'] if parametros['duracion'] else None
+        if fin is None and numero >= calentamiento + parametros['peticiones']:
+            break
+        if fin is not None and reloj.perf_counter() >= fin:
+            break
+
+        _, paso = rng.choices(pasos, cum_weights=acumulados)[0]
+        peticion = paso(rng, contexto, sesion)
+        inicio = reloj.perf_counter()
+        try:
+            estado, consultas = cliente.pedir(peticion)
+        except Exception:
+            estado, consultas = 0, None
+        milisegundos = (reloj.perf_counter() - inicio) * 1000
+
+        # Las primeras peticiones llenan cachés y conexiones: no se miden
+        if numero >= calentamiento:
+            muestras.append((peticion.endpoint, estado, milisegundos, consultas))
+    segundos = reloj.perf_counter() - inicio_medicion
+    tramos = {}
+    if parametros['modo'] == 'cliente':
+        tramos = {nombre: histograma.como_dict() for nombre, histograma in histogramas().items()}
+    return {'muestras': muestras, 'segundos': segundos, 'tramos': tramos}
+
+
+# ----- Reporte -----
+
+def percentiles(tiempos):
+    if len(tiempos) > 1:
+        cortes = statistics.quantiles(tiempos, n=100, method='inclusive')
+        return cortes[49], cortes[94], cortes[98]
+    return tiempos[0], tiempos[0], tiempos[0]
+
+
+def resumir(muestras, segundos):
+    """Peticiones por segundo, latencias, errores y consultas por endpoint (y el total)"""
+    por_endpoint = defaultdict(list)
+    for muestra in muestras:
+        por_endpoint[muestra[0]].append(muestra)
+    por_endpoint['total'] = muestras
+
+    resumen = {}
+    for endpoint, filas in sorted(por_endpoint.items()):
+        if not filas:
+            continue
+        tiempos = [milisegundos for _, _, milisegundos, _ in filas]
+        consultas = [cantidad for _, _, _, cantidad in filas if cantidad is not None]
+        p50, p95, p99 = percentiles(tiempos)
+        resumen[endpoint] = {
+            'peticiones': len(filas),
+            'por_segundo': round(len(filas) / (segundos or 1e-9), 2),
+            'p50_ms': round(p50, 2),
+            'p95_ms': round(p95, 2),
+            'p99_ms': round(p99, 2),
+            'media_ms': round(statistics.fmean(tiempos), 2),
+            # Ningún paso debería recibir 4xx ni 5xx (0 = sin respuesta)
+            'errores': sum(1 for _, estado, _, _ in filas if estado == 0 or estado >= 400),
+            'consultas_media': round(statistics.fmean(consultas), 2) if consultas else None,
+            'consultas_max': max(consultas) if consultas else None,
+        }
+    return resumen
+
+
+def combinar_tramos(resultados):
+    """Suma los histogramas de tramos de todos los procesos: {nombre: resumen}"""
+    combinados = {}
+    for resultado in resultados:
+        for nombre, datos in resultado.get('tramos', {}).items():
+            histograma = Histograma.desde_dict(datos)
+            if nombre in combinados:
+                combinados[nombre].combinar(histograma)
+            else:
+                combinados[nombre] = histograma
+    return {nombre: histograma.resumen() for nombre, histograma in sorted(combinados.items())}
+
+
+def comparar(resumen, base, tolerancia):
+    """
+    Regresiones respecto de un reporte base: latencia p95 o consultas
+    que suben, o peticiones por segundo que bajan, más que la tolerancia
+
+    Returns:
+        lista de mensajes (vacía si no hay regresiones)
+    """
+    regresiones = []
+    for endpoint, actual in resumen.items():
+        anterior = base.get(endpoint)
+        if not anterior:
+            continue
+        if actual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f'{endpoint}: p95 {anterior["p95_ms"]} → {actual["p95_ms"]} ms')
+        if actual['por_segundo'] < anterior['por_segundo'] * (1 - tolerancia):
+            regresiones.append(f'{endpoint}: {anterior["por_segundo"]} → {actual["por_segundo"]} peticiones/s')
+        if (actual['consultas_media'] is not None and anterior.get('consultas_media') is not None
+                and actual['consultas_media'] > anterior['consultas_media'] * (1 + tolerancia)):
+            regresiones.append(
+                f'{endpoint}: {anterior["consultas_media"]} → {actual["consultas_media"]} consultas por petición'
+            )
+    return regresiones
@@ -0,0 +1,144 @@
+"""
+Instrumentación SQL por petición.
+
+InstrumentacionSQLMiddleware envuelve cada consulta con
+connection.execute_wrapper y, al terminar la petición, resume:
+- número de consultas y tiempo total en la base de datos
+- duplicadas: la misma sentencia con los mismos parámetros más de una vez
+- repetidas: la misma sentencia con distintos parámetros muchas veces
+  (el patrón N+1 de un bucle que consulta por fila)
+- las sentencias más lentas
+
+El resumen va a una línea de log (logger 'ruber.sql', clave=valor; nivel
+DEBUG, o WARNING si supera los umbrales), a
+un búfer circular en memoria del proceso (página del admin en
+/admin/instrumentacion-sql/) y, con DEBUG, a cabeceras de la respuesta
+(X-Consultas-SQL, X-Tiempo-BD-ms, X-Consultas-Duplicadas y Server-Timing).
+
+Configuración (settings, opcional):
+    INSTRUMENTACION_SQL_REGISTROS: peticiones guardadas en el búfer (200)
+    INSTRUMENTACION_SQL_LENTAS: sentencias lentas por petición (5)
+    INSTRUMENTACION_SQL_UMBRAL_CONSULTAS: desde aquí el log es WARNING (50)
+    INSTRUMENTACION_SQL_UMBRAL_REPETIDAS: veces para contar una sentencia como N+1 (10)
+"""
+from collections import Counter, deque
+from contextlib import ExitStack
+from datetime import datetime
+import logging
+import threading
+import time as reloj
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('ruber.sql')
+
+MAX_SQL = 500
+
+_registros = deque(maxlen=getattr(settings, 'INSTRUMENTACION_SQL_REGISTROS', 200))
+_lock = threading.Lock()
+
+
+def registros_recientes():
+    """Resúmenes de las últimas peticiones, la más reciente primero"""
+    with _lock:
+        return list(reversed(_registros))
+
+
+def limpiar_registros():
+    with _lock:
+        _registros.clear()
+
+
+class RegistroConsultas:
+    """Consultas de una petición (se llama desde execute_wrapper)"""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = reloj.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            milisegundos = (reloj.perf_counter() - inicio) * 1000
+            self.consultas.append((context['connection'].alias, sql, repr(params), milisegundos))
+
+    def resumen(self, lentas=5, umbral_repetidas=10):
+        identicas = Counter((alias, sql, params) for alias, sql, params, _ in self.consultas)
+        sentencias = Counter((alias, sql) for alias, sql, _, _ in self.consultas)
+        mas_lentas = sorted(self.consultas, key=lambda consulta: consulta[3], reverse=True)[:lentas]
+
+        return {
+            'consultas': len(self.consultas),
+            'tiempo_bd_ms': round(sum(consulta[3] for consulta in self.consultas), 2),
+            'duplicadas': sum(veces - 1 for veces in identicas.values() if veces > 1),
+            'repetidas': [
+                {'sql': sql[:MAX_SQL], 'veces': veces}
+                for (_, sql), veces in sentencias.most_common() if veces >= umbral_repetidas
+            ],
+            'lentas': [
+                {'sql': sql[:MAX_SQL], 'ms': round(milisegundos, 2), 'alias': alias}
+                for alias, sql, _, milisegundos in mas_lentas
+            ],
+        }
+
+
+class InstrumentacionSQLMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lentas = getattr(settings, 'INSTRUMENTACION_SQL_LENTAS', 5)
+        self.umbral_consultas = getattr(settings, 'INSTRUMENTACION_SQL_UMBRAL_CONSULTAS', 50)
+        self.umbral_repetidas = getattr(settings, 'INSTRUMENTACION_SQL_UMBRAL_REPETIDAS', 10)
+
+    def __call__(self, request):
+        registro = RegistroConsultas()
+        inicio = reloj.perf_counter()
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(registro))
+            response = self.get_response(request)
+        total_ms = (reloj.perf_counter() - inicio) * 1000
+
+        resumen = registro.resumen(self.lentas, self.umbral_repetidas)
+        coincidencia = getattr(request, 'resolver_match', None)
+        resumen.update({
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'metodo': request.method,
+            'ruta': request.get_full_path()[:MAX_SQL],
+            'vista': coincidencia.view_name if coincidencia else None,
+            'estado': response.status_code,
+            'tiempo_total_ms': round(total_ms, 2),
+        })
+
+        with _lock:
+            _registros.append(resumen)
+        self._registrar_log(resumen)
+
+        if settings.DEBUG:
+            response['X-Consultas-SQL'] = str(resumen['consultas'])
+            response['X-Tiempo-BD-ms'] = f'{resumen["tiempo_bd_ms"]:.2f}'
+            response['X-Consultas-Duplicadas'] = str(resumen['duplicadas'])
+            response['Server-Timing'] = (
+                f'db;dur={resumen["tiempo_bd_ms"]:.2f};desc="{resumen["consultas"]} consultas", '
+                f'total;dur={total_ms:.2f}'
+            )
+        return response
+
+    def _registrar_log(self, resumen):
+        nivel = logging.DEBUG
+        if resumen['consultas'] >= self.umbral_consultas or resumen['repetidas']:
+            nivel = logging.WARNING
+        if not logger.isEnabledFor(nivel):
+            return
+
+        logger.log(
+            nivel,
+            'sql metodo=%s ruta="%s" vista=%s estado=%s consultas=%s bd_ms=%.2f total_ms=%.2f '
+            'duplicadas=%s repetidas=%s',
+            resumen['metodo'], resumen['ruta'], resumen['vista'], resumen['estado'], resumen['consultas'],
+            resumen['tiempo_bd_ms'], resumen['tiempo_total_ms'], resumen['duplicadas'],
+            sum(repetida['veces'] for repetida in resumen['repetidas']),
+            extra={'sql': resumen},
+        )
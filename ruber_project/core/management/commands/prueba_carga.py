@@ -0,0 +1,168 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from core.carga_http import (
+    ESCENARIOS, combinar_tramos, comparar, descartar_generaciones, ejecutar_worker, inicializar_worker,
+    preparar_contexto, resumir,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de las vistas principales (listado y detalle de destinos, mapa, '
+        'generación y detalle de itinerarios) con el cliente de Django o contra un servidor'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modo', choices=['cliente', 'servidor'], default='cliente',
+                            help='cliente: cliente de pruebas de Django (cuenta consultas); '
+                                 'servidor: HTTP contra --url')
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor en modo servidor')
+        parser.add_argument('--escenario', choices=sorted(ESCENARIOS), default='navegacion')
+        parser.add_argument('--procesos', type=int, default=4, help='Procesos concurrentes (una sesión cada uno)')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones medidas por proceso')
+        parser.add_argument('--duracion', type=float,
+                            help='Segundos de medición por proceso (en lugar de --peticiones)')
+        parser.add_argument('--calentamiento', type=int, default=20,
+                            help='Peticiones iniciales por proceso que no se miden')
+        parser.add_argument('--usuarios', nargs='+',
+                            help='Usernames de los turistas con sesión (por defecto los que tienen itinerarios)')
+        parser.add_argument('--password', default='turista123',
+                            help='Contraseña de los turistas en modo servidor (la de poblar_datos --escala)')
+        parser.add_argument('--sesgo', type=float, default=1.0,
+                            help='Exponente de popularidad de los destinos pedidos (0 = uniforme)')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help='Archivo JSON con el reporte (sirve de base para --base)')
+        parser.add_argument('--base', help='Reporte JSON anterior con el que comparar')
+        parser.add_argument('--tolerancia', type=float, default=0.2,
+                            help='Cambio relativo permitido frente a la base antes de marcar regresión')
+
+    def handle(self, *args, **options):
+        if options['procesos'] < 1:
+            raise CommandError('--procesos debe ser al menos 1')
+        if options['duracion'] is None and options['peticiones'] < 1:
+            raise CommandError('--peticiones debe ser al menos 1')
+
+        base = None
+        if options['base']:
+            try:
+                with open(options['base'], encoding='utf-8') as archivo:
+                    reporte_base = json.load(archivo)
+                base = reporte_base['endpoints']
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f'No se pudo leer el reporte base: {error}')
+            for clave in ('escenario', 'modo', 'procesos'):
+                if reporte_base.get(clave) != options[clave]:
+                    self.stdout.write(self.style.WARNING(
+                        f'⚠️ La base usó {clave}={reporte_base.get(clave)}: la comparación no es directa'
+                    ))
+
+        contexto = preparar_contexto(
+            usuarios=options['usuarios'],
+            sesiones=options['procesos'],
+            sesgo=options['sesgo'],
+            semilla=options['semilla'],
+        )
+        if not contexto['destinos']:
+            raise CommandError('No hay destinos activos (poblar_datos --escala crea un catálogo de prueba)')
+
+        sesiones = [username for _, username in contexto['turistas']]
+        if not sesiones:
+            motivo = 'Ninguno de --usuarios existe' if options['usuarios'] else 'Sin turistas con itinerarios'
+            self.stdout.write(self.style.WARNING(f'⚠️ {motivo}: solo se piden las vistas públicas'))
+
+        medida = f'{options["duracion"]:.0f} s' if options['duracion'] else f'{options["peticiones"]} peticiones'
+        self.stdout.write(
+            f'🚦 Escenario {options["escenario"]} ({options["modo"]}), {options["procesos"]} proceso(s) × {medida}, '
+            f'{len(contexto["destinos"])} destinos, {len(sesiones)} sesión(es)'
+        )
+
+        parametros = [
+            {
+                'numero': numero,
+                'modo': options['modo'],
+                'url': options['url'],
+                'escenario': options['escenario'],
+                'contexto': contexto,
+                'sesion': sesiones[numero % len(sesiones)] if sesiones else None,
+                'password': options['password'],
+                'peticiones': options['peticiones'],
+                'duracion': options['duracion'],
+                'calentamiento': max(0, options['calentamiento']),
+                'semilla': options['semilla'],
+            }
+            for numero in range(options['procesos'])
+        ]
+
+        inicio = timezone.now()
+        try:
+            if options['procesos'] == 1:
+                resultados = [ejecutar_worker(parametros[0])]
+            else:
+                # Cada proceso abre su propia conexión a la base
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=options['procesos'], initializer=inicializar_worker) as pool:
+                    resultados = list(pool.map(ejecutar_worker, parametros))
+        except RuntimeError as error:
+            raise CommandError(f'{error} (revise --usuarios y --password)')
+
+        muestras = [muestra for resultado in resultados for muestra in resultado['muestras']]
+        segundos = max(resultado['segundos'] for resultado in resultados)
+        resumen = resumir(muestras, segundos)
+        tramos = combinar_tramos(resultados)
+        self._mostrar(resumen)
+        if tramos:
+            self._mostrar_tramos(tramos)
+
+        if options['escenario'] == 'planificacion':
+            # Las generaciones de la prueba no deben quedar en la base ni llegar al worker
+            tareas, itinerarios = descartar_generaciones([turista_id for turista_id, _ in contexto['turistas']], inicio)
+            if tareas:
+                self.stdout.write(f'\n🧹 {tareas} tareas de generación y {itinerarios} itinerarios de la prueba descartados')
+
+        if options['salida']:
+            reporte = {
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'modo': options['modo'],
+                'escenario': options['escenario'],
+                'procesos': options['procesos'],
+                'semilla': options['semilla'],
+                'segundos': round(segundos, 2),
+                'endpoints': resumen,
+                'tramos': tramos,
+            }
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f'\n📄 Reporte guardado en {options["salida"]}')
+
+        if base is not None:
+            regresiones = comparar(resumen, base, options['tolerancia'])
+            if regresiones:
+                for regresion in regresiones:
+                    self.stdout.write(self.style.WARNING(f'  ⚠️ {regresion}'))
+                raise CommandError(f'{len(regresiones)} regresión(es) frente a {options["base"]}')
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Sin regresiones frente a {options["base"]}'))
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Prueba de carga completada'))
+
+    def _mostrar(self, resumen):
+        self.stdout.write(f'\n  {"endpoint":<26} {"pet.":>6} {"pet/s":>8} {"p50/p95/p99 ms":>24} '
+                          f'{"errores":>8} {"consultas":>10}')
+        for endpoint, fila in resumen.items():
+            consultas = f'{fila["consultas_media"]:.1f}' if fila['consultas_media'] is not None else '-'
+            self.stdout.write(
+                f'  {endpoint:<26} {fila["peticiones"]:>6} {fila["por_segundo"]:>8.1f} '
+                f'{fila["p50_ms"]:>9.1f}/{fila["p95_ms"]:.1f}/{fila["p99_ms"]:.1f} '
+                f'{fila["errores"]:>8} {consultas:>10}'
+            )
+
+    def _mostrar_tramos(self, tramos):
+        self.stdout.write(f'\n  {"tramo":<26} {"veces":>6} {"media ms":>9} {"p50/p95/p99 ms (≤)":>24} {"máx. ms":>9}')
+        for nombre, fila in tramos.items():
+            self.stdout.write(
+                f'  {nombre:<26} {fila["cantidad"]:>6} {fila["media_ms"]:>9.2f} '
+                f'{fila["p50_ms"]:>9.2f}/{fila["p95_ms"]:.2f}/{fila["p99_ms"]:.2f} {fila["max_ms"]:>9.2f}'
+            )
@@ -112,4 +112,54 @@ function showLoading() {
 function hideLoading() {
     const overlay = document.getElementById('loading-overlay');
     if (overlay) overlay.remove();
-}
\ No newline at end of file
+}
+// Autocompletado de búsqueda: <input data-autocompletar="URL del endpoint">
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-autocompletar]').forEach(input => {
+        const lista = document.createElement('div');
+        lista.className = 'list-group position-absolute w-100 shadow-sm text-start';
+        lista.style.zIndex = 1050;
+        lista.style.top = '100%';
+        input.parentElement.style.position = 'relative';
+        input.parentElement.appendChild(lista);
+        input.setAttribute('autocomplete', 'off');
+        
+        let temporizador = null;
+        let ultimaConsulta = '';
+        
+        input.addEventListener('input', function() {
+            clearTimeout(temporizador);
+            const texto = input.value.trim();
+            if (!texto) {
+                lista.innerHTML = '';
+                return;
+            }
+            
+            temporizador = setTimeout(() => {
+                ultimaConsulta = texto;
+                fetch(`${input.dataset.autocompletar}?q=${encodeURIComponent(texto)}`)
+                    .then(r => r.json())
+                    .then(datos => {
+                        // Ignorar respuestas de consultas anteriores
+                        if (datos.q !== ultimaConsulta) return;
+                        lista.innerHTML = '';
+                        datos.sugerencias.forEach(s => {
+                            const item = document.createElement('a');
+                            item.href = s.url;
+                            item.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center';
+                            const icono = s.tipo === 'categoria' ? 'fa-tags' : 'fa-map-marker-alt';
+                            item.innerHTML = `<span><i class="fas ${icono} me-2 text-muted"></i></span>` +
+                                `<small class="text-warning"><i class="fas fa-star"></i> ${s.calificacion.toFixed(1)}</small>`;
+                            item.querySelector('span').append(s.nombre);
+                            lista.appendChild(item);
+                        });
+                    })
+                    .catch(() => { lista.innerHTML = ''; });
+            }, 120);
+        });
+        
+        document.addEventListener('click', function(e) {
+            if (e.target !== input && !lista.contains(e.target)) lista.innerHTML = '';
+        });
+    });
+});
@@ -1,3 +1,200 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from itinerarios.models import Itinerario, TareaGeneracion
+from lugares.models import Categoria, Destino
+from usuarios.models import Turista
+from .carga_http import NOMBRE_TAREAS, comparar, descartar_generaciones, percentiles, resumir
+from .instrumentacion import limpiar_registros, registros_recientes
+from .trazas import Histograma, reiniciar_tramos, resumen_tramos, tramo
 
-# Create your tests here.
+
+class InstrumentacionSQLTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Museos')
+        for numero in range(3):
+            Destino.objects.create(
+                nombre=f'Museo {numero}', descripcion='Museo', categoria=categoria,
+                latitud=-12.05, longitud=-77.04, tiempo_visita_estimado=60,
+            )
+
+    def setUp(self):
+        limpiar_registros()
+
+    @override_settings(DEBUG=True)
+    def test_cabeceras_y_bufer_cuentan_las_consultas_de_la_peticion(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(reverse('lugares:lista_destinos'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['X-Consultas-SQL']), len(capturadas))
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        registro = registros_recientes()[0]
+        self.assertEqual(registro['vista'], 'lugares:lista_destinos')
+        self.assertEqual(registro['consultas'], len(capturadas))
+        self.assertLessEqual(len(registro['lentas']), 5)
+
+    def test_sin_debug_no_hay_cabeceras(self):
+        response = self.client.get(reverse('lugares:lista_destinos'))
+        self.assertNotIn('X-Consultas-SQL', response)
+        self.assertEqual(len(registros_recientes()), 1)
+
+    def test_pagina_del_admin(self):
+        admin = Turista.objects.create_superuser('admin', 'admin@ejemplo.com', 'clave-admin')
+        self.client.get(reverse('lugares:lista_destinos'))
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse('instrumentacion_sql'))
+        self.assertContains(response, 'lugares:lista_destinos')
+
+        response = self.client.post(reverse('instrumentacion_sql'))
+        self.assertRedirects(response, reverse('instrumentacion_sql'), fetch_redirect_response=False)
+        # Solo queda la petición que vació el búfer
+        self.assertEqual([registro['vista'] for registro in registros_recientes()], ['instrumentacion_sql'])
+
+
+class TrazasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Playas')
+        for numero in range(4):
+            Destino.objects.create(
+                nombre=f'Playa {numero}', descripcion='Playa', categoria=categoria,
+                latitud=-12.1, longitud=-77.03, tiempo_visita_estimado=90,
+                tags_preferencias=['playa'],
+            )
+
+    def setUp(self):
+        # Las vistas públicas pueden venir de la caché de páginas de otra prueba
+        cache.clear()
+        reiniciar_tramos()
+
+    def test_histograma_acota_percentiles_por_cubeta(self):
+        histograma = Histograma()
+        for milisegundos in [0.05, 0.3, 0.3, 4, 4, 4, 4, 4, 40, 12000]:
+            histograma.registrar(milisegundos)
+
+        resumen = histograma.resumen()
+        self.assertEqual(resumen['cantidad'], 10)
+        self.assertEqual(resumen['p50_ms'], 5)
+        self.assertEqual(resumen['p95_ms'], 12000)
+        self.assertEqual(resumen['min_ms'], 0.05)
+
+        otro = Histograma.desde_dict(histograma.como_dict())
+        otro.combinar(histograma)
+        self.assertEqual(otro.resumen()['cantidad'], 20)
+        self.assertEqual(otro.resumen()['p50_ms'], 5)
+
+    def test_vistas_registran_tramos_con_nombre(self):
+        self.client.get(reverse('lugares:lista_destinos'))
+        destino = Destino.objects.first()
+        self.client.get(reverse('lugares:detalle_destino', args=[destino.id]))
+
+        tramos = resumen_tramos()
+        self.assertEqual(tramos['arbol_rb.construir']['cantidad'], 1)
+        self.assertEqual(tramos['recomendaciones.grafo']['cantidad'], 1)
+        self.assertEqual(tramos['recomendaciones.seleccion']['cantidad'], 1)
+
+    @override_settings(TRAZAS_ACTIVAS=False)
+    def test_desactivadas_no_miden(self):
+        with tramo('prueba') as medicion:
+            medicion.anotar(filas=1)
+        self.client.get(reverse('lugares:lista_destinos'))
+        self.assertEqual(resumen_tramos(), {})
+
+    def test_diagnostico_solo_si_se_activa(self):
+        response = self.client.get(reverse('lugares:lista_destinos'))
+        self.assertNotIn('visualizacion', response.context['info_arbol'])
+
+        with override_settings(TRAZAS_DIAGNOSTICO=True), self.assertLogs('ruber.diagnostico', 'DEBUG') as logs:
+            response = self.client.get(reverse('lugares:lista_destinos') + '?orden=calificacion')
+        self.assertIn('visualizacion', response.context['info_arbol'])
+        self.assertIn('valido=True', logs.output[0])
+
+
+class ReporteCargaTests(SimpleTestCase):
+
+    def test_percentiles(self):
+        self.assertEqual(percentiles([7.0]), (7.0, 7.0, 7.0))
+        p50, p95, p99 = percentiles([float(ms) for ms in range(1, 101)])
+        self.assertAlmostEqual(p50, 50.5)
+        self.assertAlmostEqual(p95, 95.05)
+        self.assertAlmostEqual(p99, 99.01)
+
+    def test_resumir_por_endpoint(self):
+        # (endpoint, estado, ms, consultas)
+        muestras = [
+            ('lista', 200, 10.0, 5), ('lista', 200, 30.0, 7),
+            ('detalle', 404, 50.0, None), ('detalle', 0, 70.0, None),
+        ]
+        resumen = resumir(muestras, segundos=2)
+        self.assertEqual(list(resumen), ['detalle', 'lista', 'total'])
+        self.assertEqual(resumen['lista']['peticiones'], 2)
+        self.assertEqual(resumen['lista']['por_segundo'], 1.0)
+        self.assertEqual(resumen['lista']['errores'], 0)
+        self.assertEqual((resumen['lista']['consultas_media'], resumen['lista']['consultas_max']), (6, 7))
+        self.assertEqual(resumen['detalle']['errores'], 2)
+        self.assertIsNone(resumen['detalle']['consultas_media'])
+        self.assertEqual(resumen['total']['peticiones'], 4)
+        self.assertEqual(resumen['total']['media_ms'], 40.0)
+
+    def test_comparar_con_la_base(self):
+        base = {
+            'lista': {'p95_ms': 100.0, 'por_segundo': 50.0, 'consultas_media': 4.0},
+            'detalle': {'p95_ms': 100.0, 'por_segundo': 50.0, 'consultas_media': None},
+        }
+        dentro = {
+            'lista': {'p95_ms': 109.0, 'por_segundo': 46.0, 'consultas_media': 4.4},
+            'detalle': {'p95_ms': 90.0, 'por_segundo': 60.0, 'consultas_media': 12.0},
+            # Endpoints nuevos no se comparan
+            'mapa': {'p95_ms': 900.0, 'por_segundo': 1.0, 'consultas_media': 30.0},
+        }
+        self.assertEqual(comparar(dentro, base, 0.1), [])
+
+        peor = {'lista': {'p95_ms': 111.0, 'por_segundo': 44.0, 'consultas_media': 4.5}}
+        regresiones = comparar(peor, base, 0.1)
+        self.assertEqual(len(regresiones), 3)
+        self.assertTrue(regresiones[0].startswith('lista: p95 100.0 → 111.0'))
+        self.assertIn('peticiones/s', regresiones[1])
+        self.assertIn('consultas por petición', regresiones[2])
+
+        # Con más tolerancia lo mismo ya no es regresión
+        self.assertEqual(comparar(peor, base, 0.2), [])
+
+
+class DescartarGeneracionesTests(TestCase):
+
+    def test_borra_las_tareas_de_la_prueba_en_todo_estado_y_sus_itinerarios(self):
+        turista = Turista.objects.create_user(username='carga', password='clave-segura')
+        otro = Turista.objects.create_user(username='real', password='clave-segura')
+        antes = timezone.now() - timedelta(hours=1)
+        fechas = {'fecha_inicio': date(2025, 5, 1), 'fecha_fin': date(2025, 5, 2)}
+
+        def tarea(turista, nombre=NOMBRE_TAREAS, estado='pendiente', con_itinerario=False):
+            itinerario = Itinerario.objects.create(turista=turista, nombre=nombre, **fechas) if con_itinerario else None
+            return TareaGeneracion.objects.create(
+                turista=turista, nombre=nombre, estado=estado, itinerario=itinerario, **fechas
+            )
+
+        vieja = tarea(turista, estado='completada', con_itinerario=True)
+        TareaGeneracion.objects.filter(id=vieja.id).update(fecha_creacion=antes - timedelta(minutes=1))
+        ajenas = [tarea(otro, con_itinerario=True, estado='completada'), tarea(turista, nombre='Vacaciones')]
+        for estado in ('pendiente', 'en_proceso', 'error'):
+            tarea(turista, estado=estado)
+        tarea(turista, estado='completada', con_itinerario=True)
+
+        self.assertEqual(descartar_generaciones([turista.id], antes), (4, 1))
+        self.assertEqual(
+            set(TareaGeneracion.objects.values_list('id', flat=True)), {vieja.id, *(t.id for t in ajenas)}
+        )
+        self.assertEqual(
+            set(Itinerario.objects.values_list('id', flat=True)), {vieja.itinerario_id, ajenas[0].itinerario_id}
+        )
@@ -0,0 +1,196 @@
+"""
+Tramos con nombre para medir las partes caras de una petición.
+
+    with tramo('recomendaciones.grafo') as t:
+        ...
+        t.anotar(nodos=len(destinos))
+
+Cada tramo suma su duración a un histograma por nombre (cubetas
+logarítmicas en ms, en memoria del proceso) y, si el logger
+'ruber.trazas' acepta DEBUG, escribe una línea clave=valor con sus
+atributos. Los atributos se pasan ya calculados: solo valores baratos
+(len(), contadores); lo que cuesta calcular va detrás de
+diagnostico_activo().
+
+Los histogramas se ven en /admin/instrumentacion-sql/ y, sumados por
+proceso, en el reporte de prueba_carga.
+
+Configuración (settings, opcional):
+    TRAZAS_ACTIVAS: con False tramo() devuelve un objeto vacío y no mide nada (True)
+    TRAZAS_DIAGNOSTICO: comprobaciones caras de depuración, como verificar
+        las propiedades del árbol Rojo-Negro en cada listado (False)
+"""
+from bisect import bisect_left
+import logging
+import math
+import threading
+import time as reloj
+
+from django.conf import settings
+
+logger = logging.getLogger('ruber.trazas')
+
+# Límite superior (ms) de cada cubeta; la última cubeta recoge lo que pase de 10 s
+LIMITES_MS = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+)
+
+_histogramas = {}
+_lock = threading.Lock()
+
+
+def trazas_activas():
+    return getattr(settings, 'TRAZAS_ACTIVAS', True)
+
+
+def diagnostico_activo():
+    """True si se deben ejecutar las comprobaciones caras de depuración"""
+    return getattr(settings, 'TRAZAS_DIAGNOSTICO', False)
+
+
+class Histograma:
+    """Duraciones de un tramo agrupadas en las cubetas de LIMITES_MS"""
+
+    __slots__ = ('cubetas', 'cantidad', 'suma', 'minimo', 'maximo')
+
+    def __init__(self):
+        self.cubetas = [0] * (len(LIMITES_MS) + 1)
+        self.cantidad = 0
+        self.suma = 0.0
+        self.minimo = math.inf
+        self.maximo = 0.0
+
+    def registrar(self, milisegundos):
+        self.cubetas[bisect_left(LIMITES_MS, milisegundos)] += 1
+        self.cantidad += 1
+        self.suma += milisegundos
+        self.minimo = min(self.minimo, milisegundos)
+        self.maximo = max(self.maximo, milisegundos)
+
+    def combinar(self, otro):
+        """Suma otro histograma (p. ej. el de otro proceso) a este"""
+        self.cubetas = [a + b for a, b in zip(self.cubetas, otro.cubetas)]
+        self.cantidad += otro.cantidad
+        self.suma += otro.suma
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+
+    def percentil(self, p):
+        """
+        Cota superior de la cubeta donde cae el percentil p (0-100),
+        acotada por el máximo observado
+        """
+        if not self.cantidad:
+            return 0.0
+        objetivo = math.ceil(self.cantidad * p / 100) or 1
+        acumulado = 0
+        for indice, veces in enumerate(self.cubetas):
+            acumulado += veces
+            if acumulado >= objetivo:
+                limite = LIMITES_MS[indice] if indice < len(LIMITES_MS) else self.maximo
+                return min(limite, self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        return {
+            'cantidad': self.cantidad,
+            'total_ms': round(self.suma, 2),
+            'media_ms': round(self.suma / self.cantidad, 3) if self.cantidad else 0.0,
+            'min_ms': round(self.minimo, 3) if self.cantidad else 0.0,
+            'max_ms': round(self.maximo, 3),
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+        }
+
+    def como_dict(self):
+        """Forma serializable (para devolverlo desde otro proceso)"""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        histograma = cls()
+        for slot in cls.__slots__:
+            setattr(histograma, slot, datos[slot])
+        return histograma
+
+
+def _registrar(nombre, milisegundos):
+    with _lock:
+        histograma = _histogramas.get(nombre)
+        if histograma is None:
+            histograma = _histogramas[nombre] = Histograma()
+        histograma.registrar(milisegundos)
+
+
+def histogramas():
+    """Copia de los histogramas del proceso, {nombre: Histograma}"""
+    with _lock:
+        return {nombre: Histograma.desde_dict(h.como_dict()) for nombre, h in sorted(_histogramas.items())}
+
+
+def resumen_tramos():
+    """{nombre: resumen} de los tramos medidos en el proceso"""
+    return {nombre: histograma.resumen() for nombre, histograma in histogramas().items()}
+
+
+def reiniciar_tramos():
+    with _lock:
+        _histogramas.clear()
+
+
+class Tramo:
+
+    __slots__ = ('nombre', 'atributos', 'inicio', 'milisegundos')
+
+    def __init__(self, nombre, atributos):
+        self.nombre = nombre
+        self.atributos = atributos
+        self.milisegundos = None
+
+    def anotar(self, **atributos):
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        self.inicio = reloj.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.milisegundos = (reloj.perf_counter() - self.inicio) * 1000
+        _registrar(self.nombre, self.milisegundos)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            if tipo is not None:
+                self.atributos['error'] = tipo.__name__
+            detalle = ''.join(f' {clave}={valor}' for clave, valor in self.atributos.items())
+            logger.debug(
+                'tramo nombre=%s ms=%.2f%s', self.nombre, self.milisegundos, detalle,
+                extra={'tramo': {'nombre': self.nombre, 'ms': self.milisegundos, **self.atributos}},
+            )
+        return False
+
+
+class _TramoInactivo:
+    """El que devuelve tramo() con TRAZAS_ACTIVAS = False: no mide nada"""
+
+    __slots__ = ()
+    milisegundos = None
+
+    def anotar(self, **atributos):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        return False
+
+
+_TRAMO_INACTIVO = _TramoInactivo()
+
+
+def tramo(nombre, **atributos):
+    """Context manager que mide un tramo con nombre (ver el docstring del módulo)"""
+    if not trazas_activas():
+        return _TRAMO_INACTIVO
+    return Tramo(nombre, atributos)
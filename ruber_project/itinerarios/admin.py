@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Itinerario, ItemItinerario
+from .models import Itinerario, ItemItinerario, TareaGeneracion
 
 class ItemItinerarioInline(admin.TabularInline):
     model = ItemItinerario
@@ -30,6 +30,14 @@ class ItinerarioAdmin(admin.ModelAdmin):
 
 @admin.register(ItemItinerario)
 class ItemItinerarioAdmin(admin.ModelAdmin):
-    list_display = ['itinerario', 'destino', 'dia', 'orden', 'hora_inicio', 'hora_fin']
+    list_display = ['itinerario', 'destino', 'dia', 'orden', 'hora_inicio', 'hora_fin', 'costo', 'duracion_minutos']
     list_filter = ['dia', 'itinerario']
-    search_fields = ['destino__nombre', 'itinerario__nombre']
\ No newline at end of file
+    search_fields = ['destino__nombre', 'itinerario__nombre']
+
+
+@admin.register(TareaGeneracion)
+class TareaGeneracionAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'turista', 'estado', 'intentos', 'itinerario', 'fecha_creacion', 'fecha_fin_proceso']
+    list_filter = ['estado', 'fecha_creacion']
+    search_fields = ['nombre', 'turista__username']
+    readonly_fields = ['fecha_creacion', 'fecha_inicio_proceso', 'fecha_fin_proceso']
@@ -0,0 +1,310 @@
+from datetime import time
+
+from django.db import transaction
+from django.db.models import Max
+from lugares.red_black_tree import ArbolRojoNegro, Color, Nodo
+from .generators import GeneradorItinerarios
+from .models import ItemItinerario
+
+
+class ConflictoHorario(Exception):
+    """Un horario que no se puede reservar en el día pedido"""
+
+
+def a_minutos(hora):
+    """Minutos desde la medianoche"""
+    return hora.hour * 60 + hora.minute
+
+
+def a_hora(minutos):
+    """Inversa de a_minutos"""
+    return time(minutos // 60, minutos % 60)
+
+
+class NodoIntervalo(Nodo):
+
+    def __init__(self, inicio, fin, clave, color=Color.RED):
+        super().__init__(None, color)
+        self.inicio = inicio
+        self.fin = fin
+        self.clave = clave
+        self.max_fin = fin  # mayor fin del subárbol (aumento del árbol de intervalos)
+
+    def __repr__(self):
+        color_str = "🔴" if self.color == Color.RED else "⚫"
+        return f"{color_str} [{self.inicio}, {self.fin}) #{self.clave}"
+
+
+class ArbolIntervalos(ArbolRojoNegro):
+    """
+    Árbol rojo-negro de intervalos [inicio, fin) ordenado por inicio y
+    aumentado con el mayor fin de cada subárbol: insertar, eliminar y
+    detectar un solapamiento cuestan O(log n). El balanceo es el de
+    ArbolRojoNegro; aquí solo se mantiene max_fin
+    """
+
+    def __init__(self):
+        super().__init__(criterio='inicio')
+        self.NIL = NodoIntervalo(0, float('-inf'), None, Color.BLACK)
+        self.raiz = self.NIL
+        self._nodos = {}
+
+    def __len__(self):
+        return len(self._nodos)
+
+    def __contains__(self, clave):
+        return clave in self._nodos
+
+    def __iter__(self):
+        """Intervalos (inicio, fin, clave) en orden de inicio"""
+        nodo = self._minimo(self.raiz) if self.raiz != self.NIL else None
+        while nodo is not None:
+            yield nodo.inicio, nodo.fin, nodo.clave
+            nodo = self._sucesor(nodo)
+
+    def intervalo(self, clave):
+        nodo = self._nodos[clave]
+        return nodo.inicio, nodo.fin
+
+    def insertar(self, inicio, fin, clave):
+        """Agrega (o reemplaza) el intervalo identificado por clave"""
+        if clave in self._nodos:
+            self.eliminar(clave)
+
+        nuevo = NodoIntervalo(inicio, fin, clave)
+        self._nodos[clave] = nuevo
+        self._insertar_nodo(nuevo)
+        self._actualizar_hasta_raiz(nuevo)
+
+    def eliminar(self, clave):
+        """Quita el intervalo identificado por clave (si existe)"""
+        nodo = self._nodos.pop(clave, None)
+        if nodo is not None:
+            self._eliminar_nodo(nodo)
+
+    def buscar_solapado(self, inicio, fin):
+        """Clave de algún intervalo que se solapa con [inicio, fin), o None (O(log n))"""
+        actual = self.raiz
+        while actual != self.NIL and not (actual.inicio < fin and inicio < actual.fin):
+            if actual.izquierdo != self.NIL and actual.izquierdo.max_fin > inicio:
+                actual = actual.izquierdo
+            else:
+                actual = actual.derecho
+        return actual.clave if actual != self.NIL else None
+
+    def solapados(self, inicio, fin):
+        """Todos los intervalos que se solapan con [inicio, fin), en orden (O(k log n))"""
+        resultado = []
+        self._solapados_recursivo(self.raiz, inicio, fin, resultado)
+        return resultado
+
+    def siguientes(self, clave):
+        """Intervalos posteriores al de clave, en orden"""
+        nodo = self._sucesor(self._nodos[clave])
+        while nodo is not None:
+            yield nodo.inicio, nodo.fin, nodo.clave
+            nodo = self._sucesor(nodo)
+
+    def _solapados_recursivo(self, nodo, inicio, fin, resultado):
+        if nodo == self.NIL or nodo.max_fin <= inicio:
+            return
+        self._solapados_recursivo(nodo.izquierdo, inicio, fin, resultado)
+        if nodo.inicio < fin:
+            if inicio < nodo.fin:
+                resultado.append((nodo.inicio, nodo.fin, nodo.clave))
+            self._solapados_recursivo(nodo.derecho, inicio, fin, resultado)
+
+    def _menor(self, nodo, otro):
+        return (nodo.inicio, nodo.clave) < (otro.inicio, otro.clave)
+
+    def _actualizar(self, nodo):
+        nodo.max_fin = max(nodo.fin, nodo.izquierdo.max_fin, nodo.derecho.max_fin)
+
+
+class AgendaItinerario:
+    """
+    Horarios reservados de un itinerario, con un árbol de intervalos por
+    día que se carga solo para los días que se tocan
+
+    - reprogramar(): valida el nuevo horario de un item y desplaza las
+      actividades posteriores del mismo día si quedan solapadas
+    - mejor_hueco(): primer horario libre donde cabe una actividad nueva
+    """
+
+    INICIO_JORNADA = a_minutos(time(9, 0))
+    FIN_JORNADA = a_minutos(time(22, 0))
+    BUFFER = GeneradorItinerarios.TIEMPO_BUFFER
+
+    def __init__(self, itinerario):
+        self.itinerario = itinerario
+        self._dias = {}
+        self._items = {}
+
+    def dia(self, dia):
+        """Árbol de intervalos del día (una consulta la primera vez)"""
+        if dia not in self._dias:
+            self._cargar_dias([dia])
+        return self._dias[dia]
+
+    def conflictos(self, dia, hora_inicio, hora_fin, excluir=None):
+        """Items del día que se solapan con el horario dado"""
+        return [
+            self._items[clave]
+            for _, _, clave in self.dia(dia).solapados(a_minutos(hora_inicio), a_minutos(hora_fin))
+            if clave != excluir
+        ]
+
+    def sugerir_hueco(self, dia, duracion, excluir=None):
+        """
+        Primer horario de la jornada donde cabe una actividad de
+        `duracion` minutos, dejando BUFFER minutos con las vecinas
+
+        Returns:
+            (hora_inicio, hora_fin) o None si el día está lleno
+        """
+        inicio = self.INICIO_JORNADA
+        for inicio_ocupado, fin_ocupado, clave in self.dia(dia):
+            if clave == excluir:
+                continue
+            if inicio + duracion + self.BUFFER <= inicio_ocupado:
+                break
+            inicio = max(inicio, fin_ocupado + self.BUFFER)
+
+        if inicio + duracion > self.FIN_JORNADA:
+            return None
+        return a_hora(inicio), a_hora(inicio + duracion)
+
+    def dias_viaje(self):
+        """Cantidad de días entre fecha_inicio y fecha_fin (al menos 1)"""
+        return max(1, (self.itinerario.fecha_fin - self.itinerario.fecha_inicio).days + 1)
+
+    def mejor_hueco(self, duracion):
+        """
+        Horario para una actividad nueva: el primer hueco desde el último
+        día con actividades; si no queda espacio, al inicio del día siguiente
+
+        Raises:
+            ConflictoHorario: si la actividad no cabe en una jornada o si no
+                queda espacio antes de fecha_fin
+
+        Returns:
+            (dia, hora_inicio, hora_fin)
+        """
+        if duracion > self.FIN_JORNADA - self.INICIO_JORNADA:
+            raise ConflictoHorario(
+                f'Una actividad de {duracion} min no cabe en la jornada '
+                f'({a_hora(self.INICIO_JORNADA):%H:%M}-{a_hora(self.FIN_JORNADA):%H:%M})'
+            )
+
+        ultimo_dia = self.itinerario.items.aggregate(ultimo=Max('dia'))['ultimo'] or 1
+        dias = self.dias_viaje()
+
+        if ultimo_dia <= dias:
+            hueco = self.sugerir_hueco(ultimo_dia, duracion)
+            if hueco:
+                return (ultimo_dia, *hueco)
+
+        if ultimo_dia + 1 > dias:
+            raise ConflictoHorario(
+                f'No queda espacio en el itinerario hasta el {self.itinerario.fecha_fin:%d/%m/%Y}; '
+                f'extiende las fechas o quita alguna actividad'
+            )
+        inicio = self.INICIO_JORNADA
+        return ultimo_dia + 1, a_hora(inicio), a_hora(inicio + duracion)
+
+    def reprogramar(self, item):
+        """
+        Aplica el día y horario ya asignados a `item` y replanifica solo ese
+        día: las actividades posteriores que queden solapadas se corren
+        hacia adelante (con BUFFER minutos entre ellas)
+
+        Raises:
+            ConflictoHorario: si el item empieza antes o termina después de la jornada, si
+                pisa una actividad que empieza antes o a la misma hora, o si
+                las desplazadas no terminan dentro de la jornada
+
+        Returns:
+            lista de items desplazados (ya guardados)
+        """
+        arbol = self.dia(item.dia)
+        inicio, fin = a_minutos(item.hora_inicio), a_minutos(item.hora_fin)
+
+        if inicio < self.INICIO_JORNADA:
+            raise ConflictoHorario(
+                f'La actividad empieza a las {item.hora_inicio:%H:%M}, antes del inicio de la jornada '
+                f'({a_hora(self.INICIO_JORNADA):%H:%M})'
+            )
+        if fin > self.FIN_JORNADA:
+            raise ConflictoHorario(
+                f'La actividad termina a las {item.hora_fin:%H:%M}, después del fin de la jornada '
+                f'({a_hora(self.FIN_JORNADA):%H:%M})'
+            )
+
+        # Las actividades que empiezan antes o a la misma hora no se mueven:
+        # no se puede pisar una (el árbol ordena por (inicio, pk), así que una
+        # con el mismo inicio no siempre es "siguiente")
+        for inicio_otro, _, clave in arbol.solapados(inicio, fin):
+            otro = self._items[clave]
+            if clave != item.pk and inicio_otro <= inicio:
+                raise ConflictoHorario(
+                    f'Se superpone con "{otro.destino.nombre}" '
+                    f'({otro.hora_inicio:%H:%M}-{otro.hora_fin:%H:%M}) del día {item.dia}'
+                )
+
+        anterior = arbol.intervalo(item.pk) if item.pk in arbol else None
+        arbol.insertar(inicio, fin, item.pk)
+
+        try:
+            nuevos_horarios = self._desplazar_siguientes(arbol, item, fin)
+        except ConflictoHorario:
+            # Dejar el día como estaba (la agenda puede seguir usándose para sugerir)
+            arbol.eliminar(item.pk)
+            if anterior:
+                arbol.insertar(*anterior, item.pk)
+            raise
+
+        desplazados = []
+        for clave, nuevo_inicio, nuevo_fin in nuevos_horarios:
+            arbol.insertar(nuevo_inicio, nuevo_fin, clave)
+            otro = self._items[clave]
+            otro.hora_inicio = a_hora(nuevo_inicio)
+            otro.hora_fin = a_hora(nuevo_fin)
+            desplazados.append(otro)
+
+        # La duración de los desplazados no cambia: los totales tampoco
+        with transaction.atomic():
+            item.save()
+            ItemItinerario.objects.bulk_update(desplazados, ['hora_inicio', 'hora_fin'])
+
+        self._items[item.pk] = item
+        return desplazados
+
+    def _desplazar_siguientes(self, arbol, item, fin):
+        """
+        Nuevos horarios (clave, inicio, fin) de las actividades que quedan
+        solapadas o a menos de BUFFER minutos de la anterior
+        """
+        nuevos_horarios = []
+        fin_previo = fin
+        for inicio_siguiente, fin_siguiente, clave in arbol.siguientes(item.pk):
+            if inicio_siguiente >= fin_previo + self.BUFFER:
+                break
+            nuevo_inicio = fin_previo + self.BUFFER
+            nuevo_fin = nuevo_inicio + (fin_siguiente - inicio_siguiente)
+            if nuevo_fin > self.FIN_JORNADA:
+                raise ConflictoHorario(
+                    f'No hay espacio en el día {item.dia} para correr "{self._items[clave].destino.nombre}"; '
+                    f'prueba otro horario u otro día'
+                )
+            nuevos_horarios.append((clave, nuevo_inicio, nuevo_fin))
+            fin_previo = nuevo_fin
+        return nuevos_horarios
+
+    def _cargar_dias(self, dias):
+        for dia in dias:
+            self._dias[dia] = ArbolIntervalos()
+
+        items = self.itinerario.items.filter(dia__in=dias).select_related('destino').order_by('dia', 'hora_inicio')
+        for item in items:
+            self._items[item.pk] = item
+            self._dias[item.dia].insertar(a_minutos(item.hora_inicio), a_minutos(item.hora_fin), item.pk)
@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import math
+import threading
+import time as reloj
+
+from lugares.catalogo import version_catalogo
+from lugares.models import Destino, Actividad
+from rutas.tiempo_dependiente import obtener_grafo
+from .models import ItemItinerario
+from .puntuacion import CatalogoPuntuacion, TablaAlias
+
+
+class CatalogoGeneracion:
+    """
+    Instantánea de destinos activos y actividades disponibles para generar
+    itinerarios: los arreglos de puntuación y los objetos para crear items
+    """
+
+    # Perfiles (preferencias + presupuesto) con muestreador preparado en memoria
+    MAX_MUESTREADORES = 256
+
+    def __init__(self, puntuacion, destinos, actividades):
+        self.puntuacion = puntuacion
+        self.destinos = destinos
+        self.actividades = actividades
+        self.categorias = [destinos[int(destino_id)].categoria_id for destino_id in puntuacion.destino_ids]
+        self._muestreadores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.puntuacion)
+
+    def muestreador(self, preferencias, presupuesto):
+        """
+        Candidatos de un perfil con su tabla de alias (y su orden por
+        score), preparados una vez y reutilizados mientras el catálogo
+        siga en caché
+
+        Returns:
+            (índices de los candidatos, TablaAlias con sus scores) o None
+        """
+        clave = (tuple(sorted(preferencias)), presupuesto)
+
+        with self._lock:
+            if clave in self._muestreadores:
+                self._muestreadores.move_to_end(clave)
+                return self._muestreadores[clave]
+
+        scores = self.puntuacion.puntuar([list(clave[0])], [presupuesto])[0]
+        indices = [int(i) for i in (scores > -float('inf')).nonzero()[0]]
+        preparado = (indices, TablaAlias([max(float(scores[i]), 1e-6) for i in indices])) if indices else None
+
+        with self._lock:
+            self._muestreadores[clave] = preparado
+            if len(self._muestreadores) > self.MAX_MUESTREADORES:
+                self._muestreadores.popitem(last=False)
+
+        return preparado
+
+    def construir_items(self, seleccion, fecha_inicio):
+        """
+        Items (sin guardar) de un itinerario en el día 1, con horarios y notas
+        como GeneradorItinerarios. Entre dos destinos se deja el traslado
+        más rápido a esa hora por las rutas registradas (con TIEMPO_BUFFER
+        como mínimo)
+
+        Args:
+            seleccion: lista de (destino_id, actividad_id o None)
+
+        Returns:
+            (items, costo_total, tiempo_total)
+        """
+        from .generators import GeneradorItinerarios
+
+        items = []
+        costo_total = Decimal('0.00')
+        tiempo_total = 0
+        hora_actual = time(9, 0)
+        grafo = obtener_grafo()
+        destino_anterior = None
+        salida_anterior = None
+
+        for orden, (destino_id, actividad_id) in enumerate(seleccion, start=1):
+            destino = self.destinos[destino_id]
+            actividad = self.actividades.get(actividad_id) if actividad_id else None
+
+            if destino_anterior is not None:
+                traslado = grafo.tiempo_viaje(destino_anterior, destino_id, salida_anterior)
+                espera = max(GeneradorItinerarios.TIEMPO_BUFFER, math.ceil(traslado or 0))
+                hora_actual = (salida_anterior + timedelta(minutes=espera)).time()
+
+            if actividad:
+                costo = actividad.costo if actividad.costo else destino.costo_entrada
+                duracion = actividad.duracion_minutos if actividad.duracion_minutos else GeneradorItinerarios.TIEMPO_DEFAULT
+
+                notas = f" Actividad: {actividad.nombre}\n"
+                notas += f" Duración: {duracion} minutos\n"
+                notas += f" Costo: S/ {costo}\n"
+                if actividad.descripcion:
+                    notas += f" {actividad.descripcion[:100]}"
+            else:
+                costo = destino.costo_entrada if destino.costo_entrada else GeneradorItinerarios.COSTO_DEFAULT
+                duracion = GeneradorItinerarios.TIEMPO_DEFAULT
+
+                notas = f" Visita libre a {destino.nombre}\n"
+                notas += f" Duración estimada: {duracion} minutos\n"
+                notas += f" Costo de entrada: S/ {costo}"
+
+            hora_fin_dt = datetime.combine(fecha_inicio, hora_actual) + timedelta(minutes=duracion)
+            hora_fin = hora_fin_dt.time()
+
+            items.append(ItemItinerario(
+                destino_id=destino_id,
+                actividad_id=actividad_id,
+                orden=orden,
+                dia=1,
+                hora_inicio=hora_actual,
+                hora_fin=hora_fin,
+                costo=costo,
+                # bulk_create no llama a save(): fijar la duración aquí
+                duracion_minutos=ItemItinerario.calcular_duracion(hora_actual, hora_fin),
+                notas=notas,
+            ))
+
+            costo_total += Decimal(str(costo))
+            tiempo_total += items[-1].duracion_minutos
+            destino_anterior = destino_id
+            salida_anterior = hora_fin_dt
+
+        return items, costo_total, tiempo_total
+
+
+def cargar_catalogo():
+    """Carga destinos activos y actividades disponibles en dos consultas"""
+    from .generators import GeneradorItinerarios
+
+    # Número de actividades y la más barata vienen precalculados en Destino
+    destinos = list(Destino.objects.filter(activo=True).order_by('-calificacion', 'nombre'))
+    indices = {destino.id: i for i, destino in enumerate(destinos)}
+
+    actividades = {}
+    actividades_por_destino = [[] for _ in destinos]
+    for actividad in Actividad.objects.filter(disponible=True, destino__activo=True).order_by('id'):
+        indice = indices.get(actividad.destino_id)
+        if indice is None:
+            continue
+        actividades_por_destino[indice].append((actividad.id, actividad.tipo, float(actividad.costo)))
+        actividades[actividad.id] = actividad
+
+    puntuacion = CatalogoPuntuacion(
+        destino_ids=[d.id for d in destinos],
+        calificaciones=[float(d.calificacion or 0) for d in destinos],
+        costos_entrada=[float(d.costo_entrada or 0) for d in destinos],
+        num_actividades=[d.num_actividades for d in destinos],
+        costos_minimos=[float(d.costo_minimo_actividad) if d.costo_minimo_actividad is not None else None
+                        for d in destinos],
+        tags_destinos=[d.tags_preferencias if isinstance(d.tags_preferencias, list)
+                       else str(d.tags_preferencias or '').split(',') for d in destinos],
+        actividades=actividades_por_destino,
+        pesos=(
+            GeneradorItinerarios.PESO_CALIFICACION,
+            GeneradorItinerarios.PESO_PREFERENCIA,
+            GeneradorItinerarios.PESO_COSTO,
+            GeneradorItinerarios.PESO_POPULARIDAD,
+        ),
+        costo_default=float(GeneradorItinerarios.COSTO_DEFAULT),
+    )
+
+    return CatalogoGeneracion(puntuacion, {d.id: d for d in destinos}, actividades)
+
+
+# Catálogo compartido por las peticiones del proceso
+TTL_CATALOGO = 300
+_catalogo = None
+_catalogo_cargado = 0.0
+_version_cargada = None
+_catalogo_lock = threading.Lock()
+
+
+def obtener_catalogo():
+    """
+    Catálogo en memoria del proceso. Se recarga cuando cambia la versión
+    del catálogo (lugares/catalogo.py; la suben las señales de Destino,
+    Actividad y Categoría) y, como red de seguridad para cambios que no
+    pasan por señales, cada TTL_CATALOGO segundos
+    """
+    global _catalogo, _catalogo_cargado, _version_cargada
+
+    version = version_catalogo()
+    with _catalogo_lock:
+        if (_catalogo is None or _version_cargada != version
+                or reloj.monotonic() - _catalogo_cargado > TTL_CATALOGO):
+            _catalogo = cargar_catalogo()
+            _catalogo_cargado = reloj.monotonic()
+            _version_cargada = version
+        return _catalogo
+
+
+def invalidar_catalogo():
+    """Fuerza la recarga del catálogo en la próxima petición"""
+    global _catalogo
+    with _catalogo_lock:
+        _catalogo = None
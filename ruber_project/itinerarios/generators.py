@@ -1,10 +1,15 @@
-from datetime import timedelta, time, datetime
 from decimal import Decimal
-from lugares.models import Destino, Actividad
 from .models import Itinerario, ItemItinerario
-from django.db.models import Q
+from .catalogo import obtener_catalogo
+from .puntuacion import elegir_actividad, muestrear_diverso, seleccionar_con_presupuesto
+from .signals import totales_suspendidos
+from core.trazas import tramo
+from django.db import transaction
+import logging
 import random
 
+logger = logging.getLogger('ruber.itinerarios')
+
 class GeneradorItinerarios:
     """
     Generador de itinerarios con control ESTRICTO de presupuesto
@@ -44,241 +49,98 @@ class GeneradorItinerarios:
         elif not isinstance(preferencias, list):
             preferencias = list(preferencias) if preferencias else []
         
-        print(f" Generando itinerario para {self.turista.username}")
-        print(f"   Preferencias: {preferencias}")
-        print(f"   Presupuesto máximo: {presupuesto_max}")
-        
-        # 1. Filtrar destinos
-        destinos_candidatos = self._filtrar_destinos_por_preferencias(
-            preferencias, 
-            presupuesto_max
+        logger.debug(
+            'generar turista=%s preferencias=%s presupuesto_max=%s',
+            self.turista.username, preferencias, presupuesto_max,
         )
         
-        if not destinos_candidatos:
-            return self._crear_itinerario_vacio(nombre_itinerario, fecha_inicio, fecha_fin)
+        catalogo = obtener_catalogo()
+        preferencias_normalizadas = [str(p).strip().lower() for p in preferencias]
         
-        # 2. Calcular scoring
-        destinos_con_score = self._calcular_scores(
-            destinos_candidatos, 
-            preferencias, 
-            presupuesto_max
-        )
+        # 1-2. Filtrar y puntuar todos los destinos en una sola expresión vectorizada
+        with tramo('generador.puntuacion', destinos=len(catalogo.puntuacion)):
+            scores = self._calcular_scores(catalogo, preferencias_normalizadas, presupuesto_max)
         
         # 3. Seleccionar top destinos RESPETANDO PRESUPUESTO
-        destinos_seleccionados = self._seleccionar_destinos_con_presupuesto(
-            destinos_con_score,
-            presupuesto_max
-        )
+        with tramo('generador.seleccion') as medicion:
+            seleccionados = self._seleccionar_destinos_con_presupuesto(catalogo, scores, presupuesto_max)
+            medicion.anotar(seleccionados=len(seleccionados))
+        
+        if not seleccionados:
+            return self._crear_itinerario_vacio(nombre_itinerario, fecha_inicio, fecha_fin)
         
         # 4. Crear itinerario con actividades reales
-        itinerario = self._crear_itinerario_con_actividades_reales(
-            nombre_itinerario,
-            fecha_inicio, 
-            fecha_fin, 
-            destinos_seleccionados,
-            preferencias,
-            presupuesto_max
-        )
+        with tramo('generador.guardado'):
+            itinerario = self._crear_itinerario_con_actividades_reales(
+                nombre_itinerario,
+                fecha_inicio, 
+                fecha_fin, 
+                catalogo,
+                seleccionados,
+                preferencias,
+                preferencias_normalizadas
+            )
         
         return itinerario
     
-    def _filtrar_destinos_por_preferencias(self, preferencias, presupuesto_max):
-        """Filtrar destinos por preferencias y presupuesto"""
-        destinos = Destino.objects.filter(activo=True)
-        
-        if presupuesto_max:
-            destinos = destinos.filter(costo_entrada__lte=presupuesto_max)
-        
-        if preferencias:
-            filtro_tags = Q()
-            for pref in preferencias:
-                filtro_tags |= Q(tags_preferencias__icontains=pref)
-            
-            destinos = destinos.filter(filtro_tags).distinct()
-        
-        return list(destinos.prefetch_related('actividades'))
-    
-    def _calcular_scores(self, destinos, preferencias, presupuesto_max):
-        """Calcular scoring de cada destino"""
-        destinos_con_score = []
-        max_actividades = max([d.actividades.count() for d in destinos]) if destinos else 1
-        
-        for destino in destinos:
-            calificacion_valor = float(destino.calificacion) if destino.calificacion else 3.0
-            score_calificacion = calificacion_valor / 5.0
-            
-            raw_tags = destino.tags_preferencias or []
-            if isinstance(raw_tags, str):
-                lista_tags = raw_tags.split(',')
-            elif isinstance(raw_tags, list):
-                lista_tags = raw_tags
-            else:
-                lista_tags = []
-
-            tags_destino = set([str(tag).strip().lower() for tag in lista_tags])
-            preferencias_set = set([p.lower() for p in preferencias])
-            interseccion = tags_destino & preferencias_set
-            
-            score_preferencias = len(interseccion) / float(len(preferencias)) if preferencias else 0.5
-            
-            if presupuesto_max and float(presupuesto_max) > 0:
-                costo_destino = float(destino.costo_entrada) if destino.costo_entrada else 0.0
-                score_costo = 1 - (costo_destino / float(presupuesto_max))
-                score_costo = max(0.0, min(1.0, score_costo))
-            else:
-                score_costo = 0.5
-            
-            num_actividades = destino.actividades.count()
-            score_popularidad = num_actividades / float(max_actividades) if max_actividades > 0 else 0.5
-            
-            score_total = (
-                self.PESO_CALIFICACION * score_calificacion +
-                self.PESO_PREFERENCIA * score_preferencias +
-                self.PESO_COSTO * score_costo +
-                self.PESO_POPULARIDAD * score_popularidad
-            )
-            
-            destinos_con_score.append({
-                'destino': destino,
-                'score': score_total,
-                'match_tags': len(interseccion),
-                'num_actividades': num_actividades
-            })
-        
-        destinos_con_score.sort(key=lambda x: x['score'], reverse=True)
-        return destinos_con_score
+    def _calcular_scores(self, catalogo, preferencias, presupuesto_max):
+        """
+        Score de cada destino del catálogo (arreglo alineado con
+        catalogo.puntuacion.destino_ids); -inf en los que no son candidatos
+        por tags o presupuesto
+        """
+        presupuesto = float(presupuesto_max) if presupuesto_max else None
+        return catalogo.puntuacion.puntuar([preferencias], [presupuesto])[0]
 
-    def _seleccionar_destinos_con_presupuesto(self, destinos_con_score, presupuesto_max):
+    def _seleccionar_destinos_con_presupuesto(self, catalogo, scores, presupuesto_max):
         """
         CRÍTICO: Selecciona destinos sin superar el presupuesto
-        """
-        if not presupuesto_max:
-            # Sin límite de presupuesto, tomar top 3
-            return destinos_con_score[:self.MAX_ACTIVIDADES_TOTAL]
-        
-        presupuesto_restante = float(presupuesto_max)
-        destinos_seleccionados = []
-        costo_acumulado = 0.0
         
-        print(f"💰 Presupuesto disponible: S/ {presupuesto_restante}")
-        
-        for item in destinos_con_score:
-            if len(destinos_seleccionados) >= self.MAX_ACTIVIDADES_TOTAL:
-                break
-            
-            destino = item['destino']
-            
-            # Buscar actividad más barata disponible
-            actividades = destino.actividades.filter(disponible=True).order_by('costo')
-            
-            if actividades.exists():
-                actividad_mas_barata = actividades.first()
-                costo_item = float(actividad_mas_barata.costo)
-            else:
-                costo_item = float(destino.costo_entrada) if destino.costo_entrada else float(self.COSTO_DEFAULT)
-            
-            # Verificar si cabe en el presupuesto
-            if costo_acumulado + costo_item <= presupuesto_restante:
-                destinos_seleccionados.append(item)
-                costo_acumulado += costo_item
-                print(f"   ✅ {destino.nombre}: S/ {costo_item} (Total: S/ {costo_acumulado})")
-            else:
-                print(f"   ❌ {destino.nombre}: S/ {costo_item} (Excede presupuesto)")
+        Recorre solo los mejores candidatos (argpartition), no el catálogo entero.
+        """
+        presupuesto = float(presupuesto_max) if presupuesto_max else None
+        seleccionados = seleccionar_con_presupuesto(
+            catalogo.puntuacion, scores, presupuesto, self.MAX_ACTIVIDADES_TOTAL
+        )
         
-        print(f"📊 Total seleccionado: {len(destinos_seleccionados)} destinos por S/ {costo_acumulado}")
+        if logger.isEnabledFor(logging.DEBUG):
+            costo_acumulado = sum(float(catalogo.puntuacion.costos_item[i]) for i in seleccionados)
+            logger.debug('seleccion destinos=%s costo=%.2f', len(seleccionados), costo_acumulado)
         
-        return destinos_seleccionados
+        return seleccionados
     
-    def _crear_itinerario_con_actividades_reales(self, nombre, fecha_inicio, fecha_fin, 
-                                                   destinos_seleccionados, preferencias, presupuesto_max):
+    def _crear_itinerario_con_actividades_reales(self, nombre, fecha_inicio, fecha_fin, catalogo,
+                                                   seleccionados, preferencias, preferencias_normalizadas):
         """Crea itinerario con actividades reales"""
         
-        itinerario = Itinerario.objects.create(
-            turista=self.turista,
-            nombre=nombre,  # Usar el nombre personalizado
-            descripcion=f"Generado según tus preferencias: {', '.join(preferencias) if preferencias else 'sin preferencias específicas'}",
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            estado='borrador'
-        )
-        
-        orden_global = 1
-        costo_total_acumulado = Decimal('0.00')
-        tiempo_total_acumulado = 0
-        
-        hora_actual = time(9, 0)
-        dia = 1
-        
-        for item in destinos_seleccionados:
-            destino = item['destino']
-            
-            actividad_seleccionada = self._seleccionar_actividad_real(destino, preferencias)
-            
-            if actividad_seleccionada:
-                costo_actividad = actividad_seleccionada.costo if hasattr(actividad_seleccionada, 'costo') and actividad_seleccionada.costo else destino.costo_entrada
-                duracion_minutos = actividad_seleccionada.duracion_minutos if actividad_seleccionada.duracion_minutos else self.TIEMPO_DEFAULT
-                
-                notas = f" Actividad: {actividad_seleccionada.nombre}\n"
-                notas += f" Duración: {duracion_minutos} minutos\n"
-                notas += f" Costo: S/ {costo_actividad}\n"
-                if actividad_seleccionada.descripcion:
-                    notas += f" {actividad_seleccionada.descripcion[:100]}"
-            else:
-                costo_actividad = destino.costo_entrada if destino.costo_entrada else self.COSTO_DEFAULT
-                duracion_minutos = self.TIEMPO_DEFAULT
-                
-                notas = f" Visita libre a {destino.nombre}\n"
-                notas += f" Duración estimada: {duracion_minutos} minutos\n"
-                notas += f" Costo de entrada: S/ {costo_actividad}"
-            
-            hora_fin_dt = datetime.combine(fecha_inicio, hora_actual) + timedelta(minutes=duracion_minutos)
-            hora_fin = hora_fin_dt.time()
-            
-            ItemItinerario.objects.create(
-                itinerario=itinerario,
-                destino=destino,
-                orden=orden_global,
-                dia=dia,
-                hora_inicio=hora_actual,
-                hora_fin=hora_fin,
-                notas=notas
+        preferencias_set = set(preferencias_normalizadas)
+        seleccion = [
+            (
+                int(catalogo.puntuacion.destino_ids[indice]),
+                elegir_actividad(catalogo.puntuacion, indice, preferencias_set, random),
             )
-            
-            costo_total_acumulado += Decimal(str(costo_actividad))
-            tiempo_total_acumulado += int(duracion_minutos)
-            
-            orden_global += 1
-            hora_actual = (hora_fin_dt + timedelta(minutes=self.TIEMPO_BUFFER)).time()
-        
-        itinerario.costo_total = costo_total_acumulado
-        itinerario.tiempo_total_minutos = tiempo_total_acumulado
-        itinerario.save()
-        itinerario.calcular_totales()
+            for indice in seleccionados
+        ]
+        items, _, _ = catalogo.construir_items(seleccion, fecha_inicio)
+        
+        # Itinerario, items y totales en una sola transacción: si algo falla
+        # no queda un itinerario a medias
+        with transaction.atomic(), totales_suspendidos():
+            itinerario = Itinerario.objects.create(
+                turista=self.turista,
+                nombre=nombre,  # Usar el nombre personalizado
+                descripcion=f"Generado según tus preferencias: {', '.join(preferencias) if preferencias else 'sin preferencias específicas'}",
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                estado='borrador'
+            )
+            for item in items:
+                item.itinerario = itinerario
+            ItemItinerario.objects.bulk_create(items)
+            itinerario.calcular_totales()
         
         return itinerario
     
-    def _seleccionar_actividad_real(self, destino, preferencias):
-        """Selecciona una actividad real del destino"""
-        actividades = destino.actividades.filter(disponible=True)
-        
-        if not actividades.exists():
-            return None
-        
-        if preferencias:
-            preferencias_set = set([str(p).strip().lower() for p in preferencias])
-            
-            actividades_con_score = []
-            for actividad in actividades:
-                tipo_actividad = str(actividad.tipo).strip().lower() if actividad.tipo else ""
-                score = 1.0 if tipo_actividad in preferencias_set else 0.0
-                actividades_con_score.append({'actividad': actividad, 'score': score})
-            
-            actividades_con_score.sort(key=lambda x: x['score'], reverse=True)
-            top_actividades = [a['actividad'] for a in actividades_con_score[:3]]
-            return random.choice(top_actividades)
-        
-        return random.choice(list(actividades))
-    
     def _crear_itinerario_vacio(self, nombre, fecha_inicio, fecha_fin):
         """Crear itinerario vacío cuando no hay destinos"""
         return Itinerario.objects.create(
@@ -292,116 +154,94 @@ class GeneradorItinerarios:
 
 
 class RegeneradorActividades:
-    """Regenera actividades respetando presupuesto"""
+    """
+    Regenera actividades respetando presupuesto
+
+    Muestrea los destinos con una tabla de alias sobre candidatos ya
+    puntuados (preparada una vez por perfil y guardada con el catálogo),
+    con semilla opcional para resultados reproducibles; los destinos de
+    una categoría ya elegida se rechazan con probabilidad DIVERSIDAD para
+    variar el itinerario.
+    """
     
-    TIEMPO_DEFAULT = 90
-    COSTO_DEFAULT = Decimal('20.00')
-    TIEMPO_BUFFER = 30
+    NUM_ACTIVIDADES = 3
+    DIVERSIDAD = 0.7
+    COSTO_DEFAULT = GeneradorItinerarios.COSTO_DEFAULT
     
-    def __init__(self, itinerario):
+    def __init__(self, itinerario, semilla=None):
         self.itinerario = itinerario
+        self.rng = random.Random(semilla)
     
     def regenerar_3_actividades(self):
         """Regenera 3 actividades respetando el presupuesto del usuario"""
         
-        # Eliminar actividades actuales
-        self.itinerario.items.all().delete()
-        
         # Obtener presupuesto del usuario
         presupuesto_max = self.itinerario.turista.presupuesto_max
         preferencias = self.itinerario.turista.preferencias if self.itinerario.turista.preferencias else []
         
         if isinstance(preferencias, str):
             preferencias = [p.strip() for p in preferencias.split(',') if p.strip()]
+        preferencias = [str(p).strip().lower() for p in preferencias]
         
-        # Obtener destinos
-        destinos = Destino.objects.filter(activo=True)
+        catalogo = obtener_catalogo()
+        preparado = catalogo.muestreador(preferencias, float(presupuesto_max) if presupuesto_max else None)
         
-        if preferencias:
-            filtro_tags = Q()
-            for pref in preferencias:
-                filtro_tags |= Q(tags_preferencias__icontains=pref)
-            destinos = destinos.filter(filtro_tags).distinct()
+        seleccion = []
+        if preparado:
+            indices, tabla = preparado
+            with tramo('regenerador.seleccion', candidatos=len(indices)):
+                seleccion = self._muestrear(catalogo, indices, tabla, preferencias, presupuesto_max)
         
-        destinos_lista = list(destinos)
+        items, _, _ = catalogo.construir_items(seleccion, self.itinerario.fecha_inicio)
         
-        if not destinos_lista:
-            return self.itinerario
+        # Reemplazar los items en bloque y recalcular los totales una sola vez
+        with transaction.atomic(), totales_suspendidos():
+            self.itinerario.items.all().delete()
+            for item in items:
+                item.itinerario = self.itinerario
+            ItemItinerario.objects.bulk_create(items)
+            self.itinerario.calcular_totales()
         
-        # Seleccionar 3 destinos con presupuesto
-        destinos_seleccionados = []
-        costo_acumulado = Decimal('0.00')
-        presupuesto_decimal = Decimal(str(presupuesto_max)) if presupuesto_max else None
-        
-        random.shuffle(destinos_lista)
-        
-        for destino in destinos_lista:
-            if len(destinos_seleccionados) >= 3:
-                break
-            
-            # Buscar actividad más barata
-            actividades = destino.actividades.filter(disponible=True).order_by('costo')
-            
-            if actividades.exists():
-                actividad = actividades.first()
-                costo = actividad.costo if hasattr(actividad, 'costo') and actividad.costo else destino.costo_entrada
-            else:
-                costo = destino.costo_entrada if destino.costo_entrada else self.COSTO_DEFAULT
-            
-            # Verificar presupuesto
-            if presupuesto_decimal:
-                if costo_acumulado + Decimal(str(costo)) <= presupuesto_decimal:
-                    destinos_seleccionados.append(destino)
-                    costo_acumulado += Decimal(str(costo))
-            else:
-                destinos_seleccionados.append(destino)
-                costo_acumulado += Decimal(str(costo))
-        
-        # Crear items
-        orden = 1
-        hora_actual = time(9, 0)
-        tiempo_total = 0
-        
-        for destino in destinos_seleccionados:
-            actividades = destino.actividades.filter(disponible=True)
-            actividad = random.choice(list(actividades)) if actividades.exists() else None
-            
-            if actividad:
-                costo = actividad.costo if hasattr(actividad, 'costo') and actividad.costo else destino.costo_entrada
-                duracion = actividad.duracion_minutos if actividad.duracion_minutos else self.TIEMPO_DEFAULT
-                
-                notas = f" Actividad: {actividad.nombre}\n"
-                notas += f" Duración: {duracion} minutos\n"
-                notas += f" Costo: S/ {costo}"
+        return self.itinerario
+    
+    def _muestrear(self, catalogo, indices, tabla, preferencias, presupuesto_max):
+        """Elige (destino_id, actividad_id) sin superar el presupuesto"""
+        puntuacion = catalogo.puntuacion
+        presupuesto = Decimal(str(presupuesto_max)) if presupuesto_max else None
+        restante = presupuesto
+        actividades = {}
+        
+        def aceptar(indice):
+            nonlocal restante
+            # Actividad al azar entre las que caben en lo que queda del presupuesto
+            destino = catalogo.destinos[int(puntuacion.destino_ids[indice])]
+            opciones = [
+                catalogo.actividades[actividad_id]
+                for actividad_id, _, _ in puntuacion.actividades[indice]
+            ]
+            if restante is not None:
+                opciones = [a for a in opciones if (a.costo or destino.costo_entrada) <= restante]
+            
+            if opciones:
+                actividad = self.rng.choice(opciones)
+                costo = actividad.costo or destino.costo_entrada
+            elif puntuacion.actividades[indice]:
+                return False
             else:
+                actividad = None
                 costo = destino.costo_entrada if destino.costo_entrada else self.COSTO_DEFAULT
-                duracion = self.TIEMPO_DEFAULT
-                
-                notas = f" Visita libre a {destino.nombre}\n"
-                notas += f" Duración: {duracion} minutos\n"
-                notas += f" Costo: S/ {costo}"
             
-            hora_fin_dt = datetime.combine(datetime.today(), hora_actual) + timedelta(minutes=duracion)
-            hora_fin = hora_fin_dt.time()
+            if restante is not None:
+                if costo > restante:
+                    return False
+                restante -= costo
             
-            ItemItinerario.objects.create(
-                itinerario=self.itinerario,
-                destino=destino,
-                orden=orden,
-                dia=1,
-                hora_inicio=hora_actual,
-                hora_fin=hora_fin,
-                notas=notas
-            )
-            
-            tiempo_total += int(duracion)
-            orden += 1
-            hora_actual = (hora_fin_dt + timedelta(minutes=self.TIEMPO_BUFFER)).time()
+            actividades[indice] = actividad.id if actividad else None
+            return True
         
-        # Actualizar totales
-        self.itinerario.costo_total = costo_acumulado
-        self.itinerario.tiempo_total_minutos = tiempo_total
-        self.itinerario.save()
-        self.itinerario.calcular_totales()
+        elegidos = muestrear_diverso(
+            tabla, indices, self.NUM_ACTIVIDADES, aceptar, catalogo.categorias, self.rng,
+            diversidad=self.DIVERSIDAD,
+        )
         
-        return self.itinerario
\ No newline at end of file
+        return [(int(puntuacion.destino_ids[indice]), actividades[indice]) for indice in elegidos]
@@ -0,0 +1,168 @@
+from concurrent.futures import ProcessPoolExecutor
+import time as reloj
+
+from django.db import transaction
+from .catalogo import cargar_catalogo
+from .generators import GeneradorItinerarios
+from .models import Itinerario, ItemItinerario, ResumenDiaItinerario
+from .puntuacion import inicializar_worker, planificar_en_worker, planificar_usuarios
+
+
+class GeneradorLote:
+    """
+    Genera itinerarios para muchos turistas a la vez:
+    - el catálogo de destinos/actividades se carga una sola vez
+    - los usuarios se puntúan en forma vectorizada contra el catálogo
+    - el trabajo se reparte en lotes entre procesos
+    - los resultados se escriben con bulk_create
+
+    Sigue las mismas reglas que GeneradorItinerarios (pesos, presupuesto,
+    máximo de actividades, horarios y formato de notas).
+    """
+
+    TAMANO_LOTE = 500
+
+    def __init__(self, workers=1, tamano_lote=None, semilla=None):
+        self.workers = max(1, workers or 1)
+        self.tamano_lote = tamano_lote or self.TAMANO_LOTE
+        self.semilla = semilla
+        self.catalogo = None
+
+    def cargar_catalogo(self):
+        """Carga el catálogo de destinos y actividades (dos consultas)"""
+        self.catalogo = cargar_catalogo()
+        return self.catalogo
+
+    def generar(self, turistas, nombre, fecha_inicio, fecha_fin, progreso=None):
+        """
+        Genera un itinerario por turista
+
+        Args:
+            turistas: queryset de Turista
+            nombre: nombre de los itinerarios generados
+            fecha_inicio, fecha_fin: fechas de los itinerarios
+            progreso: función opcional llamada tras cada lote con las estadísticas
+
+        Returns:
+            dict con usuarios, itinerarios, items y segundos empleados
+        """
+        if self.catalogo is None:
+            self.cargar_catalogo()
+
+        inicio = reloj.perf_counter()
+        estadisticas = {'total': turistas.count(), 'usuarios': 0, 'itinerarios': 0, 'items': 0, 'segundos': 0.0}
+        preferencias_originales = {}
+
+        def lotes():
+            lote = []
+            for turista_id, preferencias, presupuesto in turistas.order_by('id').values_list(
+                'id', 'preferencias', 'presupuesto_max'
+            ).iterator(chunk_size=self.tamano_lote):
+                preferencias = self._normalizar_preferencias(preferencias)
+                preferencias_originales[turista_id] = preferencias
+                lote.append((
+                    turista_id,
+                    [str(p).strip().lower() for p in preferencias],
+                    float(presupuesto) if presupuesto else None,
+                ))
+                if len(lote) >= self.tamano_lote:
+                    yield lote
+                    lote = []
+            if lote:
+                yield lote
+
+        def registrar(planes):
+            itinerarios, items = self._guardar(planes, preferencias_originales, nombre, fecha_inicio, fecha_fin)
+            for turista_id, _ in planes:
+                preferencias_originales.pop(turista_id, None)
+
+            estadisticas['usuarios'] += len(planes)
+            estadisticas['itinerarios'] += itinerarios
+            estadisticas['items'] += items
+            estadisticas['segundos'] = reloj.perf_counter() - inicio
+            if progreso:
+                progreso(dict(estadisticas))
+
+        maximo = GeneradorItinerarios.MAX_ACTIVIDADES_TOTAL
+
+        if self.workers == 1:
+            for lote in lotes():
+                registrar(planificar_usuarios(self.catalogo.puntuacion, lote, maximo, self.semilla))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=inicializar_worker,
+                initargs=(self.catalogo.puntuacion, self.semilla),
+            ) as pool:
+                # Mantener pocas tareas en vuelo para no cargar a todos los usuarios en memoria
+                pendientes = []
+                for lote in lotes():
+                    pendientes.append(pool.submit(planificar_en_worker, (lote, maximo)))
+                    if len(pendientes) >= 2 * self.workers:
+                        registrar(pendientes.pop(0).result())
+                for futuro in pendientes:
+                    registrar(futuro.result())
+
+        estadisticas['segundos'] = reloj.perf_counter() - inicio
+        return estadisticas
+
+    def _normalizar_preferencias(self, preferencias):
+        """Igual que GeneradorItinerarios.generar: siempre una lista"""
+        if isinstance(preferencias, str):
+            return [p.strip() for p in preferencias.split(',') if p.strip()]
+        if not isinstance(preferencias, list):
+            return list(preferencias) if preferencias else []
+        return preferencias
+
+    def _guardar(self, planes, preferencias_originales, nombre, fecha_inicio, fecha_fin):
+        """Escribe itinerarios, items y resumen por día de un lote con bulk_create"""
+        itinerarios = []
+        items_por_itinerario = []
+
+        for turista_id, seleccion in planes:
+            preferencias = preferencias_originales.get(turista_id, [])
+            items, costo_total, tiempo_total = self.catalogo.construir_items(seleccion, fecha_inicio)
+
+            if items:
+                descripcion = (f"Generado según tus preferencias: "
+                               f"{', '.join(preferencias) if preferencias else 'sin preferencias específicas'}")
+            else:
+                descripcion = ("No se encontraron destinos que coincidan con tus preferencias y presupuesto. "
+                               "Intenta ajustar tu perfil.")
+
+            itinerarios.append(Itinerario(
+                turista_id=turista_id,
+                nombre=nombre,
+                descripcion=descripcion,
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                estado='borrador',
+                costo_total=costo_total,
+                tiempo_total_minutos=tiempo_total,
+                distancia_total_km=Itinerario.estimar_distancia(len({item.destino_id for item in items})),
+            ))
+            items_por_itinerario.append(items)
+
+        with transaction.atomic():
+            Itinerario.objects.bulk_create(itinerarios, batch_size=self.tamano_lote)
+
+            todos_items = []
+            resumenes = []
+            for itinerario, items in zip(itinerarios, items_por_itinerario):
+                if not items:
+                    continue
+                for item in items:
+                    item.itinerario_id = itinerario.id
+                todos_items.extend(items)
+                resumenes.append(ResumenDiaItinerario(
+                    itinerario_id=itinerario.id,
+                    dia=1,
+                    num_actividades=len(items),
+                    costo=itinerario.costo_total,
+                    tiempo_minutos=itinerario.tiempo_total_minutos,
+                ))
+
+            ItemItinerario.objects.bulk_create(todos_items, batch_size=self.tamano_lote)
+            ResumenDiaItinerario.objects.bulk_create(resumenes, batch_size=self.tamano_lote)
+
+        return len(itinerarios), len(todos_items)
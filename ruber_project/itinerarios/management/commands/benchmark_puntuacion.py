@@ -0,0 +1,119 @@
+import random
+import time as reloj
+import numpy as np
+from django.core.management.base import BaseCommand
+from itinerarios.generators import GeneradorItinerarios
+from itinerarios.puntuacion import CatalogoPuntuacion, top_k
+
+
+TAGS = ['historia', 'cultura', 'arte', 'naturaleza', 'aventura', 'gastronomia',
+        'playa', 'compras', 'vida nocturna', 'deportes', 'familia', 'fotografia']
+
+
+class Command(BaseCommand):
+    help = 'Compara la puntuación de destinos en bucle contra la vectorizada (catálogo sintético)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destinos', type=int, default=100_000, help='Destinos sintéticos')
+        parser.add_argument('--usuarios', type=int, default=200, help='Usuarios para la puntuación por lotes')
+        parser.add_argument('--k', type=int, default=GeneradorItinerarios.MAX_ACTIVIDADES_TOTAL * 8,
+                            help='Destinos a seleccionar')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        n = options['destinos']
+
+        self.stdout.write(f'🏗️ Generando {n} destinos sintéticos...')
+        tags_destinos = [rng.sample(TAGS, rng.randint(1, 4)) for _ in range(n)]
+        calificaciones = [round(rng.uniform(0, 5), 1) for _ in range(n)]
+        costos = [float(rng.choice([0, 5, 10, 15, 20, 30, 50, 80, 120])) for _ in range(n)]
+        num_actividades = [rng.randint(0, 12) for _ in range(n)]
+
+        inicio = reloj.perf_counter()
+        catalogo = CatalogoPuntuacion(
+            destino_ids=list(range(1, n + 1)),
+            calificaciones=calificaciones,
+            costos_entrada=costos,
+            num_actividades=num_actividades,
+            costos_minimos=[None] * n,
+            tags_destinos=tags_destinos,
+            pesos=(
+                GeneradorItinerarios.PESO_CALIFICACION,
+                GeneradorItinerarios.PESO_PREFERENCIA,
+                GeneradorItinerarios.PESO_COSTO,
+                GeneradorItinerarios.PESO_POPULARIDAD,
+            ),
+        )
+        self._reportar('Codificar catálogo', reloj.perf_counter() - inicio)
+
+        usuarios = [
+            (rng.sample(TAGS, rng.randint(0, 3)), rng.choice([None, 50.0, 100.0, 300.0]))
+            for _ in range(options['usuarios'])
+        ]
+        preferencias, presupuesto = (['historia', 'arte'], 100.0)
+
+        # Referencia: el bucle por destino que usaba GeneradorItinerarios
+        inicio = reloj.perf_counter()
+        esperado = self._puntuar_en_bucle(catalogo, tags_destinos, calificaciones, costos,
+                                          num_actividades, preferencias, presupuesto)
+        t_bucle = reloj.perf_counter() - inicio
+        self._reportar('Bucle Python (1 usuario)', t_bucle)
+
+        inicio = reloj.perf_counter()
+        scores = catalogo.puntuar([preferencias], [presupuesto])[0]
+        t_vector = reloj.perf_counter() - inicio
+        self._reportar('Vectorizado (1 usuario)', t_vector, t_bucle)
+
+        diferencia = np.nanmax(np.abs(np.where(np.isinf(scores), 0, scores) - np.where(np.isinf(esperado), 0, esperado)))
+        mismos_candidatos = np.array_equal(np.isinf(scores), np.isinf(esperado))
+        self.stdout.write(f'  ✓ Diferencia máxima {diferencia:.2e}, mismos candidatos: {mismos_candidatos}')
+
+        inicio = reloj.perf_counter()
+        bloque = catalogo.tamano_bloque()
+        for desde in range(0, len(usuarios), bloque):
+            grupo = usuarios[desde:desde + bloque]
+            catalogo.puntuar([u[0] for u in grupo], [u[1] for u in grupo])
+        t_lote = reloj.perf_counter() - inicio
+        self._reportar(f'Vectorizado ({len(usuarios)} usuarios, bloques de {bloque})', t_lote)
+        self.stdout.write(f'     {t_lote / max(len(usuarios), 1) * 1000:.2f} ms por usuario')
+
+        k = options['k']
+        inicio = reloj.perf_counter()
+        seleccion = top_k(scores, k)
+        t_top = reloj.perf_counter() - inicio
+        inicio = reloj.perf_counter()
+        ordenados = np.argsort(-scores, kind='stable')[:len(seleccion)]
+        t_sort = reloj.perf_counter() - inicio
+        self._reportar(f'Top-{k} con argpartition', t_top, t_sort)
+        self._reportar('Orden completo (argsort)', t_sort)
+        self.stdout.write(f'  ✓ Mismo top-{k}: {np.array_equal(seleccion, ordenados)}')
+
+    def _puntuar_en_bucle(self, catalogo, tags_destinos, calificaciones, costos, num_actividades,
+                          preferencias, presupuesto):
+        preferencias_set = set(p.lower() for p in preferencias)
+        # Como tags_preferencias__icontains: basta que una preferencia esté contenida en un tag
+        candidatos = [
+            i for i in range(len(tags_destinos))
+            if costos[i] <= presupuesto
+            and any(p in t.lower() for p in preferencias_set for t in tags_destinos[i])
+        ]
+        max_actividades = max((num_actividades[i] for i in candidatos), default=1)
+        pesos = catalogo.pesos
+
+        scores = np.full(len(tags_destinos), -np.inf)
+        for i in candidatos:
+            score_calificacion = (calificaciones[i] if calificaciones[i] else 3.0) / 5.0
+            interseccion = {str(t).strip().lower() for t in tags_destinos[i]} & preferencias_set
+            score_preferencias = len(interseccion) / float(len(preferencias))
+            score_costo = max(0.0, min(1.0, 1 - costos[i] / presupuesto))
+            score_popularidad = num_actividades[i] / float(max_actividades) if max_actividades > 0 else 0.5
+            scores[i] = (pesos[0] * score_calificacion + pesos[1] * score_preferencias +
+                         pesos[2] * score_costo + pesos[3] * score_popularidad)
+        return scores
+
+    def _reportar(self, nombre, segundos, referencia=None):
+        linea = f'  ⏱️ {nombre}: {segundos * 1000:.1f} ms'
+        if referencia:
+            linea += f' ({referencia / max(segundos, 1e-9):.1f}x)'
+        self.stdout.write(linea)
@@ -0,0 +1,75 @@
+import os
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from usuarios.models import Turista
+from itinerarios.lote import GeneradorLote
+
+
+class Command(BaseCommand):
+    help = 'Genera itinerarios por lotes para muchos turistas (campañas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nombre', default='Itinerario sugerido', help='Nombre de los itinerarios')
+        parser.add_argument('--fecha-inicio', type=date.fromisoformat, help='AAAA-MM-DD (por defecto hoy)')
+        parser.add_argument('--dias', type=int, default=1, help='Duración del itinerario en días')
+        parser.add_argument('--usuarios', type=int, nargs='+', help='Ids de turistas (por defecto todos los activos)')
+        parser.add_argument('--solo-con-preferencias', action='store_true',
+                            help='Omitir turistas sin preferencias configuradas')
+        parser.add_argument('--limite', type=int, help='Máximo de turistas a procesar')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Procesos de trabajo')
+        parser.add_argument('--lote', type=int, default=GeneradorLote.TAMANO_LOTE, help='Usuarios por lote')
+        parser.add_argument('--semilla', type=int, help='Semilla para resultados reproducibles')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError('--dias debe ser al menos 1')
+
+        fecha_inicio = options['fecha_inicio'] or date.today()
+        fecha_fin = fecha_inicio + timedelta(days=options['dias'] - 1)
+
+        turistas = Turista.objects.filter(is_active=True)
+        if options['usuarios']:
+            turistas = turistas.filter(id__in=options['usuarios'])
+        if options['solo_con_preferencias']:
+            turistas = turistas.exclude(preferencias=[])
+        if options['limite']:
+            turistas = turistas.filter(id__in=list(
+                turistas.order_by('id').values_list('id', flat=True)[:options['limite']]
+            ))
+
+        generador = GeneradorLote(
+            workers=options['workers'],
+            tamano_lote=options['lote'],
+            semilla=options['semilla'],
+        )
+
+        self.stdout.write('📦 Cargando catálogo de destinos...')
+        catalogo = generador.cargar_catalogo()
+        self.stdout.write(f'  ✓ {len(catalogo)} destinos, {len(catalogo.puntuacion.vocabulario)} tags')
+
+        self.stdout.write(f'🚀 Generando itinerarios con {generador.workers} proceso(s)...')
+        estadisticas = generador.generar(
+            turistas,
+            nombre=options['nombre'],
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            progreso=self._mostrar_progreso,
+        )
+
+        segundos = estadisticas['segundos'] or 1e-9
+        self.stdout.write(self.style.SUCCESS('\n✅ ¡Generación por lotes completada!'))
+        self.stdout.write(self.style.SUCCESS(f'   👥 {estadisticas["usuarios"]} turistas'))
+        self.stdout.write(self.style.SUCCESS(f'   🗺️ {estadisticas["itinerarios"]} itinerarios'))
+        self.stdout.write(self.style.SUCCESS(f'   🎯 {estadisticas["items"]} actividades'))
+        self.stdout.write(self.style.SUCCESS(
+            f'   ⏱️ {segundos:.2f} s ({estadisticas["usuarios"] / segundos:.0f} turistas/s)'
+        ))
+
+    def _mostrar_progreso(self, estadisticas):
+        segundos = estadisticas['segundos'] or 1e-9
+        total = estadisticas['total'] or 1
+        self.stdout.write(
+            f'  ✓ {estadisticas["usuarios"]}/{estadisticas["total"]} turistas '
+            f'({100 * estadisticas["usuarios"] / total:.0f}%) · '
+            f'{estadisticas["usuarios"] / segundos:.0f} turistas/s'
+        )
@@ -0,0 +1,56 @@
+import time as reloj
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from itinerarios.tareas import procesar, recuperar_abandonadas, tomar_siguiente
+
+
+class Command(BaseCommand):
+    help = 'Worker local que procesa la cola de generación de itinerarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Vaciar la cola y terminar (sin quedarse esperando)')
+        parser.add_argument('--max-tareas', type=int, help='Terminar tras procesar N tareas')
+
+    def handle(self, *args, **options):
+        self.stdout.write('👷 Worker de itinerarios iniciado (Ctrl+C para detener)')
+        procesadas = 0
+        ultima_revision = 0.0
+
+        try:
+            while not options['max_tareas'] or procesadas < options['max_tareas']:
+                close_old_connections()
+
+                # Reencolar tareas de workers caídos (como mucho una vez por minuto)
+                if reloj.monotonic() - ultima_revision > 60:
+                    reencoladas, fallidas = recuperar_abandonadas()
+                    if reencoladas or fallidas:
+                        self.stdout.write(f'  ♻️ {reencoladas} reencoladas, {fallidas} marcadas con error')
+                    ultima_revision = reloj.monotonic()
+
+                tarea = tomar_siguiente()
+                if tarea is None:
+                    if options['una_vez']:
+                        break
+                    reloj.sleep(options['intervalo'])
+                    continue
+
+                inicio = reloj.perf_counter()
+                procesar(tarea)
+                procesadas += 1
+
+                if tarea.estado == 'completada':
+                    self.stdout.write(
+                        f'  ✓ Tarea {tarea.id}: itinerario {tarea.itinerario_id} '
+                        f'({(reloj.perf_counter() - inicio) * 1000:.0f} ms)'
+                    )
+                elif tarea.estado == 'error':
+                    self.stdout.write(self.style.ERROR(f'  ✗ Tarea {tarea.id}: {tarea.error}'))
+                else:
+                    self.stdout.write(self.style.WARNING(f'  ⚠️ Tarea {tarea.id}: la reclamó otro worker, resultado descartado'))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {procesadas} tareas procesadas'))
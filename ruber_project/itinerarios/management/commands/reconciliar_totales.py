@@ -0,0 +1,84 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from itinerarios.models import Itinerario, ItemItinerario, ResumenDiaItinerario
+
+
+class Command(BaseCommand):
+    help = (
+        'Detecta y repara desviaciones entre los totales incrementales de los '
+        'itinerarios y sus items (pensado para ejecutarse periódicamente, p. ej. con cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--itinerario', type=int, help='Revisar solo el itinerario con este id')
+        parser.add_argument('--solo-revisar', action='store_true',
+                            help='Reportar las desviaciones sin repararlas')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔎 Revisando totales de itinerarios...')
+
+        itinerarios = Itinerario.objects.annotate(
+            costo_real=Sum('items__costo'),
+            tiempo_real=Sum('items__duracion_minutos'),
+            destinos_reales=Count('items__destino', distinct=True),
+        ).order_by('id')
+        items = ItemItinerario.objects.order_by()
+        resumenes = ResumenDiaItinerario.objects.all()
+
+        if options['itinerario']:
+            itinerarios = itinerarios.filter(id=options['itinerario'])
+            items = items.filter(itinerario_id=options['itinerario'])
+            resumenes = resumenes.filter(itinerario_id=options['itinerario'])
+
+        # Resumen por día esperado (desde los items) y guardado
+        dias_reales = defaultdict(dict)
+        for fila in items.values('itinerario_id', 'dia').annotate(
+            num_actividades=Count('id'),
+            costo=Sum('costo'),
+            tiempo_minutos=Sum('duracion_minutos'),
+        ):
+            dias_reales[fila['itinerario_id']][fila['dia']] = (
+                fila['num_actividades'], fila['costo'] or Decimal('0.00'), fila['tiempo_minutos'] or 0
+            )
+
+        dias_guardados = defaultdict(dict)
+        for resumen in resumenes.iterator():
+            dias_guardados[resumen.itinerario_id][resumen.dia] = (
+                resumen.num_actividades, resumen.costo, resumen.tiempo_minutos
+            )
+
+        revisados = 0
+        desviados = 0
+
+        for itinerario in itinerarios.iterator():
+            revisados += 1
+            costo_real = itinerario.costo_real or Decimal('0.00')
+            tiempo_real = itinerario.tiempo_real or 0
+            distancia_real = Itinerario.estimar_distancia(itinerario.destinos_reales)
+
+            diferencias = []
+            if itinerario.costo_total != costo_real:
+                diferencias.append(f'costo {itinerario.costo_total} ≠ {costo_real}')
+            if itinerario.tiempo_total_minutos != tiempo_real:
+                diferencias.append(f'tiempo {itinerario.tiempo_total_minutos} ≠ {tiempo_real}')
+            if itinerario.distancia_total_km != distancia_real:
+                diferencias.append(f'distancia {itinerario.distancia_total_km} ≠ {distancia_real}')
+            if dias_guardados.get(itinerario.id, {}) != dias_reales.get(itinerario.id, {}):
+                diferencias.append('resumen por día')
+
+            if not diferencias:
+                continue
+
+            desviados += 1
+            self.stdout.write(f'  ⚠️ {itinerario.nombre} (id {itinerario.id}): {", ".join(diferencias)}')
+
+            if not options['solo_revisar']:
+                itinerario.calcular_totales()
+                self.stdout.write(f'     ✓ Reparado')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {revisados} itinerarios revisados'))
+        if desviados:
+            accion = 'detectados' if options['solo_revisar'] else 'reparados'
+            self.stdout.write(self.style.WARNING(f'   {desviados} con desviaciones ({accion})'))
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-19 12:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0002_alter_destino_imagen_principal_and_more'),
+        ('itinerarios', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemitinerario',
+            name='actividad',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='items_itinerario', to='lugares.actividad'),
+        ),
+        migrations.AddField(
+            model_name='itemitinerario',
+            name='costo',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='itemitinerario',
+            name='duracion_minutos',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Rellena costo, duracion_minutos y actividad de los items existentes
+# a partir de sus notas y horarios.
+
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import re
+
+from django.db import migrations
+
+PATRON_COSTO = re.compile(r'S/\s*(\d+\.?\d*)')
+PATRON_ACTIVIDAD = re.compile(r'Actividad:\s*(.+)')
+
+
+def _duracion(hora_inicio, hora_fin):
+    inicio_dt = datetime.combine(datetime.today(), hora_inicio)
+    fin_dt = datetime.combine(datetime.today(), hora_fin)
+    if fin_dt < inicio_dt:
+        fin_dt += timedelta(days=1)
+    return int((fin_dt - inicio_dt).seconds / 60)
+
+
+def rellenar_items(apps, schema_editor):
+    ItemItinerario = apps.get_model('itinerarios', 'ItemItinerario')
+    Actividad = apps.get_model('lugares', 'Actividad')
+
+    # (destino_id, nombre) -> id de la actividad, en una sola consulta;
+    # con nombres repetidos gana el id menor, como first()
+    actividades = {}
+    for actividad_id, destino_id, nombre in Actividad.objects.order_by('id').values_list('id', 'destino_id', 'nombre'):
+        actividades.setdefault((destino_id, nombre), actividad_id)
+
+    items = ItemItinerario.objects.select_related('destino').iterator(chunk_size=500)
+    lote = []
+
+    for item in items:
+        costo = None
+        if item.notas and 'Costo:' in item.notas:
+            match = PATRON_COSTO.search(item.notas)
+            if match:
+                try:
+                    costo = Decimal(match.group(1))
+                except InvalidOperation:
+                    costo = None
+        if costo is None:
+            costo = item.destino.costo_entrada
+
+        actividad_id = None
+        match = PATRON_ACTIVIDAD.search(item.notas or '')
+        if match:
+            actividad_id = actividades.get((item.destino_id, match.group(1).strip()))
+
+        item.costo = costo
+        item.duracion_minutos = _duracion(item.hora_inicio, item.hora_fin)
+        item.actividad_id = actividad_id
+        lote.append(item)
+
+        if len(lote) >= 500:
+            ItemItinerario.objects.bulk_update(lote, ['costo', 'duracion_minutos', 'actividad'])
+            lote = []
+
+    if lote:
+        ItemItinerario.objects.bulk_update(lote, ['costo', 'duracion_minutos', 'actividad'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('itinerarios', '0003_item_costo_duracion_actividad'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.25 on 2026-10-19 12:33
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def rellenar_resumen(apps, schema_editor):
+    ItemItinerario = apps.get_model('itinerarios', 'ItemItinerario')
+    ResumenDiaItinerario = apps.get_model('itinerarios', 'ResumenDiaItinerario')
+
+    filas = (
+        ItemItinerario.objects.order_by()
+        .values('itinerario_id', 'dia')
+        .annotate(num_actividades=Count('id'), costo=Sum('costo'), tiempo_minutos=Sum('duracion_minutos'))
+    )
+    ResumenDiaItinerario.objects.bulk_create([
+        ResumenDiaItinerario(
+            itinerario_id=fila['itinerario_id'],
+            dia=fila['dia'],
+            num_actividades=fila['num_actividades'],
+            costo=fila['costo'] or 0,
+            tiempo_minutos=fila['tiempo_minutos'] or 0,
+        )
+        for fila in filas
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('itinerarios', '0004_backfill_item_costo_duracion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiaItinerario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.IntegerField()),
+                ('num_actividades', models.IntegerField(default=0)),
+                ('costo', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('tiempo_minutos', models.IntegerField(default=0)),
+                ('itinerario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_dias', to='itinerarios.itinerario')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Día',
+                'verbose_name_plural': 'Resúmenes de Día',
+                'ordering': ['itinerario', 'dia'],
+                'unique_together': {('itinerario', 'dia')},
+            },
+        ),
+        migrations.RunPython(rellenar_resumen, migrations.RunPython.noop),
+    ]
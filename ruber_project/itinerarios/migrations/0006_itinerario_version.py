@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('itinerarios', '0005_resumendiaitinerario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itinerario',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
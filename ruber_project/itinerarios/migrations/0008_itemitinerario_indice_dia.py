@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('itinerarios', '0007_tareageneracion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemitinerario',
+            index=models.Index(fields=['itinerario', 'dia', 'hora_inicio'], name='item_itinerario_dia_idx'),
+        ),
+    ]
@@ -1,9 +1,10 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, Sum, F, Q
 from usuarios.models import Turista
-from lugares.models import Destino
+from lugares.models import Destino, Actividad
 from datetime import datetime, timedelta
 from decimal import Decimal
-import re
+
 class Itinerario(models.Model):
     """
     Plan de viaje generado para un turista
@@ -23,11 +24,16 @@ class Itinerario(models.Model):
     fecha_inicio = models.DateField()
     fecha_fin = models.DateField()
     
+    DISTANCIA_ENTRE_DESTINOS_KM = Decimal('5.00')
+    
     # Cálculos automáticos
     costo_total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     tiempo_total_minutos = models.IntegerField(default=0)
     distancia_total_km = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     
+    # Se incrementa cada vez que cambian los items (invalida el resumen en caché)
+    version = models.PositiveIntegerField(default=0)
+    
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='borrador')
     
     fecha_creacion = models.DateTimeField(auto_now_add=True)
@@ -43,64 +49,75 @@ class Itinerario(models.Model):
     
     def calcular_totales(self):
         """
-        Calcula y actualiza los totales del itinerario:
+        Recalcula desde cero los totales del itinerario y su resumen por día:
         - costo_total: suma de costos REALES de las actividades
         - tiempo_total_minutos: suma de duraciones REALES
         - distancia_total_km: estimación basada en número de destinos
         
-        CORREGIDO: Ahora extrae los costos de las notas si están disponibles
+        Los cambios de un solo item se aplican de forma incremental con
+        aplicar_delta(); este método queda para generación completa y para
+        reparar desviaciones (comando reconciliar_totales).
         """
-        items = self.items.all().select_related('destino')
+        totales = self.items.aggregate(
+            costo=Sum('costo'),
+            tiempo=Sum('duracion_minutos'),
+            destinos=Count('destino', distinct=True),
+        )
         
-        costo_total = Decimal('0.00')
-        tiempo_total = 0
-        destinos_unicos = set()
+        costo_total = totales['costo'] or Decimal('0.00')
+        tiempo_total = totales['tiempo'] or 0
+        distancia_estimada = self.estimar_distancia(totales['destinos'])
         
-        for item in items:
-            # Registrar destino único
-            destinos_unicos.add(item.destino.id)
-            
-            # CALCULAR TIEMPO: Diferencia entre hora_inicio y hora_fin
-            if item.hora_inicio and item.hora_fin:
-                inicio_dt = datetime.combine(datetime.today(), item.hora_inicio)
-                fin_dt = datetime.combine(datetime.today(), item.hora_fin)
-                
-                # Manejar casos donde hora_fin es al día siguiente
-                if fin_dt < inicio_dt:
-                    fin_dt += timedelta(days=1)
-                
-                duracion_minutos = (fin_dt - inicio_dt).seconds / 60
-                tiempo_total += int(duracion_minutos)
-            
-            # CALCULAR COSTO: Intentar extraer de las notas primero
-            costo_item = None
-            
-            # Intentar parsear el costo de las notas (formato: "💰 Costo: S/ 50.00")
-            if item.notas and 'Costo:' in item.notas:
-                try:
-                    # Buscar el patrón "S/ XX.XX" en las notas
-                    import re
-                    match = re.search(r'S/\s*(\d+\.?\d*)', item.notas)
-                    if match:
-                        costo_item = Decimal(match.group(1))
-                except:
-                    pass
-            
-            # Si no se pudo extraer, usar costo del destino
-            if costo_item is None:
-                costo_item = item.destino.costo_entrada
+        with transaction.atomic():
+            # Actualizar campos
+            self.costo_total = costo_total
+            self.tiempo_total_minutos = tiempo_total
+            self.distancia_total_km = distancia_estimada
+            self.save(update_fields=['costo_total', 'tiempo_total_minutos', 'distancia_total_km'])
+            Itinerario.objects.filter(id=self.id).update(version=F('version') + 1)
+            self.refresh_from_db(fields=['version'])
             
-            costo_total += costo_item
-        
-        # Estimar distancia (5km entre cada destino)
-        num_destinos = len(destinos_unicos)
-        distancia_estimada = Decimal(str((num_destinos - 1) * 5)) if num_destinos > 1 else Decimal('0.00')
-        
-        # Actualizar campos
-        self.costo_total = costo_total
-        self.tiempo_total_minutos = tiempo_total
-        self.distancia_total_km = distancia_estimada
-        self.save(update_fields=['costo_total', 'tiempo_total_minutos', 'distancia_total_km'])
+            # Reconstruir resumen por día
+            self.resumen_dias.all().delete()
+            ResumenDiaItinerario.objects.bulk_create([
+                ResumenDiaItinerario(
+                    itinerario=self,
+                    dia=fila['dia'],
+                    num_actividades=fila['num_actividades'],
+                    costo=fila['costo'] or Decimal('0.00'),
+                    tiempo_minutos=fila['tiempo_minutos'] or 0,
+                )
+                for fila in self.items.order_by().values('dia').annotate(
+                    num_actividades=Count('id'),
+                    costo=Sum('costo'),
+                    tiempo_minutos=Sum('duracion_minutos'),
+                )
+            ])
+    
+    @classmethod
+    def estimar_distancia(cls, num_destinos):
+        """Estimar distancia (5km entre cada destino)"""
+        if num_destinos > 1:
+            return (num_destinos - 1) * cls.DISTANCIA_ENTRE_DESTINOS_KM
+        return Decimal('0.00')
+    
+    @classmethod
+    def aplicar_delta(cls, itinerario_id, dia, actividades=0, costo=Decimal('0.00'), minutos=0,
+                      distancia=Decimal('0.00')):
+        """
+        Aplica de forma atómica el cambio de un item sobre los totales
+        del itinerario y sobre el resumen de su día, usando expresiones F().
+        Con distancia=None la distancia vuelve a cero (itinerario sin items).
+        """
+        with transaction.atomic():
+            cls.objects.filter(id=itinerario_id).update(
+                costo_total=F('costo_total') + costo,
+                tiempo_total_minutos=F('tiempo_total_minutos') + minutos,
+                distancia_total_km=(Decimal('0.00') if distancia is None
+                                    else F('distancia_total_km') + distancia),
+                version=F('version') + 1,
+            )
+            ResumenDiaItinerario.aplicar_delta(itinerario_id, dia, actividades, costo, minutos)
 
 
 class ItemItinerario(models.Model):
@@ -109,12 +126,18 @@ class ItemItinerario(models.Model):
     """
     itinerario = models.ForeignKey(Itinerario, on_delete=models.CASCADE, related_name='items')
     destino = models.ForeignKey(Destino, on_delete=models.CASCADE)
+    actividad = models.ForeignKey(Actividad, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='items_itinerario')
     
     orden = models.IntegerField()
     dia = models.IntegerField(help_text="Día del itinerario (1, 2, 3...)")
     hora_inicio = models.TimeField()
     hora_fin = models.TimeField()
     
+    # Valores reales del item (antes se extraían de las notas)
+    costo = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
+    duracion_minutos = models.IntegerField(default=0)
+    
     notas = models.TextField(blank=True)
     
     class Meta:
@@ -122,6 +145,157 @@ class ItemItinerario(models.Model):
         verbose_name_plural = "Items de Itinerario"
         ordering = ['itinerario', 'orden']
         unique_together = ['itinerario', 'orden']
+        # (itinerario, orden) ya tiene el índice único; este sirve la agenda y el resumen por día
+        indexes = [
+            models.Index(fields=['itinerario', 'dia', 'hora_inicio'], name='item_itinerario_dia_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Día {self.dia} - {self.destino.nombre}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._guardar_estado_original()
+        return instancia
+    
+    def _guardar_estado_original(self):
+        """Valores que afectan a los totales, tal como están en la base de datos"""
+        self._estado_original = {
+            'dia': self.__dict__.get('dia'),
+            'destino_id': self.__dict__.get('destino_id'),
+            'costo': self.__dict__.get('costo'),
+            'duracion_minutos': self.__dict__.get('duracion_minutos'),
+        }
+    
+    def save(self, *args, **kwargs):
+        # La duración siempre refleja el horario asignado
+        self.duracion_minutos = self.calcular_duracion(self.hora_inicio, self.hora_fin)
+        super().save(*args, **kwargs)
+    
+    def delta_distancia(self, destino_id, al_eliminar=False):
+        """
+        Cambio de distancia del itinerario al sumar este item con destino_id,
+        comparando con el resto de sus items. Al eliminarlo es el valor negado,
+        o None si el itinerario queda vacío (la distancia vuelve a cero).
+        """
+        otros = ItemItinerario.objects.filter(itinerario_id=self.itinerario_id).exclude(pk=self.pk).aggregate(
+            total=Count('id'),
+            mismo_destino=Count('id', filter=Q(destino_id=destino_id)),
+        )
+        if al_eliminar and not otros['total']:
+            return None
+        
+        delta = Decimal('0.00')
+        if otros['total'] and not otros['mismo_destino']:
+            delta = Itinerario.DISTANCIA_ENTRE_DESTINOS_KM
+        return -delta if al_eliminar else delta
+    
+    @staticmethod
+    def calcular_duracion(hora_inicio, hora_fin):
+        """Minutos entre hora_inicio y hora_fin (hora_fin puede ser del día siguiente)"""
+        if not hora_inicio or not hora_fin:
+            return 0
+        
+        inicio_dt = datetime.combine(datetime.today(), hora_inicio)
+        fin_dt = datetime.combine(datetime.today(), hora_fin)
+        
+        if fin_dt < inicio_dt:
+            fin_dt += timedelta(days=1)
+        
+        return int((fin_dt - inicio_dt).seconds / 60)
+
+
+class ResumenDiaItinerario(models.Model):
+    """
+    Totales de un día del itinerario, mantenidos de forma incremental
+    """
+    itinerario = models.ForeignKey(Itinerario, on_delete=models.CASCADE, related_name='resumen_dias')
+    dia = models.IntegerField()
+    
+    num_actividades = models.IntegerField(default=0)
+    costo = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    tiempo_minutos = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Resumen de Día"
+        verbose_name_plural = "Resúmenes de Día"
+        ordering = ['itinerario', 'dia']
+        unique_together = ['itinerario', 'dia']
+    
+    def __str__(self):
+        return f"Día {self.dia} - {self.num_actividades} actividades"
+    
+    @classmethod
+    def aplicar_delta(cls, itinerario_id, dia, actividades, costo, minutos):
+        """Suma el cambio al día indicado; crea o elimina la fila según haga falta"""
+        filas = cls.objects.filter(itinerario_id=itinerario_id, dia=dia)
+        cambios = {
+            'num_actividades': F('num_actividades') + actividades,
+            'costo': F('costo') + costo,
+            'tiempo_minutos': F('tiempo_minutos') + minutos,
+        }
+        
+        if not filas.update(**cambios) and actividades > 0:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        itinerario_id=itinerario_id,
+                        dia=dia,
+                        num_actividades=actividades,
+                        costo=costo,
+                        tiempo_minutos=minutos,
+                    )
+            except IntegrityError:
+                # Otra petición creó el día al mismo tiempo
+                filas.update(**cambios)
+        
+        filas.filter(num_actividades__lte=0).delete()
+
+
+class TareaGeneracion(models.Model):
+    """
+    Solicitud de generación de itinerario encolada en la base de datos;
+    la atiende el comando procesar_tareas fuera de la petición web
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completada', 'Completada'),
+        ('error', 'Error'),
+    ]
+    
+    turista = models.ForeignKey(Turista, on_delete=models.CASCADE, related_name='tareas_generacion')
+    nombre = models.CharField(max_length=200)
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    itinerario = models.ForeignKey(
+        Itinerario,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    error = models.TextField(blank=True)
+    intentos = models.PositiveIntegerField(default=0)
+    
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio_proceso = models.DateTimeField(null=True, blank=True)
+    fecha_fin_proceso = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Tarea de Generación"
+        verbose_name_plural = "Tareas de Generación"
+        ordering = ['fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
     
     def __str__(self):
-        return f"Día {self.dia} - {self.destino.nombre}"
\ No newline at end of file
+        return f"{self.nombre} ({self.get_estado_display()})"
+    
+    @property
+    def terminada(self):
+        return self.estado in ('completada', 'error')
@@ -0,0 +1,358 @@
+"""
+Puntuación vectorizada de destinos con NumPy.
+
+No importa modelos de Django: el catálogo se construye una vez en el
+proceso principal y se envía a los procesos de trabajo de la generación
+por lotes.
+"""
+import random
+import numpy as np
+
+
+class CatalogoPuntuacion:
+    """
+    Instantánea de los destinos activos codificada como arreglos:
+    calificaciones, costos, número de actividades y pertenencia a tags
+    """
+
+    # Celdas usuario x destino que se puntúan a la vez (acota la memoria)
+    MAX_CELDAS_BLOQUE = 2_000_000
+
+    def __init__(self, destino_ids, calificaciones, costos_entrada, num_actividades,
+                 costos_minimos, tags_destinos, actividades=None,
+                 pesos=(0.4, 0.35, 0.15, 0.1), costo_default=20.0):
+        """
+        Args:
+            destino_ids: ids de los destinos, en el orden de desempate
+            calificaciones: calificación de cada destino (0 = sin calificar)
+            costos_entrada: costo de entrada de cada destino
+            num_actividades: actividades registradas por destino
+            costos_minimos: costo de la actividad disponible más barata (None si no hay)
+            tags_destinos: lista de tags por destino
+            actividades: por destino, lista de (actividad_id, tipo, costo) disponibles
+            pesos: (calificación, preferencia, costo, popularidad)
+            costo_default: costo de un destino sin entrada ni actividades
+        """
+        self.destino_ids = np.asarray(destino_ids, dtype=np.int64)
+
+        calificaciones = np.asarray(calificaciones, dtype=np.float64)
+        self.score_calificacion = np.where(calificaciones > 0, calificaciones, 3.0) / 5.0
+
+        self.costos_entrada = np.asarray(costos_entrada, dtype=np.float64)
+        self.num_actividades = np.asarray(num_actividades, dtype=np.float64)
+
+        # Costo con el que cada destino entra al presupuesto
+        costos_minimos = np.array(
+            [np.nan if c is None else c for c in costos_minimos], dtype=np.float64
+        )
+        entrada_o_default = np.where(self.costos_entrada > 0, self.costos_entrada, costo_default)
+        self.costos_item = np.where(np.isnan(costos_minimos), entrada_o_default, costos_minimos)
+
+        # Matriz destinos x tags (1 si el destino tiene el tag)
+        tags_normalizados = [
+            {str(tag).strip().lower() for tag in (tags or [])} for tags in tags_destinos
+        ]
+        self.vocabulario = {
+            tag: i for i, tag in enumerate(sorted(set().union(*tags_normalizados)))
+        } if tags_normalizados else {}
+        self.matriz_tags = np.zeros((len(self.destino_ids), len(self.vocabulario)), dtype=np.float32)
+        for i, tags in enumerate(tags_normalizados):
+            for tag in tags:
+                self.matriz_tags[i, self.vocabulario[tag]] = 1.0
+
+        self.actividades = actividades or [[] for _ in range(len(self.destino_ids))]
+        self.pesos = pesos
+        self._tags_con_subcadena = {}
+
+    def __len__(self):
+        return len(self.destino_ids)
+
+    def tags_con_subcadena(self, preferencia):
+        """Índices de los tags que contienen la preferencia (memorizado por preferencia)"""
+        indices = self._tags_con_subcadena.get(preferencia)
+        if indices is None:
+            indices = [i for tag, i in self.vocabulario.items() if preferencia in tag]
+            self._tags_con_subcadena[preferencia] = indices
+        return indices
+
+    def codificar_preferencias(self, preferencias_usuarios):
+        """
+        Matrices usuarios x tags de cada usuario y número de preferencias
+        de cada uno (incluye las que no son tags):
+        - exactas: el tag es una de sus preferencias (puntúa)
+        - subcadenas: alguna preferencia está contenida en el tag (decide
+          quién es candidato, como el tags_preferencias__icontains original:
+          'arte' también encuentra destinos con el tag 'artesanía')
+        """
+        exactas = np.zeros((len(preferencias_usuarios), len(self.vocabulario)), dtype=np.float32)
+        subcadenas = np.zeros_like(exactas)
+        num_preferencias = np.zeros(len(preferencias_usuarios), dtype=np.float64)
+
+        for i, preferencias in enumerate(preferencias_usuarios):
+            num_preferencias[i] = len(preferencias)
+            for pref in preferencias:
+                indice = self.vocabulario.get(pref)
+                if indice is not None:
+                    exactas[i, indice] = 1.0
+                subcadenas[i, self.tags_con_subcadena(pref)] = 1.0
+
+        return exactas, subcadenas, num_preferencias
+
+    def puntuar(self, preferencias_usuarios, presupuestos):
+        """
+        Puntúa todos los destinos para varios usuarios en una sola expresión
+
+        Args:
+            preferencias_usuarios: lista de preferencias (en minúsculas) por usuario
+            presupuestos: presupuesto máximo por usuario (None = sin límite)
+
+        Returns:
+            matriz usuarios x destinos; -inf en los destinos que no son candidatos
+        """
+        preferencias, subcadenas, num_preferencias = self.codificar_preferencias(preferencias_usuarios)
+        presupuestos = np.array([p if p else np.nan for p in presupuestos], dtype=np.float64)
+
+        con_preferencias = (num_preferencias > 0)[:, None]
+        con_presupuesto = (presupuestos > 0)[:, None]
+        presupuestos = presupuestos[:, None]
+
+        coincidencias = preferencias @ self.matriz_tags.T
+
+        # Candidatos: algún tag que contenga una preferencia y entrada dentro del presupuesto
+        candidatos = np.where(con_preferencias, (subcadenas @ self.matriz_tags.T) > 0, True)
+        with np.errstate(invalid='ignore'):
+            candidatos &= np.where(con_presupuesto, self.costos_entrada <= presupuestos, True)
+
+        score_preferencias = np.where(
+            con_preferencias, coincidencias / np.maximum(num_preferencias, 1)[:, None], 0.5
+        )
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score_costo = np.where(
+                con_presupuesto, np.clip(1 - self.costos_entrada / presupuestos, 0.0, 1.0), 0.5
+            )
+
+        max_actividades = np.max(np.where(candidatos, self.num_actividades, 0.0), axis=1, initial=0.0)[:, None]
+        score_popularidad = np.where(
+            max_actividades > 0, self.num_actividades / np.maximum(max_actividades, 1.0), 0.5
+        )
+
+        peso_calificacion, peso_preferencia, peso_costo, peso_popularidad = self.pesos
+        scores = (
+            peso_calificacion * self.score_calificacion +
+            peso_preferencia * score_preferencias +
+            peso_costo * score_costo +
+            peso_popularidad * score_popularidad
+        )
+
+        return np.where(candidatos, scores, -np.inf)
+
+    def tamano_bloque(self):
+        """Usuarios a puntuar juntos sin exceder MAX_CELDAS_BLOQUE"""
+        return max(1, self.MAX_CELDAS_BLOQUE // max(len(self), 1))
+
+
+def top_k(scores, k):
+    """
+    Índices de los k mejores scores (de mayor a menor, desempate por índice)
+    sin ordenar el arreglo completo; excluye los -inf
+    """
+    validos = np.flatnonzero(scores > -np.inf)
+    if k < len(validos):
+        parte = np.argpartition(-scores[validos], k - 1)[:k]
+        validos = validos[parte]
+
+    return validos[np.lexsort((validos, -scores[validos]))]
+
+
+def seleccionar_con_presupuesto(catalogo, scores, presupuesto, maximo):
+    """
+    Toma los destinos de mayor score mientras quepan en el presupuesto
+    (el costo de cada uno es su actividad más barata o su entrada)
+    """
+    k = maximo if not presupuesto else maximo * 8
+
+    while True:
+        seleccionados = []
+        costo_acumulado = 0.0
+        candidatos = top_k(scores, k)
+
+        for indice in candidatos:
+            if len(seleccionados) >= maximo:
+                break
+
+            costo_item = catalogo.costos_item[indice]
+            if not presupuesto or costo_acumulado + costo_item <= presupuesto:
+                seleccionados.append(int(indice))
+                costo_acumulado += costo_item
+
+        # Si faltan destinos y quedan candidatos sin revisar, ampliar la búsqueda
+        if len(seleccionados) >= maximo or len(candidatos) < k:
+            return seleccionados
+        k *= 4
+
+
+def elegir_actividad(catalogo, indice, preferencias, rng):
+    """Elige una actividad disponible del destino (prioriza las de tipo preferido)"""
+    actividades = catalogo.actividades[indice]
+
+    if not actividades:
+        return None
+
+    if preferencias:
+        con_score = sorted(
+            actividades,
+            key=lambda actividad: 1.0 if str(actividad[1]).strip().lower() in preferencias else 0.0,
+            reverse=True,
+        )
+        return rng.choice(con_score[:3])[0]
+
+    return rng.choice(actividades)[0]
+
+
+class TablaAlias:
+    """
+    Método del alias (Vose): tras una preparación O(n), cada muestra
+    ponderada por peso cuesta O(1). También guarda las posiciones de
+    mayor a menor peso (por_peso) para recorrerlas sin reordenar
+    """
+
+    def __init__(self, pesos):
+        n = len(pesos)
+        self.pesos = [float(peso) for peso in pesos]
+        total = sum(self.pesos)
+        escalados = [peso * n / total for peso in self.pesos]
+
+        self.probabilidad = [1.0] * n
+        self.alias = list(range(n))
+
+        pequenos = [i for i, p in enumerate(escalados) if p < 1.0]
+        grandes = [i for i, p in enumerate(escalados) if p >= 1.0]
+
+        while pequenos and grandes:
+            pequeno = pequenos.pop()
+            grande = grandes.pop()
+
+            self.probabilidad[pequeno] = escalados[pequeno]
+            self.alias[pequeno] = grande
+
+            escalados[grande] = escalados[grande] + escalados[pequeno] - 1.0
+            (pequenos if escalados[grande] < 1.0 else grandes).append(grande)
+
+        self.por_peso = sorted(range(n), key=self.pesos.__getitem__, reverse=True)
+
+    def __len__(self):
+        return len(self.probabilidad)
+
+    def muestrear(self, rng):
+        """Posición elegida con probabilidad proporcional a su peso"""
+        i = rng.randrange(len(self.probabilidad))
+        return i if rng.random() < self.probabilidad[i] else self.alias[i]
+
+
+def muestrear_diverso(tabla, indices, k, aceptar, categorias, rng, diversidad=0.7, intentos_por_item=20):
+    """
+    Muestrea k candidatos distintos en O(k) intentos esperados:
+    - cada intento toma una posición de la tabla de alias (ponderada por score)
+    - aceptar(indice) decide si el candidato cabe (p. ej. en el presupuesto)
+    - diversidad por rechazo: un candidato de una categoría ya elegida se
+      descarta con probabilidad `diversidad`. No es MMR: no resta una
+      similitud al score, solo baja la probabilidad de repetir categoría
+
+    Si se agotan los intentos, completa con los candidatos restantes de
+    mayor score (tabla.por_peso, ya ordenado al preparar la tabla): solo
+    se recorre hasta completar k, sin ordenar de nuevo.
+
+    Returns:
+        lista de índices elegidos
+    """
+    elegidos = []
+    descartados = set()
+    categorias_elegidas = set()
+
+    for _ in range(intentos_por_item * k):
+        if len(elegidos) >= k or len(descartados) >= len(tabla):
+            break
+
+        posicion = tabla.muestrear(rng)
+        if posicion in descartados:
+            continue
+
+        indice = indices[posicion]
+        if categorias[indice] in categorias_elegidas and rng.random() < diversidad:
+            continue
+
+        descartados.add(posicion)
+        if aceptar(indice):
+            elegidos.append(indice)
+            categorias_elegidas.add(categorias[indice])
+
+    if len(elegidos) < k:
+        # Primero categorías nuevas, luego cualquiera
+        for permitir_repetidas in (False, True):
+            for posicion in tabla.por_peso:
+                if len(elegidos) >= k:
+                    break
+                if posicion in descartados:
+                    continue
+                indice = indices[posicion]
+                if not permitir_repetidas and categorias[indice] in categorias_elegidas:
+                    continue
+                descartados.add(posicion)
+                if aceptar(indice):
+                    elegidos.append(indice)
+                    categorias_elegidas.add(categorias[indice])
+
+    return elegidos
+
+
+# ============================================
+# PROCESOS DE TRABAJO (GENERACIÓN POR LOTES)
+# ============================================
+
+_catalogo_worker = None
+_semilla_worker = None
+
+
+def inicializar_worker(catalogo, semilla):
+    """Guarda el catálogo una sola vez por proceso de trabajo"""
+    global _catalogo_worker, _semilla_worker
+    _catalogo_worker = catalogo
+    _semilla_worker = semilla
+
+
+def planificar_usuarios(catalogo, usuarios, maximo, semilla=None):
+    """
+    Elige destinos y actividades para un grupo de usuarios
+
+    Args:
+        usuarios: lista de (turista_id, preferencias en minúsculas, presupuesto)
+        maximo: destinos por itinerario
+
+    Returns:
+        lista de (turista_id, [(destino_id, actividad_id o None), ...])
+    """
+    planes = []
+    bloque = catalogo.tamano_bloque()
+
+    for inicio in range(0, len(usuarios), bloque):
+        grupo = usuarios[inicio:inicio + bloque]
+        scores = catalogo.puntuar([u[1] for u in grupo], [u[2] for u in grupo])
+
+        for fila, (turista_id, preferencias, presupuesto) in enumerate(grupo):
+            rng = random.Random(f'{semilla}-{turista_id}') if semilla is not None else random.Random()
+            preferencias_set = set(preferencias)
+
+            seleccion = seleccionar_con_presupuesto(catalogo, scores[fila], presupuesto, maximo)
+            planes.append((turista_id, [
+                (int(catalogo.destino_ids[indice]), elegir_actividad(catalogo, indice, preferencias_set, rng))
+                for indice in seleccion
+            ]))
+
+    return planes
+
+
+def planificar_en_worker(args):
+    """Punto de entrada de cada tarea del pool: (usuarios, maximo)"""
+    usuarios, maximo = args
+    return planificar_usuarios(_catalogo_worker, usuarios, maximo, _semilla_worker)
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+
+# El resumen se invalida por versión, el timeout solo libera memoria
+TIMEOUT_RESUMEN = 60 * 60 * 24
+
+
+def clave_resumen(itinerario):
+    """Clave de caché por itinerario y versión de sus items"""
+    return f'itinerario:{itinerario.id}:resumen:v{itinerario.version}'
+
+
+def construir_resumen(itinerario):
+    """
+    Métricas del dashboard de un itinerario en un diccionario serializable
+    a JSON (totales, estadísticas y datos para los gráficos)
+    """
+    resumen_dias = list(itinerario.resumen_dias.all())
+    
+    total_actividades = sum(resumen.num_actividades for resumen in resumen_dias)
+    total_destinos = itinerario.items.values('destino').distinct().count() if resumen_dias else 0
+    total_dias = len(resumen_dias) if resumen_dias else 1
+    
+    if resumen_dias:
+        datos_grafico = {
+            'dias': [f'Día {resumen.dia}' for resumen in resumen_dias],
+            'actividades': [resumen.num_actividades for resumen in resumen_dias],
+            'tiempo': [resumen.tiempo_minutos for resumen in resumen_dias],
+            'costo': [round(float(resumen.costo), 2) for resumen in resumen_dias],
+        }
+    else:
+        datos_grafico = {
+            'dias': ['Sin datos'],
+            'actividades': [0],
+            'tiempo': [0],
+            'costo': [0]
+        }
+    
+    return {
+        'itinerario_id': itinerario.id,
+        'version': itinerario.version,
+        'costo_total': float(itinerario.costo_total),
+        'tiempo_total_minutos': itinerario.tiempo_total_minutos,
+        'distancia_total_km': float(itinerario.distancia_total_km),
+        'total_actividades': total_actividades,
+        'total_destinos': total_destinos,
+        'total_dias': total_dias,
+        'promedio_actividades_dia': round(total_actividades / total_dias, 1),
+        'datos_grafico': datos_grafico,
+    }
+
+
+def obtener_resumen(itinerario):
+    """Resumen del dashboard desde la caché, construyéndolo si la versión cambió"""
+    clave = clave_resumen(itinerario)
+    resumen = cache.get(clave)
+    
+    if resumen is None:
+        resumen = construir_resumen(itinerario)
+        cache.set(clave, resumen, TIMEOUT_RESUMEN)
+    
+    return resumen
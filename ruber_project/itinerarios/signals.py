@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+from decimal import Decimal
+import threading
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from lugares.models import Destino, Actividad
+from .catalogo import invalidar_catalogo
+from .models import Itinerario, ItemItinerario
+
+_estado = threading.local()
+
+
+@contextmanager
+def totales_suspendidos():
+    """
+    Desactiva el mantenimiento incremental de totales dentro del bloque;
+    quien lo usa debe llamar a calcular_totales() al terminar
+    """
+    anterior = getattr(_estado, 'suspendido', False)
+    _estado.suspendido = True
+    try:
+        yield
+    finally:
+        _estado.suspendido = anterior
+
+
+@receiver(post_save, sender=ItemItinerario)
+def aplicar_cambio_item(sender, instance, created, raw=False, **kwargs):
+    """Mantiene los totales del itinerario al crear o editar un item"""
+    if raw or getattr(_estado, 'suspendido', False):
+        return
+    
+    original = getattr(instance, '_estado_original', None)
+    
+    if created or original is None:
+        Itinerario.aplicar_delta(
+            instance.itinerario_id,
+            instance.dia,
+            actividades=1,
+            costo=Decimal(str(instance.costo)),
+            minutos=instance.duracion_minutos,
+            distancia=instance.delta_distancia(instance.destino_id),
+        )
+    else:
+        costo_anterior = Decimal(str(original['costo'] or 0))
+        minutos_anteriores = original['duracion_minutos'] or 0
+        costo_nuevo = Decimal(str(instance.costo))
+        
+        distancia = Decimal('0.00')
+        if original['destino_id'] != instance.destino_id:
+            distancia = (instance.delta_distancia(instance.destino_id)
+                         - instance.delta_distancia(original['destino_id']))
+        
+        if original['dia'] != instance.dia:
+            # El item cambia de día: sale del anterior y entra en el nuevo
+            Itinerario.aplicar_delta(
+                instance.itinerario_id, original['dia'], actividades=-1,
+                costo=-costo_anterior, minutos=-minutos_anteriores,
+            )
+            Itinerario.aplicar_delta(
+                instance.itinerario_id, instance.dia, actividades=1,
+                costo=costo_nuevo, minutos=instance.duracion_minutos, distancia=distancia,
+            )
+        elif (costo_nuevo != costo_anterior
+              or instance.duracion_minutos != minutos_anteriores
+              or distancia):
+            Itinerario.aplicar_delta(
+                instance.itinerario_id, instance.dia,
+                costo=costo_nuevo - costo_anterior,
+                minutos=instance.duracion_minutos - minutos_anteriores,
+                distancia=distancia,
+            )
+    
+    instance._guardar_estado_original()
+
+
+@receiver(post_delete, sender=ItemItinerario)
+def descontar_item(sender, instance, **kwargs):
+    """Descuenta el item eliminado de los totales del itinerario"""
+    if getattr(_estado, 'suspendido', False):
+        return
+    
+    origen = kwargs.get('origin')
+    if isinstance(origen, Itinerario) or getattr(origen, 'model', None) is Itinerario:
+        # Se elimina el itinerario completo: no hay totales que mantener
+        return
+    
+    original = getattr(instance, '_estado_original', None) or {}
+    
+    Itinerario.aplicar_delta(
+        instance.itinerario_id,
+        original.get('dia', instance.dia),
+        actividades=-1,
+        costo=-Decimal(str(original.get('costo', instance.costo) or 0)),
+        minutos=-(original.get('duracion_minutos', instance.duracion_minutos) or 0),
+        distancia=instance.delta_distancia(original.get('destino_id', instance.destino_id), al_eliminar=True),
+    )
+
+
+@receiver([post_save, post_delete], sender=Destino)
+@receiver([post_save, post_delete], sender=Actividad)
+def refrescar_catalogo(sender, **kwargs):
+    """El catálogo de generación en memoria deja de ser válido"""
+    invalidar_catalogo()
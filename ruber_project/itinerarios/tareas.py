@@ -0,0 +1,124 @@
+"""
+Cola de generación de itinerarios respaldada por la base de datos.
+
+La vista solo encola la solicitud; el comando procesar_tareas (uno o
+varios procesos locales) la toma y ejecuta GeneradorItinerarios fuera
+de la petición web. No necesita un broker externo, pero sin ese
+comando corriendo las tareas se quedan pendientes: pasado
+ESPERA_MAXIMA_COLA la página de espera deja de sondear y lo avisa.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .generators import GeneradorItinerarios
+from .models import TareaGeneracion
+
+# Una tarea "en proceso" por más tiempo se considera abandonada (worker caído)
+TIEMPO_MAXIMO_PROCESO = timedelta(minutes=10)
+MAX_INTENTOS = 3
+
+# Una tarea pendiente por más tiempo indica que ningún worker atiende la cola
+ESPERA_MAXIMA_COLA = timedelta(minutes=2)
+
+
+def encolar_generacion(turista, nombre, fecha_inicio, fecha_fin):
+    """Registra la solicitud y devuelve la tarea pendiente"""
+    return TareaGeneracion.objects.create(
+        turista=turista,
+        nombre=nombre,
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+    )
+
+
+def cola_demorada(tarea):
+    """True si la tarea sigue pendiente más de ESPERA_MAXIMA_COLA (¿procesar_tareas no corre?)"""
+    return tarea.estado == 'pendiente' and timezone.now() - tarea.fecha_creacion > ESPERA_MAXIMA_COLA
+
+
+def tomar_siguiente():
+    """
+    Reclama la tarea pendiente más antigua
+
+    El UPDATE condicional por estado garantiza que dos workers no tomen
+    la misma tarea (sin SELECT ... FOR UPDATE, que SQLite no soporta).
+
+    Returns:
+        TareaGeneracion en proceso, o None si la cola está vacía
+    """
+    while True:
+        tarea_id = (
+            TareaGeneracion.objects.filter(estado='pendiente')
+            .order_by('fecha_creacion', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if tarea_id is None:
+            return None
+        
+        reclamada = TareaGeneracion.objects.filter(id=tarea_id, estado='pendiente').update(
+            estado='en_proceso',
+            fecha_inicio_proceso=timezone.now(),
+            intentos=F('intentos') + 1,
+        )
+        if reclamada:
+            return TareaGeneracion.objects.select_related('turista').get(id=tarea_id)
+
+
+def procesar(tarea):
+    """
+    Genera el itinerario de una tarea reclamada y guarda el resultado
+
+    El itinerario y el estado de la tarea se guardan en la misma
+    transacción, y solo si la tarea sigue siendo de este intento: si el
+    worker cae a mitad de camino no queda un itinerario huérfano, y si
+    otro worker la reclamó entretanto (se dio por abandonada) el
+    resultado se descarta en lugar de duplicarse.
+    """
+    campos = ['estado', 'itinerario', 'error', 'fecha_fin_proceso']
+    mia = TareaGeneracion.objects.filter(id=tarea.id, estado='en_proceso', intentos=tarea.intentos)
+    try:
+        with transaction.atomic():
+            itinerario = GeneradorItinerarios(turista=tarea.turista).generar(
+                nombre_itinerario=tarea.nombre,
+                fecha_inicio=tarea.fecha_inicio,
+                fecha_fin=tarea.fecha_fin,
+            )
+            tarea.estado = 'completada'
+            tarea.itinerario = itinerario
+            tarea.error = ''
+            tarea.fecha_fin_proceso = timezone.now()
+            if not mia.update(**{campo: getattr(tarea, campo) for campo in campos}):
+                transaction.set_rollback(True)
+    except Exception as e:
+        tarea.estado = 'error'
+        tarea.itinerario = None
+        tarea.error = str(e)
+        tarea.fecha_fin_proceso = timezone.now()
+        mia.update(**{campo: getattr(tarea, campo) for campo in campos})
+    
+    tarea.refresh_from_db(fields=campos)
+    return tarea
+
+
+def recuperar_abandonadas():
+    """
+    Devuelve a la cola las tareas de un worker que murió a mitad de camino
+    (o las marca como error si ya agotaron sus intentos)
+
+    Returns:
+        (reencoladas, fallidas)
+    """
+    abandonadas = TareaGeneracion.objects.filter(
+        estado='en_proceso',
+        fecha_inicio_proceso__lt=timezone.now() - TIEMPO_MAXIMO_PROCESO,
+    )
+    fallidas = abandonadas.filter(intentos__gte=MAX_INTENTOS).update(
+        estado='error',
+        error='La generación no terminó tras varios intentos',
+        fecha_fin_proceso=timezone.now(),
+    )
+    reencoladas = abandonadas.update(estado='pendiente')
+    return reencoladas, fallidas
@@ -1,3 +1,372 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from decimal import Decimal
+import random
+from unittest import mock, skipUnless
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from lugares.models import Actividad, Categoria, Destino
+from lugares.tests import PlanesConsultaMixin
+from usuarios.models import Turista
+from .agenda import AgendaItinerario, ArbolIntervalos, ConflictoHorario
+from .catalogo import obtener_catalogo
+from .generators import GeneradorItinerarios, RegeneradorActividades
+from .puntuacion import CatalogoPuntuacion, TablaAlias, muestrear_diverso
+from .tareas import (
+    ESPERA_MAXIMA_COLA, MAX_INTENTOS, TIEMPO_MAXIMO_PROCESO, encolar_generacion, procesar,
+    recuperar_abandonadas, tomar_siguiente,
+)
+from .models import Itinerario, ItemItinerario, TareaGeneracion
 
-# Create your tests here.
+
+@skipUnless(connection.vendor == 'sqlite', 'Los planes se leen con EXPLAIN QUERY PLAN de SQLite')
+class IndicesItinerarioTests(PlanesConsultaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Museos')
+        cls.destinos = []
+        for i in range(12):
+            destino = Destino.objects.create(
+                nombre=f'Museo {i}', descripcion='Lugar de prueba', categoria=categoria,
+                latitud=Decimal('-12.1'), longitud=Decimal('-77.0'),
+                costo_entrada=Decimal(i % 3 * 10), tiempo_visita_estimado=60,
+                calificacion=Decimal(i % 5), tags_preferencias=['museos', 'historia'],
+            )
+            for costo in (30, 10, 20):
+                Actividad.objects.create(
+                    destino=destino, nombre=f'Visita {costo}', tipo='cultural',
+                    descripcion='', costo=Decimal(costo), duracion_minutos=60,
+                )
+            cls.destinos.append(destino)
+
+        cls.turista = Turista.objects.create_user(
+            username='viajero', password='clave-segura',
+            preferencias=['museos'], presupuesto_max=Decimal('500'),
+        )
+        cls.itinerario = Itinerario.objects.create(
+            turista=cls.turista, nombre='Lima', fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 1, 3),
+        )
+        for orden, destino in enumerate(cls.destinos[:6], start=1):
+            ItemItinerario.objects.create(
+                itinerario=cls.itinerario, destino=destino, orden=orden, dia=(orden - 1) // 3 + 1,
+                hora_inicio=time(9 + 2 * ((orden - 1) % 3)), hora_fin=time(10 + 2 * ((orden - 1) % 3)),
+                costo=Decimal('10'), duracion_minutos=60,
+            )
+
+    def assertItemsIndexados(self, consultas):
+        items = self.consultas_de(consultas, 'itinerarios_itemitinerario')
+        self.assertTrue(items)
+        for sql in items:
+            self.assertUsaIndice(sql, 'itinerarios_itemitinerario')
+
+    def test_agregar_destino(self):
+        self.client.force_login(self.turista)
+        destino = self.destinos[8]
+        respuesta, consultas = self.capturar(
+            self.client.post,
+            reverse('itinerarios:agregar_destino', args=[destino.id]),
+            {'itinerario_id': self.itinerario.id},
+        )
+        self.assertEqual(respuesta.status_code, 302)
+
+        # La actividad más barata llega con el destino (agregado precalculado)
+        self.assertFalse(self.consultas_de(consultas, 'lugares_actividad'))
+        self.assertEqual(self.itinerario.items.get(destino=destino).costo, Decimal('10'))
+
+        # Último orden (índice único itinerario, orden) y días de la agenda
+        self.assertItemsIndexados(consultas)
+        agenda, = self.consultas_de(consultas, 'itinerarios_itemitinerario', '"dia" IN')
+        self.assertUsaIndice(agenda, 'itinerarios_itemitinerario', 'item_itinerario_dia_idx')
+
+    def test_totales_y_resumen_por_dia(self):
+        _, consultas = self.capturar(self.itinerario.calcular_totales)
+        self.assertItemsIndexados(consultas)
+
+        por_dia, = self.consultas_de(consultas, 'itinerarios_itemitinerario', 'GROUP BY')
+        self.assertUsaIndice(por_dia, 'itinerarios_itemitinerario', 'item_itinerario_dia_idx')
+
+    def test_generador(self):
+        generador = GeneradorItinerarios(self.turista)
+        itinerario, consultas = self.capturar(generador.generar, 'Generado', date(2025, 2, 1), date(2025, 2, 2))
+
+        self.assertTrue(itinerario.items.exists())
+        self.assertItemsIndexados(consultas)
+
+
+class AgendaItinerarioTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Parques')
+        cls.destino = Destino.objects.create(
+            nombre='Parque', descripcion='Parque', categoria=categoria,
+            latitud=Decimal('-12.1'), longitud=Decimal('-77.0'), tiempo_visita_estimado=60,
+        )
+        turista = Turista.objects.create_user(username='agenda', password='clave-segura')
+        cls.itinerario = Itinerario.objects.create(
+            turista=turista, nombre='Agenda', fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 1, 2),
+        )
+        # Día 1: 10:00-11:00, 12:00-13:00 y 14:00-15:00
+        cls.items = [
+            ItemItinerario.objects.create(
+                itinerario=cls.itinerario, destino=cls.destino, orden=orden, dia=1,
+                hora_inicio=time(hora), hora_fin=time(hora + 1), costo=Decimal('10'),
+            )
+            for orden, hora in enumerate((10, 12, 14), start=1)
+        ]
+
+    def reprogramar(self, item, hora_inicio, hora_fin):
+        item = ItemItinerario.objects.get(pk=item.pk)
+        item.hora_inicio, item.hora_fin = hora_inicio, hora_fin
+        return AgendaItinerario(self.itinerario).reprogramar(item)
+
+    def horarios(self):
+        return [
+            (item.hora_inicio, item.hora_fin)
+            for item in ItemItinerario.objects.filter(itinerario=self.itinerario, dia=1).order_by('hora_inicio')
+        ]
+
+    def test_no_pisa_una_actividad_que_empieza_antes(self):
+        with self.assertRaises(ConflictoHorario):
+            self.reprogramar(self.items[1], time(10, 30), time(11, 30))
+
+    def test_misma_hora_de_inicio_es_conflicto_en_ambos_sentidos(self):
+        primero, segundo, _ = self.items
+        with self.assertRaises(ConflictoHorario):
+            self.reprogramar(segundo, time(10), time(11))
+        with self.assertRaises(ConflictoHorario):
+            self.reprogramar(primero, time(12), time(13))
+        self.assertEqual(len(set(self.horarios())), 3)
+
+    def test_no_termina_despues_de_la_jornada(self):
+        with self.assertRaises(ConflictoHorario):
+            self.reprogramar(self.items[2], time(21, 30), time(23, 50))
+        self.assertEqual(self.horarios()[-1], (time(14), time(15)))
+
+    def test_no_empieza_antes_de_la_jornada(self):
+        with self.assertRaises(ConflictoHorario):
+            self.reprogramar(self.items[0], time(8), time(9, 30))
+        self.assertEqual(self.horarios()[0], (time(10), time(11)))
+
+    def test_arbol_de_intervalos_sobre_el_rojo_negro(self):
+        rng = random.Random(7)
+        arbol, intervalos = ArbolIntervalos(), {}
+        for paso in range(400):
+            clave = rng.randrange(60)
+            if clave in intervalos and rng.random() < 0.4:
+                arbol.eliminar(clave)
+                del intervalos[clave]
+            else:
+                inicio = rng.randrange(0, 1000)
+                intervalos[clave] = (inicio, inicio + rng.randrange(1, 120))
+                arbol.insertar(*intervalos[clave], clave)
+
+            consulta = rng.randrange(0, 1000)
+            esperados = sorted(
+                ((inicio, fin, clave) for clave, (inicio, fin) in intervalos.items()
+                 if inicio < consulta + 50 and consulta < fin),
+                key=lambda intervalo: (intervalo[0], intervalo[2]),
+            )
+            self.assertEqual(arbol.solapados(consulta, consulta + 50), esperados, paso)
+            self.assertEqual(arbol.buscar_solapado(consulta, consulta + 50) is None, not esperados)
+
+        self.assertTrue(arbol.verificar_propiedades()[0])
+        self.assertEqual(len(arbol), arbol.cantidad_nodos)
+        self.assertEqual([clave for _, _, clave in arbol], sorted(intervalos, key=lambda clave: (intervalos[clave][0], clave)))
+
+    def test_desplaza_siguientes_con_buffer(self):
+        # Termina justo cuando empieza la siguiente: también se deja el buffer
+        desplazados = self.reprogramar(self.items[0], time(11), time(12))
+        self.assertEqual([item.pk for item in desplazados], [self.items[1].pk])
+        self.assertEqual(self.horarios(), [
+            (time(11), time(12)), (time(12, 30), time(13, 30)), (time(14), time(15)),
+        ])
+
+    def test_desplazamiento_fuera_de_la_jornada_no_guarda_nada(self):
+        with self.assertRaises(ConflictoHorario):
+            self.reprogramar(self.items[0], time(11), time(20, 30))
+        self.assertEqual(self.horarios(), [(time(10), time(11)), (time(12), time(13)), (time(14), time(15))])
+
+    def test_mejor_hueco(self):
+        agenda = AgendaItinerario(self.itinerario)
+        self.assertEqual(agenda.mejor_hueco(60), (1, time(15, 30), time(16, 30)))
+        self.assertEqual(agenda.mejor_hueco(7 * 60), (2, time(9), time(16)))
+
+        with self.assertRaises(ConflictoHorario):
+            agenda.mejor_hueco(14 * 60)
+
+        ItemItinerario.objects.create(
+            itinerario=self.itinerario, destino=self.destino, orden=4, dia=2,
+            hora_inicio=time(9), hora_fin=time(21), costo=Decimal('10'),
+        )
+        # El viaje termina el día 2: no se agenda un día 3
+        with self.assertRaises(ConflictoHorario):
+            AgendaItinerario(self.itinerario).mejor_hueco(120)
+
+
+class CatalogoGeneracionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categorias = [Categoria.objects.create(nombre=nombre) for nombre in ('Museos', 'Playas', 'Parques')]
+        cls.destinos = [
+            Destino.objects.create(
+                nombre=f'Lugar {i}', descripcion='Lugar', categoria=categorias[i % 3],
+                latitud=Decimal('-12.1'), longitud=Decimal('-77.0'), tiempo_visita_estimado=60,
+                costo_entrada=Decimal('15'), calificacion=Decimal(i % 5), tags_preferencias=['cultura'],
+            )
+            for i in range(9)
+        ]
+        cls.turista = Turista.objects.create_user(
+            username='regenera', password='clave-segura', preferencias=['cultura'], presupuesto_max=Decimal('40'),
+        )
+        cls.itinerario = Itinerario.objects.create(
+            turista=cls.turista, nombre='Regenerar', fecha_inicio=date(2025, 3, 1), fecha_fin=date(2025, 3, 1),
+        )
+
+    def test_un_cambio_en_destinos_recarga_el_catalogo(self):
+        catalogo = obtener_catalogo()
+        self.assertIs(obtener_catalogo(), catalogo)
+
+        destino = self.destinos[0]
+        destino.costo_entrada = Decimal('99')
+        destino.save()
+
+        recargado = obtener_catalogo()
+        self.assertIsNot(recargado, catalogo)
+        self.assertEqual(recargado.destinos[destino.id].costo_entrada, Decimal('99'))
+
+    def test_regenerar_respeta_presupuesto_y_semilla(self):
+        RegeneradorActividades(self.itinerario, semilla=7).regenerar_3_actividades()
+        primera = list(self.itinerario.items.order_by('orden').values_list('destino_id', flat=True))
+        # 40 de presupuesto con entradas de 15: caben dos destinos
+        self.assertEqual(len(primera), 2)
+        self.itinerario.refresh_from_db()
+        self.assertLessEqual(self.itinerario.costo_total, Decimal('40'))
+
+        RegeneradorActividades(self.itinerario, semilla=7).regenerar_3_actividades()
+        self.assertEqual(list(self.itinerario.items.order_by('orden').values_list('destino_id', flat=True)), primera)
+
+
+class PuntuacionTests(SimpleTestCase):
+
+    def test_preferencia_parcial_es_candidata_como_con_icontains(self):
+        catalogo = CatalogoPuntuacion(
+            destino_ids=[1, 2, 3], calificaciones=[4, 4, 4], costos_entrada=[0, 0, 0],
+            num_actividades=[1, 1, 1], costos_minimos=[None, None, None],
+            tags_destinos=[['Artesanía'], ['arte', 'historia'], ['playa']],
+        )
+        scores = catalogo.puntuar([['arte']], [None])[0]
+
+        # 'arte' está contenida en 'artesanía': candidato, pero sin puntos de preferencia
+        self.assertEqual([score > -float('inf') for score in scores], [True, True, False])
+        self.assertGreater(scores[1], scores[0])
+
+
+    def test_muestreo_completa_con_los_de_mayor_score(self):
+        tabla = TablaAlias([1.0, 5.0, 3.0, 4.0, 2.0])
+        self.assertEqual(tabla.por_peso, [1, 3, 2, 4, 0])
+
+        # Ningún intento al azar: todo sale del recorrido por score,
+        # primero categorías nuevas y sin pasar el presupuesto (descarta el 3)
+        elegidos = muestrear_diverso(
+            tabla, [10, 11, 12, 13, 14], 3, aceptar=lambda indice: indice != 13,
+            categorias={10: 'a', 11: 'a', 12: 'b', 13: 'c', 14: 'b'},
+            rng=random.Random(0), intentos_por_item=0,
+        )
+        self.assertEqual(elegidos, [11, 12, 14])
+
+class TareasGeneracionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Miradores')
+        Destino.objects.create(
+            nombre='Mirador', descripcion='Mirador', categoria=categoria,
+            latitud=Decimal('-12.1'), longitud=Decimal('-77.0'), tiempo_visita_estimado=60,
+            costo_entrada=Decimal('5'), tags_preferencias=['vistas'],
+        )
+        cls.turista = Turista.objects.create_user(
+            username='encolado', password='clave-segura', preferencias=['vistas'], presupuesto_max=Decimal('100'),
+        )
+
+    def encolar(self, nombre='Cola'):
+        return encolar_generacion(self.turista, nombre, date(2025, 4, 1), date(2025, 4, 2))
+
+    def test_toma_la_mas_antigua_una_sola_vez(self):
+        primera, segunda = self.encolar('Primera'), self.encolar('Segunda')
+
+        tomada = tomar_siguiente()
+        self.assertEqual(tomada.id, primera.id)
+        self.assertEqual((tomada.estado, tomada.intentos), ('en_proceso', 1))
+        self.assertEqual(tomar_siguiente().id, segunda.id)
+        self.assertIsNone(tomar_siguiente())
+
+        procesar(tomada)
+        tomada.refresh_from_db()
+        self.assertEqual(tomada.estado, 'completada')
+        self.assertTrue(tomada.itinerario.items.exists())
+
+    def test_un_fallo_no_deja_itinerario_huerfano(self):
+        self.encolar()
+        tarea = tomar_siguiente()
+        with mock.patch.object(ItemItinerario.objects, 'bulk_create', side_effect=DatabaseError('disco lleno')):
+            procesar(tarea)
+
+        self.assertEqual((tarea.estado, tarea.error, tarea.itinerario), ('error', 'disco lleno', None))
+        self.assertFalse(Itinerario.objects.exists())
+
+    def test_resultado_de_un_intento_reclamado_se_descarta(self):
+        self.encolar()
+        lenta = tomar_siguiente()
+        # Se dio por abandonada y otro worker la tomó de nuevo
+        TareaGeneracion.objects.filter(id=lenta.id).update(estado='pendiente')
+        otra = tomar_siguiente()
+
+        procesar(lenta)
+        self.assertEqual(lenta.estado, 'en_proceso')
+        self.assertFalse(Itinerario.objects.exists())
+
+        procesar(otra)
+        self.assertEqual(otra.estado, 'completada')
+        self.assertEqual(Itinerario.objects.get(), otra.itinerario)
+
+    def test_abandonadas_vuelven_a_la_cola_hasta_agotar_intentos(self):
+        self.encolar()
+        tarea = tomar_siguiente()
+        reciente = self.encolar('Reciente')
+        tomar_siguiente()
+
+        vieja = timezone.now() - TIEMPO_MAXIMO_PROCESO - timedelta(minutes=1)
+        TareaGeneracion.objects.filter(id=tarea.id).update(fecha_inicio_proceso=vieja)
+
+        # La reciente sigue en proceso: su worker puede estar vivo
+        self.assertEqual(recuperar_abandonadas(), (1, 0))
+        self.assertEqual(TareaGeneracion.objects.get(id=reciente.id).estado, 'en_proceso')
+
+        # Reintento: se toma de nuevo y cuenta otro intento
+        for intento in range(2, MAX_INTENTOS + 1):
+            tomada = tomar_siguiente()
+            self.assertEqual((tomada.id, tomada.intentos), (tarea.id, intento))
+            TareaGeneracion.objects.filter(id=tarea.id).update(fecha_inicio_proceso=vieja)
+            if intento < MAX_INTENTOS:
+                self.assertEqual(recuperar_abandonadas(), (1, 0))
+
+        self.assertEqual(recuperar_abandonadas(), (0, 1))
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, 'error')
+        self.assertIsNone(tomar_siguiente())
+
+    def test_sin_worker_la_espera_se_corta(self):
+        tarea = self.encolar()
+        self.client.force_login(self.turista)
+        url = reverse('itinerarios:estado_tarea', args=[tarea.id])
+        self.assertFalse(self.client.get(url).json()['demorada'])
+
+        TareaGeneracion.objects.filter(id=tarea.id).update(
+            fecha_creacion=timezone.now() - ESPERA_MAXIMA_COLA - timedelta(seconds=1)
+        )
+        self.assertTrue(self.client.get(url).json()['demorada'])
+        self.assertTrue(self.client.get(reverse('itinerarios:tarea', args=[tarea.id])).context['demorada'])
@@ -6,9 +6,12 @@ app_name = 'itinerarios'
 urlpatterns = [
     # Generación de itinerarios
     path('generar/', views.generar_itinerario, name='generar'),
+    path('tarea/<int:tarea_id>/', views.tarea_generacion, name='tarea'),
+    path('tarea/<int:tarea_id>/estado.json', views.estado_tarea, name='estado_tarea'),
     
     # Visualización
     path('<int:itinerario_id>/', views.detalle_itinerario, name='detalle'),
+    path('<int:itinerario_id>/resumen.json', views.resumen_itinerario, name='resumen'),
     path('mis-itinerarios/', views.mis_itinerarios, name='mis_itinerarios'),
     
     # Acciones sobre itinerarios
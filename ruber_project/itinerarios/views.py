@@ -2,15 +2,19 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
-from .models import Itinerario, ItemItinerario
+from django.urls import reverse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST, etag
+from .models import Itinerario, ItemItinerario, TareaGeneracion
 from .forms import GenerarItinerarioForm, EditarItemForm
-from .generators import GeneradorItinerarios, RegeneradorActividades
+from .generators import RegeneradorActividades
+from .tareas import cola_demorada, encolar_generacion
+from .resumen import obtener_resumen
+from .agenda import AgendaItinerario, ConflictoHorario
 from lugares.models import Actividad, Destino
-from datetime import datetime, timedelta
+from django.db.models import Count
+from datetime import datetime
 from decimal import Decimal
-import json
-import re
 
 @login_required
 def generar_itinerario(request):
@@ -31,31 +35,18 @@ def generar_itinerario(request):
                 )
                 return redirect('usuarios:perfil')
             
-            try:
-                generador = GeneradorItinerarios(turista=request.user)
-                itinerario = generador.generar(
-                    nombre_itinerario=datos['nombre'],
-                    fecha_inicio=datos['fecha_inicio'],
-                    fecha_fin=datos['fecha_fin']
-                )
-                
-                num_items = itinerario.items.count()
-                
-                if num_items > 0:
-                    messages.success(
-                        request, 
-                        f'¡Itinerario "{itinerario.nombre}" generado con {num_items} actividades!'
-                    )
-                else:
-                    messages.warning(
-                        request,
-                        'No se encontraron destinos que coincidan con tu perfil. Intenta ajustar tus preferencias o presupuesto.'
-                    )
-                
-                return redirect('itinerarios:detalle', itinerario_id=itinerario.id)
-                
-            except Exception as e:
-                messages.error(request, f'Error al generar itinerario: {str(e)}')
+            # La generación corre en el worker (procesar_tareas), no en la petición
+            tarea = encolar_generacion(
+                turista=request.user,
+                nombre=datos['nombre'],
+                fecha_inicio=datos['fecha_inicio'],
+                fecha_fin=datos['fecha_fin']
+            )
+            
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                return JsonResponse(_estado_tarea_json(tarea), status=202)
+            
+            return redirect('itinerarios:tarea', tarea_id=tarea.id)
     else:
         # Pre-llenar con nombre sugerido
         fecha_actual = datetime.now().strftime('%d/%m/%Y')
@@ -76,6 +67,67 @@ def generar_itinerario(request):
     return render(request, 'itinerarios/generar.html', context)
 
 
+def _estado_tarea_json(tarea):
+    """Datos de una tarea de generación para el sondeo desde el navegador"""
+    return {
+        'tarea_id': tarea.id,
+        'estado': tarea.estado,
+        'terminada': tarea.terminada,
+        'itinerario_id': tarea.itinerario_id,
+        'url_estado': reverse('itinerarios:estado_tarea', args=[tarea.id]),
+        'url_itinerario': reverse('itinerarios:detalle', args=[tarea.itinerario_id]) if tarea.itinerario_id else None,
+        'error': tarea.error or None,
+        # Nadie atiende la cola: el navegador deja de sondear
+        'demorada': cola_demorada(tarea),
+    }
+
+
+@login_required
+def tarea_generacion(request, tarea_id):
+    """
+    Página de espera mientras el worker genera el itinerario;
+    al terminar redirige al detalle (o de vuelta al formulario si falló)
+    """
+    tarea = get_object_or_404(TareaGeneracion, id=tarea_id, turista=request.user)
+    
+    if tarea.estado == 'completada' and tarea.itinerario_id:
+        num_items = tarea.itinerario.items.count()
+        
+        if num_items > 0:
+            messages.success(
+                request, 
+                f'¡Itinerario "{tarea.itinerario.nombre}" generado con {num_items} actividades!'
+            )
+        else:
+            messages.warning(
+                request,
+                'No se encontraron destinos que coincidan con tu perfil. Intenta ajustar tus preferencias o presupuesto.'
+            )
+        
+        return redirect('itinerarios:detalle', itinerario_id=tarea.itinerario_id)
+    
+    if tarea.terminada:
+        messages.error(request, f'Error al generar itinerario: {tarea.error or "el itinerario ya no existe"}')
+        return redirect('itinerarios:generar')
+    
+    return render(request, 'itinerarios/generando.html', {'tarea': tarea, 'demorada': cola_demorada(tarea)})
+
+
+@login_required
+@never_cache
+def estado_tarea(request, tarea_id):
+    """
+    API JSON de sondeo: estado de la tarea y el itinerario resultante
+    (una sola consulta por llamada)
+    """
+    tarea = get_object_or_404(
+        TareaGeneracion.objects.only('id', 'estado', 'itinerario_id', 'error', 'fecha_creacion'),
+        id=tarea_id,
+        turista=request.user
+    )
+    return JsonResponse(_estado_tarea_json(tarea))
+
+
 @login_required
 def detalle_itinerario(request, itinerario_id):
     """
@@ -83,24 +135,10 @@ def detalle_itinerario(request, itinerario_id):
     """
     itinerario = get_object_or_404(Itinerario, id=itinerario_id, turista=request.user)
     
-    # Recalcular totales
-    itinerario.calcular_totales()
-    itinerario.refresh_from_db()
-    
     items = itinerario.items.all().select_related('destino', 'destino__categoria')
     
-    # Agrupar items por día
-    items_por_dia = {}
-    for item in items:
-        if item.dia not in items_por_dia:
-            items_por_dia[item.dia] = []
-        items_por_dia[item.dia].append(item)
-    
-    # Calcular estadísticas
-    total_destinos = items.values('destino').distinct().count()
-    total_actividades = items.count()  # CORRECCIÓN: Variable correcta
-    total_dias = len(items_por_dia) if items_por_dia else 1
-    promedio_actividades_dia = total_actividades / total_dias if total_dias > 0 else 0
+    # Métricas del dashboard (en caché por versión del itinerario)
+    resumen = obtener_resumen(itinerario)
     
     # CRÍTICO: Verificar exceso de presupuesto
     presupuesto_usuario = request.user.presupuesto_max
@@ -119,81 +157,45 @@ def detalle_itinerario(request, itinerario_id):
                 'porcentaje': int((costo_actual / presupuesto_decimal) * 100)
             }
     
-    # Datos para gráficos
-    datos_grafico = {
-        'dias': [],
-        'actividades': [],
-        'tiempo': [],
-        'costo': []
-    }
-    
-    if items.exists():
-        for dia in sorted(items_por_dia.keys()):
-            items_dia = items_por_dia[dia]
-            
-            # Calcular tiempo REAL del día
-            tiempo_dia = 0
-            for item in items_dia:
-                if item.hora_inicio and item.hora_fin:
-                    inicio_dt = datetime.combine(datetime.today(), item.hora_inicio)
-                    fin_dt = datetime.combine(datetime.today(), item.hora_fin)
-                    
-                    if fin_dt < inicio_dt:
-                        fin_dt += timedelta(days=1)
-                    
-                    tiempo_dia += (fin_dt - inicio_dt).seconds / 60
-            
-            # Calcular costo REAL del día
-            costo_dia = 0
-            for item in items_dia:
-                costo_item = None
-                
-                if item.notas and 'Costo:' in item.notas:
-                    try:
-                        match = re.search(r'S/\s*(\d+\.?\d*)', item.notas)
-                        if match:
-                            costo_item = float(match.group(1))
-                    except:
-                        pass
-                
-                if costo_item is None:
-                    costo_item = float(item.destino.costo_entrada)
-                
-                costo_dia += costo_item
-            
-            datos_grafico['dias'].append(f'Día {dia}')
-            datos_grafico['actividades'].append(len(items_dia))
-            datos_grafico['tiempo'].append(int(tiempo_dia))
-            datos_grafico['costo'].append(round(costo_dia, 2))
-    else:
-        datos_grafico = {
-            'dias': ['Sin datos'],
-            'actividades': [0],
-            'tiempo': [0],
-            'costo': [0]
-        }
-    
     context = {
         'itinerario': itinerario,
         'items': items,
-        'items_por_dia': items_por_dia,
-        'total_destinos': total_destinos,
-        'total_actividades': total_actividades,  # CORRECCIÓN
-        'total_dias': total_dias,
-        'promedio_actividades_dia': round(promedio_actividades_dia, 1),
-        'datos_grafico': json.dumps(datos_grafico),
+        'total_destinos': resumen['total_destinos'],
+        'total_actividades': resumen['total_actividades'],
+        'total_dias': resumen['total_dias'],
+        'promedio_actividades_dia': resumen['promedio_actividades_dia'],
         'alerta_presupuesto': alerta_presupuesto,  # NUEVO
     }
     return render(request, 'itinerarios/detalle_itinerario.html', context)
 
 
+def _etag_resumen(request, itinerario_id):
+    """ETag del resumen: cambia con la versión del itinerario"""
+    version = Itinerario.objects.filter(
+        id=itinerario_id, turista=request.user
+    ).values_list('version', flat=True).first()
+    return f'resumen-{itinerario_id}-v{version}' if version is not None else None
+
+
+@login_required
+@etag(_etag_resumen)
+def resumen_itinerario(request, itinerario_id):
+    """
+    API JSON con las métricas y datos de gráficos del dashboard
+    """
+    itinerario = get_object_or_404(Itinerario, id=itinerario_id, turista=request.user)
+    return JsonResponse(obtener_resumen(itinerario))
+
+
 @login_required
 def regenerar_actividades(request, itinerario_id):
     """Regenera 3 actividades respetando el presupuesto"""
     itinerario = get_object_or_404(Itinerario, id=itinerario_id, turista=request.user)
     
     try:
-        regenerador = RegeneradorActividades(itinerario)
+        # ?semilla=N reproduce la misma selección
+        semilla = request.GET.get('semilla')
+        regenerador = RegeneradorActividades(itinerario, semilla=int(semilla) if semilla else None)
         regenerador.regenerar_3_actividades()
         
         messages.success(request, '¡3 nuevas actividades generadas respetando tu presupuesto!')
@@ -207,16 +209,22 @@ def regenerar_actividades(request, itinerario_id):
 @login_required
 def mis_itinerarios(request):
     """Lista de itinerarios del usuario"""
-    itinerarios = Itinerario.objects.filter(turista=request.user).order_by('-fecha_creacion')
+    itinerarios = list(
+        Itinerario.objects.filter(turista=request.user)
+        .annotate(
+            num_actividades=Count('items'),
+            num_destinos=Count('items__destino', distinct=True),
+            num_dias=Count('items__dia', distinct=True),
+        )
+        .order_by('-fecha_creacion')
+    )
     
     for itinerario in itinerarios:
-        itinerario.num_actividades = itinerario.items.count()
-        itinerario.num_destinos = itinerario.items.values('destino').distinct().count()
-        itinerario.num_dias = itinerario.items.values('dia').distinct().count() or 1
+        itinerario.num_dias = itinerario.num_dias or 1
     
     context = {
         'itinerarios': itinerarios,
-        'total_itinerarios': itinerarios.count(),
+        'total_itinerarios': len(itinerarios),
     }
     
     return render(request, 'itinerarios/mis_itinerarios.html', context)
@@ -229,7 +237,6 @@ def eliminar_item(request, item_id):
     itinerario = item.itinerario
     
     item.delete()
-    itinerario.calcular_totales()
     
     messages.success(request, 'Actividad eliminada del itinerario')
     return redirect('itinerarios:detalle', itinerario_id=itinerario.id)
@@ -269,11 +276,11 @@ def duplicar_itinerario(request, itinerario_id):
             dia=item_original.dia,
             hora_inicio=item_original.hora_inicio,
             hora_fin=item_original.hora_fin,
+            actividad_id=item_original.actividad_id,
+            costo=item_original.costo,
             notas=item_original.notas
         )
     
-    itinerario_nuevo.calcular_totales()
-    
     messages.success(request, 'Itinerario duplicado exitosamente')
     return redirect('itinerarios:detalle', itinerario_id=itinerario_nuevo.id)
 
@@ -288,7 +295,7 @@ def agregar_destino_a_itinerario(request, destino_id):
     """
     Agrega un destino (con su mejor actividad) a un itinerario existente
     """
-    destino = get_object_or_404(Destino, id=destino_id, activo=True)
+    destino = get_object_or_404(Destino.objects.select_related('actividad_minima'), id=destino_id, activo=True)
     itinerario_id = request.POST.get('itinerario_id')
     
     if not itinerario_id:
@@ -300,11 +307,10 @@ def agregar_destino_a_itinerario(request, destino_id):
     # Verificar presupuesto
     presupuesto_usuario = request.user.presupuesto_max
     
-    # Seleccionar mejor actividad
-    actividades = destino.actividades.filter(disponible=True).order_by('costo')
+    # Seleccionar mejor actividad (la disponible más barata, precalculada en el destino)
+    actividad = destino.actividad_minima
     
-    if actividades.exists():
-        actividad = actividades.first()
+    if actividad:
         costo = actividad.costo
         duracion = actividad.duracion_minutos
         notas = f" Actividad: {actividad.nombre}\n Duración: {duracion} min\n Costo: S/ {costo}"
@@ -323,37 +329,28 @@ def agregar_destino_a_itinerario(request, destino_id):
             f'⚠️ Agregar esta actividad excederá tu presupuesto por S/ {exceso}. ¿Deseas continuar de todos modos?'
         )
     
-    # Calcular orden y horarios
+    # Calcular orden y el primer horario libre
     ultimo_item = itinerario.items.order_by('-orden').first()
-    
-    if ultimo_item:
-        nuevo_orden = ultimo_item.orden + 1
-        nuevo_dia = ultimo_item.dia
-        
-        # Calcular nueva hora
-        hora_fin_anterior = datetime.combine(datetime.today(), ultimo_item.hora_fin)
-        nueva_hora_inicio = (hora_fin_anterior + timedelta(minutes=30)).time()
-    else:
-        nuevo_orden = 1
-        nuevo_dia = 1
-        nueva_hora_inicio = datetime.strptime('09:00', '%H:%M').time()
-    
-    nueva_hora_fin = (datetime.combine(datetime.today(), nueva_hora_inicio) + timedelta(minutes=duracion)).time()
+    nuevo_orden = ultimo_item.orden + 1 if ultimo_item else 1
+    try:
+        nuevo_dia, nueva_hora_inicio, nueva_hora_fin = AgendaItinerario(itinerario).mejor_hueco(duracion)
+    except ConflictoHorario as e:
+        messages.error(request, f'❌ {e}')
+        return redirect('lugares:detalle_destino', destino_id=destino_id)
     
     # Crear item
     ItemItinerario.objects.create(
         itinerario=itinerario,
         destino=destino,
+        actividad=actividad,
         orden=nuevo_orden,
         dia=nuevo_dia,
         hora_inicio=nueva_hora_inicio,
         hora_fin=nueva_hora_fin,
+        costo=costo,
         notas=notas
     )
     
-    # Recalcular totales
-    itinerario.calcular_totales()
-    
     messages.success(request, f'✅ {destino.nombre} agregado a "{itinerario.nombre}"')
     return redirect('itinerarios:detalle', itinerario_id=itinerario.id)
 
@@ -368,13 +365,15 @@ def editar_item(request, item_id):
     if request.method == 'POST':
         form = EditarItemForm(request.POST, instance=item)
         if form.is_valid():
-            form.save()
-            
-            # Recalcular totales
-            item.itinerario.calcular_totales()
-            
-            messages.success(request, f'✅ Actividad "{item.destino.nombre}" actualizada')
-            return redirect('itinerarios:detalle', itinerario_id=item.itinerario.id)
+            try:
+                desplazados = AgendaItinerario(item.itinerario).reprogramar(item)
+            except ConflictoHorario as e:
+                form.add_error(None, str(e))
+            else:
+                messages.success(request, f'✅ Actividad "{item.destino.nombre}" actualizada')
+                if desplazados:
+                    messages.info(request, f'🕒 {len(desplazados)} actividad(es) del día {item.dia} se corrieron para evitar solapamientos')
+                return redirect('itinerarios:detalle', itinerario_id=item.itinerario.id)
     else:
         form = EditarItemForm(instance=item)
     
@@ -395,12 +394,33 @@ def editar_item_ajax(request, item_id):
     
     form = EditarItemForm(request.POST, instance=item)
     if form.is_valid():
-        form.save()
-        item.itinerario.calcular_totales()
+        agenda = AgendaItinerario(item.itinerario)
+        try:
+            desplazados = agenda.reprogramar(item)
+        except ConflictoHorario as e:
+            duracion = ItemItinerario.calcular_duracion(item.hora_inicio, item.hora_fin)
+            hueco = agenda.sugerir_hueco(item.dia, duracion, excluir=item.pk)
+            return JsonResponse({
+                'success': False,
+                'errors': {'__all__': [str(e)]},
+                'sugerencia': {
+                    'dia': item.dia,
+                    'hora_inicio': hueco[0].strftime('%H:%M'),
+                    'hora_fin': hueco[1].strftime('%H:%M'),
+                } if hueco else None,
+            }, status=400)
         
         return JsonResponse({
             'success': True,
-            'message': 'Actividad actualizada correctamente'
+            'message': 'Actividad actualizada correctamente',
+            'desplazados': [
+                {
+                    'id': otro.id,
+                    'hora_inicio': otro.hora_inicio.strftime('%H:%M'),
+                    'hora_fin': otro.hora_fin.strftime('%H:%M'),
+                }
+                for otro in desplazados
+            ],
         })
     else:
         return JsonResponse({
@@ -430,37 +450,29 @@ def agregar_actividad_manual(request, actividad_id):
 
     # Obtener último item del itinerario
     ultimo = itinerario.items.order_by("-orden").first()
+    orden = ultimo.orden + 1 if ultimo else 1
 
-    if ultimo:
-        orden = ultimo.orden + 1
-        dia = ultimo.dia
-        hora_inicio = (datetime.combine(datetime.today(), ultimo.hora_fin) + timedelta(minutes=30)).time()
-    else:
-        orden = 1
-        dia = 1
-        hora_inicio = datetime.strptime("09:00", "%H:%M").time()
-
-    # Calcular hora fin
+    # Primer horario libre (sin solaparse con lo ya reservado)
     duracion = actividad.duracion_minutos if actividad.duracion_minutos else 90
-    hora_fin = (
-        datetime.combine(datetime.today(), hora_inicio) +
-        timedelta(minutes=duracion)
-    ).time()
+    try:
+        dia, hora_inicio, hora_fin = AgendaItinerario(itinerario).mejor_hueco(duracion)
+    except ConflictoHorario as e:
+        messages.error(request, f"❌ {e}")
+        return redirect("lugares:detalle_destino", destino_id=actividad.destino.id)
 
     # Crear el item
     ItemItinerario.objects.create(
         itinerario=itinerario,
         destino=actividad.destino,
+        actividad=actividad,
         orden=orden,
         dia=dia,
         hora_inicio=hora_inicio,
         hora_fin=hora_fin,
+        costo=actividad.costo,
         notas=f" Actividad: {actividad.nombre}\n Costo: S/ {actividad.costo}\n Duración: {duracion} min\n {actividad.descripcion[:100] if actividad.descripcion else 'Sin descripción'}"
     )
 
-    # Recalcular totales
-    itinerario.calcular_totales()
-
     messages.success(request, f"✅ La actividad '{actividad.nombre}' fue agregada a '{itinerario.nombre}'.")
     
     # CORREGIDO: Redirigir al detalle del itinerario
@@ -19,7 +19,7 @@ class ImagenDestinoInline(admin.TabularInline):
 
 @admin.register(Destino)
 class DestinoAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'categoria', 'calificacion', 'costo_entrada', 'activo']
+    list_display = ['nombre', 'categoria', 'calificacion', 'costo_entrada', 'num_actividades', 'activo']
     list_filter = ['categoria', 'activo', 'calificacion']
     search_fields = ['nombre', 'descripcion']
     list_editable = ['activo']
@@ -38,7 +38,13 @@ class DestinoAdmin(admin.ModelAdmin):
         ('Estado', {
             'fields': ('activo',)
         }),
+        ('Actividades', {
+            'fields': ('num_actividades', 'actividad_minima', 'costo_minimo_actividad',
+                       'costo_total_actividades', 'duracion_total_actividades')
+        }),
     )
+    readonly_fields = ['num_actividades', 'actividad_minima', 'costo_minimo_actividad',
+                       'costo_total_actividades', 'duracion_total_actividades']
 
 
 @admin.register(Actividad)
@@ -0,0 +1,172 @@
+"""
+Autocompletado de destinos y categorías desde memoria.
+
+Los nombres normalizados (minúsculas, sin tildes) se guardan en un
+arreglo ordenado con una entrada por cada palabra donde puede empezar la
+búsqueda ("larco" encuentra "Museo Larco"); un prefijo se resuelve con
+dos búsquedas binarias. Los prefijos de 1 y 2 letras, los que abarcan
+más entradas, se precalculan. Los resultados se ordenan por calificación.
+
+Con varios términos ("museo la") se recorre el rango del más selectivo
+y los demás filtran por prefijo de palabra.
+
+El índice se reconstruye cuando cambia la versión del catálogo.
+"""
+from bisect import bisect_left
+import heapq
+import threading
+
+from django.db.models import Avg, Q
+from django.urls import reverse
+from .busqueda import tokenizar
+from .catalogo import version_catalogo
+from .models import Destino, Categoria
+
+MAX_SUGERENCIAS = 10
+
+
+class IndiceAutocompletado:
+
+    PRECALCULAR_HASTA = 2
+
+    def __init__(self, sugerencias):
+        """
+        Args:
+            sugerencias: lista de dicts con tipo, id, nombre, calificacion y url
+        """
+        self.sugerencias = sugerencias
+        self._orden = [(-s['calificacion'], s['nombre'].lower()) for s in sugerencias]
+        self._ranking = sorted(range(len(sugerencias)), key=self._orden.__getitem__)
+
+        self._palabras = [tokenizar(s['nombre']) for s in sugerencias]
+
+        entradas = []
+        for posicion, palabras in enumerate(self._palabras):
+            for inicio in range(len(palabras)):
+                entradas.append((' '.join(palabras[inicio:]), posicion))
+        entradas.sort()
+
+        self.claves = [clave for clave, _ in entradas]
+        self.posiciones = [posicion for _, posicion in entradas]
+
+        self._precalculados = {}
+        for largo in range(1, self.PRECALCULAR_HASTA + 1):
+            grupos = {}
+            for clave, posicion in entradas:
+                if len(clave) >= largo:
+                    grupos.setdefault(clave[:largo], set()).add(posicion)
+            for prefijo, posiciones in grupos.items():
+                self._precalculados[prefijo] = self._mejores(posiciones, MAX_SUGERENCIAS)
+
+    def __len__(self):
+        return len(self.sugerencias)
+
+    def buscar(self, texto, limite=MAX_SUGERENCIAS):
+        """
+        Sugerencias en las que cada término es prefijo de alguna palabra
+        del nombre, de mayor a menor calificación
+        """
+        tokens = tokenizar(texto)
+        limite = min(limite, MAX_SUGERENCIAS)
+        if not tokens:
+            return []
+
+        if len(tokens) == 1 and tokens[0] in self._precalculados:
+            posiciones = self._precalculados[tokens[0]][:limite]
+        else:
+            # Rango del término más selectivo en el arreglo ordenado
+            tamano, desde, hasta = min(self._rango(token) for token in tokens)
+
+            posiciones = None
+            if tamano ** 2 > limite * len(self.claves):
+                # Rango grande: probablemente hay muchas coincidencias y el
+                # ranking global las encuentra antes que recorrer el rango
+                posiciones = self._recorrer_ranking(tokens, limite, max_pasos=tamano)
+
+            if posiciones is None:
+                candidatas = {
+                    posicion for posicion in self.posiciones[desde:hasta]
+                    if self._coincide(posicion, tokens)
+                }
+                posiciones = self._mejores(candidatas, limite)
+
+        return [self.sugerencias[posicion] for posicion in posiciones]
+
+    def _rango(self, token):
+        desde = bisect_left(self.claves, token)
+        hasta = bisect_left(self.claves, token + '\uffff', desde)
+        return hasta - desde, desde, hasta
+
+    def _recorrer_ranking(self, tokens, limite, max_pasos):
+        """Primeras coincidencias en orden de calificación, o None si no aparecen en max_pasos"""
+        posiciones = []
+        for pasos, posicion in enumerate(self._ranking):
+            if pasos >= max_pasos:
+                return None
+            if self._coincide(posicion, tokens):
+                posiciones.append(posicion)
+                if len(posiciones) >= limite:
+                    break
+        return posiciones
+
+    def _coincide(self, posicion, tokens):
+        palabras = self._palabras[posicion]
+        return all(any(palabra.startswith(token) for palabra in palabras) for token in tokens)
+
+    def _mejores(self, posiciones, limite):
+        return heapq.nsmallest(limite, posiciones, key=self._orden.__getitem__)
+
+
+def construir_indice():
+    """Destinos activos y categorías (dos consultas)"""
+    sugerencias = [
+        {
+            'tipo': 'destino',
+            'id': destino['id'],
+            'nombre': destino['nombre'],
+            'categoria': destino['categoria__nombre'],
+            'calificacion': float(destino['calificacion'] or 0),
+            'url': reverse('lugares:detalle_destino', args=[destino['id']]),
+        }
+        for destino in Destino.objects.filter(activo=True).values(
+            'id', 'nombre', 'calificacion', 'categoria__nombre'
+        )
+    ]
+
+    # Una categoría se ubica según la calificación promedio de sus destinos
+    categorias = Categoria.objects.annotate(
+        promedio=Avg('destinos__calificacion', filter=Q(destinos__activo=True))
+    ).values('id', 'nombre', 'promedio')
+    sugerencias += [
+        {
+            'tipo': 'categoria',
+            'id': categoria['id'],
+            'nombre': categoria['nombre'],
+            'categoria': None,
+            'calificacion': round(float(categoria['promedio'] or 0), 2),
+            'url': f"{reverse('lugares:lista_destinos')}?categoria={categoria['id']}",
+        }
+        for categoria in categorias
+    ]
+
+    return IndiceAutocompletado(sugerencias)
+
+
+_indice = None
+_version_indice = None
+_lock = threading.Lock()
+
+
+def obtener_indice():
+    """Índice del proceso; se reconstruye si cambió la versión del catálogo"""
+    global _indice, _version_indice
+
+    version = version_catalogo()
+    if _indice is not None and _version_indice == version:
+        return _indice
+
+    with _lock:
+        if _indice is None or _version_indice != version:
+            _indice = construir_indice()
+            _version_indice = version
+        return _indice
@@ -0,0 +1,134 @@
+"""
+Búsqueda de texto completo de destinos con SQLite FTS5.
+
+Indexa nombre, descripción, dirección y los nombres de las actividades
+de cada destino. El tokenizador unicode61 con remove_diacritics ignora
+mayúsculas y tildes ("peru" encuentra "Perú"), cada término se busca
+como prefijo ("mus" encuentra "museo") y los resultados se ordenan por
+BM25. El índice se mantiene con las señales de Destino y Actividad.
+
+En otros motores de base de datos buscar() y buscar_ids() devuelven None
+y la vista usa el filtro icontains de siempre.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from .models import Destino, Actividad
+
+TABLA_FTS = 'lugares_destino_fts'
+
+# Peso de cada columna en BM25: nombre, descripción, dirección, actividades
+PESOS_BM25 = (10.0, 1.0, 2.0, 4.0)
+
+SQL_INDEXAR = (
+    f"INSERT INTO {TABLA_FTS} (rowid, nombre, descripcion, direccion, actividades) "
+    f"SELECT d.id, d.nombre, d.descripcion, d.direccion, "
+    f"COALESCE((SELECT group_concat(a.nombre, ' ') FROM {Actividad._meta.db_table} a "
+    f"WHERE a.destino_id = d.id), '') "
+    f"FROM {Destino._meta.db_table} d"
+)
+
+
+def fts_disponible():
+    return connection.vendor == 'sqlite'
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes (misma normalización que el índice)"""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def tokenizar(texto):
+    return re.findall(r'\w+', normalizar(texto))
+
+
+def construir_consulta(texto):
+    """
+    Expresión MATCH de FTS5: todos los términos, cada uno como prefijo
+    (las comillas evitan que la sintaxis de FTS5 se interprete)
+    """
+    return ' '.join(f'"{token}"*' for token in tokenizar(texto))
+
+
+def _bm25():
+    return f"bm25({TABLA_FTS}, {', '.join(str(p) for p in PESOS_BM25)})"
+
+
+def buscar(queryset, texto):
+    """
+    Filtra un queryset de Destino por el texto (join con el índice FTS5)
+    y lo ordena por relevancia; cada destino trae su puntaje en
+    `relevancia` (BM25: más negativo = más relevante)
+
+    Returns:
+        queryset, o None si no hay índice FTS en esta base de datos
+    """
+    if not fts_disponible():
+        return None
+    
+    consulta = construir_consulta(texto)
+    if not consulta:
+        return queryset.none()
+    
+    tabla_destino = connection.ops.quote_name(queryset.model._meta.db_table)
+    coincidencias = RawSQL(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [consulta])
+    relevancia = RawSQL(
+        f"SELECT {_bm25()} FROM {TABLA_FTS} "
+        f"WHERE {TABLA_FTS} MATCH %s AND {TABLA_FTS}.rowid = {tabla_destino}.id",
+        [consulta],
+        output_field=FloatField(),
+    )
+    return queryset.filter(id__in=coincidencias).annotate(relevancia=relevancia).order_by('relevancia')
+
+
+def buscar_ids(texto, limite=None):
+    """
+    Ids de los destinos que coinciden, del más relevante al menos relevante
+
+    Returns:
+        lista de ids, o None si no hay índice FTS en esta base de datos
+    """
+    if not fts_disponible():
+        return None
+    
+    consulta = construir_consulta(texto)
+    if not consulta:
+        return []
+    
+    sql = (
+        f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s "
+        f"ORDER BY {_bm25()}"
+    )
+    parametros = [consulta]
+    if limite:
+        sql += " LIMIT %s"
+        parametros.append(limite)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def indexar_destino(destino_id):
+    """Reindexa un destino (o lo quita del índice si ya no existe)"""
+    if not fts_disponible():
+        return
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA_FTS} WHERE rowid = %s", [destino_id])
+        cursor.execute(SQL_INDEXAR + " WHERE d.id = %s", [destino_id])
+
+
+def reconstruir_indice():
+    """Vuelve a indexar todos los destinos (tras cargas masivas con bulk_create)"""
+    if not fts_disponible():
+        return 0
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA_FTS}")
+        cursor.execute(SQL_INDEXAR)
+        return cursor.rowcount
@@ -0,0 +1,112 @@
+"""
+Caché de las páginas de destinos.
+
+- Vistas completas para visitantes anónimos, con clave por ruta y query string
+- Fragmentos de plantilla (tarjetas, galería, recomendaciones) con la
+  etiqueta {% fragmento_catalogo %}
+
+Todas las claves incluyen la versión del catálogo (ver catalogo.py): al
+guardar un destino, actividad, imagen o categoría la versión cambia y las
+entradas anteriores dejan de usarse sin tener que borrarlas una por una.
+Cada acceso suma un acierto o un fallo por zona para medir la tasa de
+aciertos (comando metricas_cache).
+"""
+from functools import wraps
+import hashlib
+
+from django.core.cache import cache
+from django.utils.http import urlencode
+from .catalogo import version_catalogo
+
+TIMEOUT_VISTA = 60 * 10
+TIMEOUT_FRAGMENTO = 60 * 60
+
+PREFIJO_METRICAS = 'lugares:cache:metricas'
+ZONAS = (
+    'vista:lista_destinos', 'vista:detalle_destino',
+    'fragmento:tarjeta', 'fragmento:galeria', 'fragmento:recomendaciones',
+)
+
+
+def _contar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        if not cache.add(clave, 1, None):
+            cache.incr(clave)
+
+
+def registrar(zona, acierto):
+    """Suma un acierto o un fallo a la zona"""
+    _contar(f'{PREFIJO_METRICAS}:{zona}:{"aciertos" if acierto else "fallos"}')
+
+
+def metricas():
+    """Aciertos, fallos y tasa de aciertos por zona"""
+    claves = [f'{PREFIJO_METRICAS}:{zona}:{tipo}' for zona in ZONAS for tipo in ('aciertos', 'fallos')]
+    valores = cache.get_many(claves)
+
+    resultado = {}
+    for zona in ZONAS:
+        aciertos = valores.get(f'{PREFIJO_METRICAS}:{zona}:aciertos', 0)
+        fallos = valores.get(f'{PREFIJO_METRICAS}:{zona}:fallos', 0)
+        total = aciertos + fallos
+        resultado[zona] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa': aciertos / total if total else None,
+        }
+    return resultado
+
+
+def reiniciar_metricas():
+    cache.delete_many([f'{PREFIJO_METRICAS}:{zona}:{tipo}' for zona in ZONAS for tipo in ('aciertos', 'fallos')])
+
+
+def clave_fragmento(nombre, *variantes, version=None):
+    """Clave de un fragmento de plantilla para la versión actual del catálogo"""
+    version = version if version is not None else version_catalogo()
+    return f'lugares:fragmento:{version}:{nombre}:' + ':'.join(str(v) for v in variantes)
+
+
+def clave_vista(request, version):
+    """Ruta y query string normalizado (el orden de los parámetros no importa)"""
+    parametros = urlencode(sorted(request.GET.lists()), doseq=True)
+    resumen = hashlib.md5(parametros.encode('utf-8')).hexdigest()
+    return f'lugares:vista:{version}:{request.path}:{resumen}'
+
+
+def _cacheable(request):
+    """Solo GET de anónimos sin mensajes pendientes (se mostrarían a otros)"""
+    if request.method != 'GET' or request.user.is_authenticated:
+        return False
+    if 'messages' in request.COOKIES:
+        return False
+    return not (request.session.session_key and request.session.get('_messages'))
+
+
+def cache_anonimo(zona, timeout=TIMEOUT_VISTA):
+    """
+    Guarda la respuesta completa de la vista para visitantes anónimos;
+    los usuarios con sesión iniciada siempre reciben la página generada
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not _cacheable(request):
+                return vista(request, *args, **kwargs)
+
+            clave = clave_vista(request, version_catalogo())
+            respuesta = cache.get(clave)
+            registrar(zona, respuesta is not None)
+
+            if respuesta is None:
+                respuesta = vista(request, *args, **kwargs)
+                if respuesta.status_code == 200 and not respuesta.cookies:
+                    cache.set(clave, respuesta, timeout)
+                respuesta['X-Cache'] = 'MISS'
+            else:
+                respuesta['X-Cache'] = 'HIT'
+            return respuesta
+        return envoltura
+    return decorador
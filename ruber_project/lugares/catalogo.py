@@ -0,0 +1,67 @@
+"""
+Versión de los datos del catálogo (destinos, actividades, imágenes, categorías y rutas).
+
+Cambia cada vez que se guarda o borra algo del catálogo; las estructuras
+en memoria y las entradas de caché que dependen de él se reconstruyen
+cuando ven una versión distinta.
+
+La versión es una fila de la base de datos (VersionCatalogo), así que un
+cambio hecho por un proceso llega a todos los demás. Cada proceso
+reutiliza la última versión leída durante TTL_VERSION_LOCAL segundos:
+el propio proceso ve sus cambios al instante y los demás, como mucho,
+ese tiempo después.
+"""
+import threading
+import time
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+TTL_VERSION_LOCAL = 1.0
+
+_leida = None
+_leida_en = 0.0
+_lock = threading.Lock()
+
+
+def _recordar(version):
+    global _leida, _leida_en
+    with _lock:
+        _leida, _leida_en = version, time.monotonic()
+    return version
+
+
+def _marca_tiempo():
+    # Partir del reloj evita repetir una versión que se deshizo con un rollback
+    return int(time.time() * 1000)
+
+
+def version_catalogo():
+    if _leida is not None and time.monotonic() - _leida_en < TTL_VERSION_LOCAL:
+        return _leida
+
+    from .models import VersionCatalogo
+
+    version = VersionCatalogo.objects.filter(pk=1).values_list('version', flat=True).first()
+    if version is None:
+        fila, _ = VersionCatalogo.objects.get_or_create(pk=1, defaults={'version': _marca_tiempo()})
+        version = fila.version
+    return _recordar(version)
+
+
+def incrementar_version_catalogo():
+    from .models import VersionCatalogo
+
+    actualizadas = VersionCatalogo.objects.filter(pk=1).update(
+        version=Greatest(F('version') + 1, Value(_marca_tiempo()))
+    )
+    if not actualizadas:
+        VersionCatalogo.objects.get_or_create(pk=1, defaults={'version': _marca_tiempo()})
+    return _recordar(VersionCatalogo.objects.filter(pk=1).values_list('version', flat=True).first())
+
+
+def olvidar_version_leida():
+    """La próxima llamada a version_catalogo() vuelve a leer la base de datos"""
+    global _leida
+    with _lock:
+        _leida = None
@@ -0,0 +1,96 @@
+"""
+Consultas geográficas de destinos: cercanos a un punto y dentro de una caja.
+
+La base de datos descarta primero lo que cae fuera del rectángulo que
+envuelve el círculo (rangos de latitud y longitud sobre el índice
+destino_activo_geo_idx) y solo esos candidatos se refinan con la
+distancia exacta de haversine, calculada en SQL para poder ordenar y
+paginar por distancia sin traer el catálogo completo a Python.
+"""
+import math
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+RADIO_TIERRA_KM = 6371.0
+
+# Radio de búsqueda por defecto y máximo del listado "cerca de mí"
+RADIO_DEFECTO_KM = 5.0
+RADIO_MAXIMO_KM = 200.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distancia en km sobre la esfera terrestre entre dos puntos (grados)"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def caja_envolvente(lat, lng, radio_km):
+    """
+    Rectángulo (sur, oeste, norte, este) que contiene el círculo de
+    radio_km alrededor del punto. Si el círculo toca un polo abarca todas
+    las longitudes; si cruza el antimeridiano, oeste queda mayor que este
+    """
+    angulo = radio_km / RADIO_TIERRA_KM
+    sur = lat - math.degrees(angulo)
+    norte = lat + math.degrees(angulo)
+
+    if sur <= -90 or norte >= 90 or math.sin(angulo) >= math.cos(math.radians(lat)):
+        return max(sur, -90.0), -180.0, min(norte, 90.0), 180.0
+
+    # Meridianos tangentes al círculo (más anchos que radio/cos(lat) lejos del ecuador)
+    delta = math.degrees(math.asin(math.sin(angulo) / math.cos(math.radians(lat))))
+    oeste = (lng - delta + 180) % 360 - 180
+    este = (lng + delta + 180) % 360 - 180
+    return sur, oeste, norte, este
+
+
+def filtro_caja(sur, oeste, norte, este):
+    """Q de los destinos dentro del rectángulo (rango sobre latitud y longitud)"""
+    filtro = Q(latitud__gte=sur, latitud__lte=norte)
+    if oeste <= este:
+        return filtro & Q(longitud__gte=oeste, longitud__lte=este)
+    # Cruza el antimeridiano: dos tramos de longitud
+    return filtro & (Q(longitud__gte=oeste) | Q(longitud__lte=este))
+
+
+def expresion_distancia(lat, lng):
+    """Haversine en SQL desde (lat, lng) hasta cada destino, en km"""
+    lat_destino = Radians(Cast(F('latitud'), FloatField()))
+    lng_destino = Radians(Cast(F('longitud'), FloatField()))
+    lat_origen = math.radians(lat)
+
+    a = (
+        Power(Sin((lat_destino - Value(lat_origen)) / Value(2.0)), 2)
+        + Value(math.cos(lat_origen)) * Cos(lat_destino)
+        * Power(Sin((lng_destino - Value(math.radians(lng))) / Value(2.0)), 2)
+    )
+    return Value(2 * RADIO_TIERRA_KM) * ASin(Sqrt(a), output_field=FloatField())
+
+
+def leer_punto(lat, lng):
+    """(lat, lng) en grados a partir de texto; None si falta o no es válido"""
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def leer_caja(texto):
+    """(sur, oeste, norte, este) de 'sur,oeste,norte,este'; None si no es válida"""
+    try:
+        sur, oeste, norte, este = (float(parte) for parte in str(texto).split(','))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= sur <= norte <= 90 and -180 <= oeste <= 180 and -180 <= este <= 180):
+        return None
+    return sur, oeste, norte, este
+
+
+def centro_caja(sur, oeste, norte, este):
+    """Punto central del rectángulo (respeta el cruce del antimeridiano)"""
+    ancho = (este - oeste) % 360
+    return (sur + norte) / 2, (oeste + ancho / 2 + 180) % 360 - 180
@@ -0,0 +1,98 @@
+import random
+import statistics
+import time as reloj
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from lugares.busqueda import buscar, fts_disponible, reconstruir_indice
+from lugares.models import Destino
+
+
+PALABRAS = ['museo', 'playa', 'mercado', 'parque', 'iglesia', 'mirador', 'plaza', 'huaca', 'galería',
+            'restaurante', 'cevichería', 'malecón', 'catedral', 'barrio', 'puente', 'laguna',
+            'histórico', 'colonial', 'moderno', 'tradicional', 'peruano', 'arte', 'gastronomía',
+            'surf', 'cerámica', 'textil', 'andino', 'costa', 'noche', 'música', 'paseo', 'jardín']
+
+SILABAS = ['ca', 'ma', 'to', 'ri', 'pa', 'lu', 'que', 'chi', 'hua', 'ta', 'mo', 'ne', 'sa', 'yu', 'pe', 'ro']
+
+CONSULTAS = ['museo', 'Museo de Arte', 'playa', 'cevicheria', 'gastronomia peruana', 'mira',
+             'catedral colonial', 'surf costa', 'jardin', 'xyz']
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia de la búsqueda FTS5 contra el filtro icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sinteticos', type=int, default=0,
+                            help='Destinos sintéticos a crear (se descartan al terminar)')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Ejecuciones por consulta')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if not fts_disponible():
+            raise CommandError('La búsqueda de texto completo requiere SQLite (FTS5)')
+
+        with transaction.atomic():
+            if options['sinteticos']:
+                self._crear_sinteticos(options['sinteticos'], random.Random(options['semilla']))
+
+            total = Destino.objects.filter(activo=True).count()
+            self.stdout.write(f'🔎 {total} destinos activos, {options["repeticiones"]} repeticiones por consulta\n')
+            self.stdout.write(f'  {"consulta":<22} {"icontains p50/p95":>20} {"FTS5 p50/p95":>18} {"resultados":>12}')
+
+            for consulta in CONSULTAS:
+                t_like, n_like = self._medir(self._buscar_icontains, consulta, options['repeticiones'])
+                t_fts, n_fts = self._medir(self._buscar_fts, consulta, options['repeticiones'])
+                self.stdout.write(
+                    f'  {consulta:<22} {t_like[0]:>9.2f}/{t_like[1]:.2f} ms '
+                    f'{t_fts[0]:>8.2f}/{t_fts[1]:.2f} ms {n_like:>6}/{n_fts:<5}'
+                )
+
+            # Los sintéticos no se guardan
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark completado (resultados: icontains/FTS5)'))
+
+    def _buscar_icontains(self, consulta):
+        return list(
+            Destino.objects.filter(activo=True)
+            .filter(Q(nombre__icontains=consulta) | Q(descripcion__icontains=consulta))
+            .values_list('id', flat=True)
+        )
+
+    def _buscar_fts(self, consulta):
+        return list(buscar(Destino.objects.filter(activo=True), consulta).values_list('id', flat=True))
+
+    def _medir(self, funcion, consulta, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = reloj.perf_counter()
+            resultados = funcion(consulta)
+            tiempos.append((reloj.perf_counter() - inicio) * 1000)
+        percentiles = statistics.quantiles(tiempos, n=20) if len(tiempos) > 1 else tiempos * 19
+        return (statistics.median(tiempos), percentiles[18]), len(resultados)
+
+    def _crear_sinteticos(self, cantidad, rng):
+        self.stdout.write(f'🏗️ Creando {cantidad} destinos sintéticos...')
+        # Vocabulario amplio para que cada palabra real aparezca en pocos destinos
+        vocabulario = PALABRAS + [
+            ''.join(rng.choice(SILABAS) for _ in range(rng.randint(2, 4))) for _ in range(5000)
+        ]
+        destinos = [
+            Destino(
+                nombre=' '.join(rng.sample(vocabulario, 3)).capitalize(),
+                descripcion=' '.join(rng.choice(vocabulario) for _ in range(40)),
+                direccion=f'Av. {rng.choice(PALABRAS).capitalize()} {rng.randint(100, 999)}',
+                latitud=-12.0 - rng.random() / 5,
+                longitud=-77.0 - rng.random() / 5,
+                costo_entrada=rng.choice([0, 10, 20, 30]),
+                tiempo_visita_estimado=rng.choice([60, 90, 120]),
+            )
+            for _ in range(cantidad)
+        ]
+        Destino.objects.bulk_create(destinos, batch_size=1000)
+
+        # bulk_create no dispara las señales: reconstruir el índice de una vez
+        inicio = reloj.perf_counter()
+        indexados = reconstruir_indice()
+        self.stdout.write(f'  ✓ {indexados} destinos indexados en {reloj.perf_counter() - inicio:.2f} s')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from lugares.cache_paginas import metricas, reiniciar_metricas
+from lugares.catalogo import version_catalogo
+
+
+class Command(BaseCommand):
+    help = 'Muestra la tasa de aciertos de la caché de páginas y fragmentos de destinos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help='Poner los contadores en cero')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'📦 Versión del catálogo: {version_catalogo()}\n')
+        self.stdout.write(f'  {"zona":<28} {"aciertos":>9} {"fallos":>8} {"tasa":>7}')
+
+        for zona, datos in metricas().items():
+            tasa = f'{datos["tasa"] * 100:.1f}%' if datos['tasa'] is not None else '-'
+            self.stdout.write(f'  {zona:<28} {datos["aciertos"]:>9} {datos["fallos"]:>8} {tasa:>7}')
+
+        if options['reiniciar']:
+            reiniciar_metricas()
+            self.stdout.write(self.style.SUCCESS('\n✅ Contadores reiniciados'))
@@ -0,0 +1,72 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+from lugares.models import Actividad, Destino
+
+
+class Command(BaseCommand):
+    help = (
+        'Detecta y repara desviaciones entre los agregados de actividades guardados '
+        'en cada destino y sus actividades reales (p. ej. tras cargas con bulk_create)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destino', type=int, help='Revisar solo el destino con este id')
+        parser.add_argument('--solo-revisar', action='store_true',
+                            help='Reportar las desviaciones sin repararlas')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔎 Revisando agregados de actividades por destino...')
+
+        destinos = Destino.objects.annotate(
+            total_real=Count('actividades'),
+            costo_real=Sum('actividades__costo', filter=Q(actividades__disponible=True)),
+            duracion_real=Sum('actividades__duracion_minutos', filter=Q(actividades__disponible=True)),
+        ).order_by('id')
+        actividades = Actividad.objects.filter(disponible=True)
+
+        if options['destino']:
+            destinos = destinos.filter(id=options['destino'])
+            actividades = actividades.filter(destino_id=options['destino'])
+
+        # Actividad disponible más barata por destino (desempate por id):
+        # al recorrer de mayor a menor, la última que se guarda es la más barata
+        mas_baratas = {}
+        for actividad_id, destino_id, costo in actividades.order_by('destino_id', '-costo', '-id').values_list(
+            'id', 'destino_id', 'costo'
+        ):
+            mas_baratas[destino_id] = (actividad_id, costo)
+
+        revisados = 0
+        desviados = 0
+
+        for destino in destinos.iterator(chunk_size=500):
+            revisados += 1
+            actividad_minima_id, costo_minimo = mas_baratas.get(destino.id, (None, None))
+            esperado = {
+                'num_actividades': destino.total_real,
+                'actividad_minima_id': actividad_minima_id,
+                'costo_minimo_actividad': costo_minimo,
+                'costo_total_actividades': destino.costo_real or Decimal('0.00'),
+                'duracion_total_actividades': destino.duracion_real or 0,
+            }
+
+            diferencias = [
+                f'{campo} {getattr(destino, campo)} ≠ {valor}'
+                for campo, valor in esperado.items()
+                if getattr(destino, campo) != valor
+            ]
+            if not diferencias:
+                continue
+
+            desviados += 1
+            self.stdout.write(f'  ⚠️ {destino.nombre} (id {destino.id}): {", ".join(diferencias)}')
+
+            if not options['solo_revisar']:
+                Destino.objects.filter(id=destino.id).update(**esperado)
+                self.stdout.write('     ✓ Reparado')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {revisados} destinos revisados'))
+        if desviados:
+            accion = 'detectados' if options['solo_revisar'] else 'reparados'
+            self.stdout.write(self.style.WARNING(f'   {desviados} con desviaciones ({accion})'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+from lugares.busqueda import fts_disponible, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de destinos (p. ej. tras cargas con bulk_create)'
+
+    def handle(self, *args, **options):
+        if not fts_disponible():
+            raise CommandError('La búsqueda de texto completo requiere SQLite (FTS5)')
+
+        self.stdout.write('🔎 Reconstruyendo índice de búsqueda...')
+        indexados = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f'✅ {indexados} destinos indexados'))
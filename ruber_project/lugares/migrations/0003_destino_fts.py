@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+CREAR_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS lugares_destino_fts USING fts5("
+    "nombre, descripcion, direccion, actividades, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+POBLAR_FTS = (
+    "INSERT INTO lugares_destino_fts (rowid, nombre, descripcion, direccion, actividades) "
+    "SELECT d.id, d.nombre, d.descripcion, d.direccion, "
+    "COALESCE((SELECT group_concat(a.nombre, ' ') FROM lugares_actividad a "
+    "WHERE a.destino_id = d.id), '') "
+    "FROM lugares_destino d"
+)
+
+
+def crear_indice(apps, schema_editor):
+    # FTS5 es propio de SQLite; en otros motores la búsqueda usa icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    
+    schema_editor.execute(CREAR_FTS)
+    schema_editor.execute(POBLAR_FTS)
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    
+    schema_editor.execute("DROP TABLE IF EXISTS lugares_destino_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0002_alter_destino_imagen_principal_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
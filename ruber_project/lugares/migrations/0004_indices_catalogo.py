@@ -0,0 +1,38 @@
+# Generated by Django 4.2.25 on 2026-10-19 13:02
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0003_destino_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='actividad',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['destino', 'costo'], name='actividad_disp_costo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destino',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['-calificacion', 'nombre'], name='destino_activo_ranking_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destino',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['categoria', 'costo_entrada'], name='destino_activo_cat_costo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destino',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), models.F('id'), condition=models.Q(('activo', True)), name='destino_activo_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destino',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['calificacion', 'id'], name='destino_activo_calif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destino',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['costo_entrada', 'id'], name='destino_activo_costo_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.25 on 2026-10-19 13:04
+# Agregados de actividades por destino y su relleno inicial
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+CAMPOS = ['num_actividades', 'actividad_minima', 'costo_minimo_actividad',
+          'costo_total_actividades', 'duracion_total_actividades']
+
+
+def rellenar_agregados(apps, schema_editor):
+    Destino = apps.get_model('lugares', 'Destino')
+    Actividad = apps.get_model('lugares', 'Actividad')
+
+    # La actividad disponible más barata de cada destino (desempate por id)
+    mas_baratas = {}
+    for actividad_id, destino_id, costo in (
+        Actividad.objects.filter(disponible=True)
+        .order_by('destino_id', '-costo', '-id')
+        .values_list('id', 'destino_id', 'costo')
+    ):
+        mas_baratas[destino_id] = (actividad_id, costo)
+
+    destinos = Destino.objects.annotate(
+        total=Count('actividades'),
+        costo_total=Sum('actividades__costo', filter=Q(actividades__disponible=True)),
+        duracion_total=Sum('actividades__duracion_minutos', filter=Q(actividades__disponible=True)),
+    )
+    lote = []
+    for destino in destinos.iterator(chunk_size=500):
+        actividad_id, costo = mas_baratas.get(destino.id, (None, None))
+        destino.num_actividades = destino.total
+        destino.actividad_minima_id = actividad_id
+        destino.costo_minimo_actividad = costo
+        destino.costo_total_actividades = destino.costo_total or Decimal('0.00')
+        destino.duracion_total_actividades = destino.duracion_total or 0
+        lote.append(destino)
+
+        if len(lote) >= 500:
+            Destino.objects.bulk_update(lote, CAMPOS)
+            lote = []
+
+    if lote:
+        Destino.objects.bulk_update(lote, CAMPOS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0004_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destino',
+            name='actividad_minima',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='lugares.actividad'),
+        ),
+        migrations.AddField(
+            model_name='destino',
+            name='costo_minimo_actividad',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, help_text='Actividad disponible más barata', max_digits=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='destino',
+            name='costo_total_actividades',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='destino',
+            name='duracion_total_actividades',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='destino',
+            name='num_actividades',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(rellenar_agregados, migrations.RunPython.noop),
+    ]
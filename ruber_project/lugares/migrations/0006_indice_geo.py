@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0005_destino_agregados_actividades'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='destino',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['latitud', 'longitud'], name='destino_activo_geo_idx'),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, router, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Lower
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .geo import caja_envolvente, expresion_distancia, filtro_caja
 
 class Categoria(models.Model):
     """
@@ -17,6 +21,30 @@ class Categoria(models.Model):
         return self.nombre
 
 
+class DestinoQuerySet(models.QuerySet):
+    """Consultas geográficas (ver geo.py)"""
+    
+    def en_caja(self, sur, oeste, norte, este):
+        """Destinos dentro del rectángulo (grados)"""
+        return self.filter(filtro_caja(sur, oeste, norte, este))
+    
+    def con_distancia(self, lat, lng):
+        """Anota `distancia_km` desde el punto (sin filtrar ni ordenar)"""
+        return self.annotate(distancia_km=expresion_distancia(lat, lng))
+    
+    def cerca_de(self, lat, lng, radio_km):
+        """
+        Destinos a menos de radio_km del punto, del más cercano al más lejano:
+        la caja envolvente descarta por índice y haversine refina el círculo
+        """
+        return (
+            self.en_caja(*caja_envolvente(lat, lng, radio_km))
+            .con_distancia(lat, lng)
+            .filter(distancia_km__lte=radio_km)
+            .order_by('distancia_km', 'id')
+        )
+
+
 class Destino(models.Model):
     """
     Lugares turísticos disponibles
@@ -46,17 +74,127 @@ class Destino(models.Model):
     # Media
     imagen_principal = models.URLField(max_length=500, blank=True, null=True)
     
+    # Agregados de sus actividades (los mantienen las señales de Actividad)
+    num_actividades = models.IntegerField(default=0, editable=False)
+    costo_minimo_actividad = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True,
+                                                 editable=False, help_text="Actividad disponible más barata")
+    actividad_minima = models.ForeignKey('Actividad', on_delete=models.SET_NULL, null=True, blank=True,
+                                         editable=False, related_name='+')
+    costo_total_actividades = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, editable=False)
+    duracion_total_actividades = models.IntegerField(default=0, editable=False)
+    
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     
+    objects = DestinoQuerySet.as_manager()
+    
+    CAMPOS_ACTIVIDADES = (
+        'num_actividades', 'costo_minimo_actividad', 'actividad_minima',
+        'costo_total_actividades', 'duracion_total_actividades',
+    )
+    
     class Meta:
         verbose_name = "Destino"
         verbose_name_plural = "Destinos"
         ordering = ['-calificacion', 'nombre']
+        # Parciales: las consultas del catálogo solo ven destinos activos
+        indexes = [
+            # Orden por defecto (catálogo del generador, destacados de la portada)
+            models.Index(fields=['-calificacion', 'nombre'], condition=Q(activo=True),
+                         name='destino_activo_ranking_idx'),
+            # Filtro por categoría y rango de precio
+            models.Index(fields=['categoria', 'costo_entrada'], condition=Q(activo=True),
+                         name='destino_activo_cat_costo_idx'),
+            # Paginación por clave del listado: (clave, id) en cada orden
+            models.Index(Lower('nombre'), 'id', condition=Q(activo=True),
+                         name='destino_activo_nombre_idx'),
+            models.Index(fields=['calificacion', 'id'], condition=Q(activo=True),
+                         name='destino_activo_calif_idx'),
+            models.Index(fields=['costo_entrada', 'id'], condition=Q(activo=True),
+                         name='destino_activo_costo_idx'),
+            # Caja envolvente de las búsquedas por cercanía
+            models.Index(fields=['latitud', 'longitud'], condition=Q(activo=True),
+                         name='destino_activo_geo_idx'),
+        ]
     
     def __str__(self):
         return self.nombre
+    
+    def save(self, *args, **kwargs):
+        # Los agregados solo los escribe recalcular_actividades(): una instancia
+        # cargada antes de cambiar sus actividades guarda los de la fila actual.
+        # Sin pk (p. ej. al clonar) o si la fila ya no existe, se inserta como siempre
+        if self.pk is None or kwargs.get('force_insert') or kwargs.get('update_fields') is not None:
+            super().save(*args, **kwargs)
+            return
+        
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        campos = [self._meta.get_field(campo).attname for campo in self.CAMPOS_ACTIVIDADES]
+        with transaction.atomic(using=using):
+            actuales = (
+                type(self)._base_manager.using(using).select_for_update()
+                .filter(pk=self.pk).values(*campos).first()
+            )
+            for campo, valor in (actuales or {}).items():
+                setattr(self, campo, valor)
+            super().save(*args, **kwargs)
+    
+    @classmethod
+    def agregados_actividades(cls, destino_id):
+        """
+        Agregados reales de las actividades de un destino:
+        número total (popularidad) y, de las disponibles, la más barata,
+        el costo total y la duración total
+        """
+        totales = Actividad.objects.filter(destino_id=destino_id).aggregate(
+            num_actividades=Count('id'),
+            costo_total_actividades=Sum('costo', filter=Q(disponible=True)),
+            duracion_total_actividades=Sum('duracion_minutos', filter=Q(disponible=True)),
+        )
+        mas_barata = (
+            Actividad.objects.filter(destino_id=destino_id, disponible=True)
+            .order_by('costo', 'id').values('id', 'costo').first()
+        )
+        
+        return {
+            'num_actividades': totales['num_actividades'],
+            'costo_minimo_actividad': mas_barata['costo'] if mas_barata else None,
+            'actividad_minima_id': mas_barata['id'] if mas_barata else None,
+            'costo_total_actividades': totales['costo_total_actividades'] or Decimal('0.00'),
+            'duracion_total_actividades': totales['duracion_total_actividades'] or 0,
+        }
+    
+    @classmethod
+    def recalcular_actividades(cls, destino_id):
+        """Reescribe los agregados de actividades del destino (sin disparar sus señales)"""
+        cls.objects.filter(id=destino_id).update(**cls.agregados_actividades(destino_id))
+    
+    @classmethod
+    def recalcular_actividades_masivo(cls, destinos=None):
+        """
+        Igual que recalcular_actividades para muchos destinos a la vez, en un
+        solo UPDATE con subconsultas por destino (tras cargas con bulk_create)
+        
+        Returns:
+            número de destinos actualizados
+        """
+        actividades = Actividad.objects.filter(destino=OuterRef('pk')).order_by().values('destino')
+        disponibles = actividades.filter(disponible=True)
+        mas_barata = Actividad.objects.filter(destino=OuterRef('pk'), disponible=True).order_by('costo', 'id')
+        
+        return (cls.objects.all() if destinos is None else destinos).update(
+            num_actividades=Coalesce(Subquery(actividades.annotate(total=Count('id')).values('total')), 0),
+            costo_total_actividades=Coalesce(
+                Subquery(disponibles.annotate(total=Sum('costo')).values('total')), Decimal('0.00'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+            duracion_total_actividades=Coalesce(
+                Subquery(disponibles.annotate(total=Sum('duracion_minutos')).values('total')), 0
+            ),
+            actividad_minima_id=Subquery(mas_barata.values('id')[:1]),
+            costo_minimo_actividad=Subquery(mas_barata.values('costo')[:1]),
+        )
 
 
 class Actividad(models.Model):
@@ -83,9 +221,21 @@ class Actividad(models.Model):
     class Meta:
         verbose_name = "Actividad"
         verbose_name_plural = "Actividades"
+        indexes = [
+            # Actividades disponibles de un destino, de la más barata a la más cara
+            models.Index(fields=['destino', 'costo'], condition=Q(disponible=True),
+                         name='actividad_disp_costo_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.destino.nombre}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Si la actividad cambia de destino, también se recalcula el anterior
+        instancia._destino_original = instancia.__dict__.get('destino_id')
+        return instancia
 
 
 class ImagenDestino(models.Model):
@@ -103,4 +253,18 @@ class ImagenDestino(models.Model):
         ordering = ['orden']
     
     def __str__(self):
-        return f"Imagen {self.orden} - {self.destino.nombre}"
\ No newline at end of file
+        return f"Imagen {self.orden} - {self.destino.nombre}"
+
+class VersionCatalogo(models.Model):
+    """
+    Fila única con la versión del catálogo (ver catalogo.py); vive en la
+    base de datos para que todos los procesos vean el mismo valor
+    """
+    version = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Versión del Catálogo"
+        verbose_name_plural = "Versión del Catálogo"
+    
+    def __str__(self):
+        return f"Catálogo v{self.version}"
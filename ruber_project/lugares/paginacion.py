@@ -0,0 +1,121 @@
+"""
+Paginación por clave (keyset / seek) del listado de destinos.
+
+En lugar de OFFSET, cada página continúa desde el último (o primer)
+destino visto: WHERE (clave, id) > (valor, último_id). El costo de una
+página no depende de su posición en el catálogo y los destinos nuevos no
+desplazan las páginas ya vistas. El id desempata las claves repetidas en
+el mismo sentido que la clave, así un índice (clave, id) sirve ambos.
+"""
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+
+
+TAMANO_PAGINA = 12
+
+# Columnas que usan la tarjeta del listado y el árbol rojo-negro
+CAMPOS_LISTADO = (
+    'id', 'nombre', 'descripcion', 'imagen_principal', 'calificacion',
+    'costo_entrada', 'tiempo_visita_estimado', 'categoria__nombre',
+)
+
+
+def codificar_cursor(valor, id_destino):
+    """Cursor opaco para la URL a partir de (clave de orden, id)"""
+    crudo = json.dumps([str(valor), id_destino], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """(valor, id) de un cursor; None si falta o no es válido"""
+    if not cursor:
+        return None
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valor, id_destino = json.loads(crudo.decode('utf-8'))
+        return str(valor), int(id_destino)
+    except (ValueError, TypeError):
+        return None
+
+
+def expresion_orden(campo):
+    """El nombre se ordena sin distinguir mayúsculas, como el árbol rojo-negro"""
+    return Lower('nombre') if campo == 'nombre' else F(campo)
+
+
+def paginar_keyset(queryset, campo, descendente=False, despues=None, antes=None, tamano=TAMANO_PAGINA):
+    """
+    Una página del queryset ordenado por (campo, id)
+
+    Args:
+        queryset: destinos ya filtrados
+        campo: 'nombre', 'calificacion' o 'costo_entrada'
+        descendente: orden de la clave (el id desempata en el mismo sentido)
+        despues: cursor del último destino de la página anterior
+        antes: cursor del primer destino de la página siguiente (volver atrás)
+        tamano: destinos por página
+
+    Returns:
+        (destinos de la página, cursor siguiente o None, cursor anterior o None)
+    """
+    queryset = queryset.annotate(clave_orden=expresion_orden(campo))
+
+    cursor = decodificar_cursor(antes)
+    retrocede = cursor is not None
+    if not retrocede:
+        cursor = decodificar_cursor(despues)
+
+    # Volver atrás recorre el orden invertido y luego voltea la página
+    ascendente = descendente == retrocede
+    mayor = 'gt' if ascendente else 'lt'
+
+    if cursor:
+        valor, id_destino = cursor
+        try:
+            # clave >= valor acota el rango del índice; el OR descarta los empates ya vistos
+            queryset = queryset.filter(
+                Q(**{f'clave_orden__{mayor}e': valor}),
+                Q(**{f'clave_orden__{mayor}': valor}) | Q(**{f'id__{mayor}': id_destino}),
+            )
+        except ValidationError:
+            # Cursor de otro orden (p. ej. un nombre como calificación): primera página
+            cursor, retrocede = None, False
+            ascendente = not descendente
+
+    orden = ('clave_orden', 'id') if ascendente else ('-clave_orden', '-id')
+    filas = list(queryset.order_by(*orden)[:tamano + 1])
+
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if retrocede:
+        filas.reverse()
+
+    if not filas:
+        return filas, None, None
+
+    hay_siguiente = hay_mas if not retrocede else True
+    hay_anterior = hay_mas if retrocede else cursor is not None
+
+    siguiente = codificar_cursor(filas[-1].clave_orden, filas[-1].id) if hay_siguiente else None
+    anterior = codificar_cursor(filas[0].clave_orden, filas[0].id) if hay_anterior else None
+    return filas, siguiente, anterior
+
+
+def paginar_desplazamiento(queryset, desde=0, tamano=TAMANO_PAGINA):
+    """
+    Paginación por desplazamiento para el orden por relevancia: el rango
+    BM25 no es una columna estable sobre la que buscar, y los resultados
+    de una búsqueda de texto son acotados
+
+    Returns:
+        (destinos de la página, desplazamiento siguiente o None, anterior o None)
+    """
+    desde = max(0, desde)
+    filas = list(queryset[desde:desde + tamano + 1])
+
+    siguiente = desde + tamano if len(filas) > tamano else None
+    anterior = max(0, desde - tamano) if desde > 0 else None
+    return filas[:tamano], siguiente, anterior
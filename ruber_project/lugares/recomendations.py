@@ -1,6 +1,10 @@
 from collections import defaultdict
+from core.trazas import tramo
 from .models import Destino, Actividad
 import heapq
+import logging
+
+logger = logging.getLogger('ruber.recomendaciones')
 
 
 class GrafoRecomendaciones:
@@ -12,28 +16,30 @@ class GrafoRecomendaciones:
     
     def construir_grafo(self, destinos_queryset=None):
      
-        # Obtener todos los destinos activos
-        if destinos_queryset is None:
-            destinos = list(Destino.objects.filter(activo=True).prefetch_related('actividades'))
-        else:
-            destinos = list(destinos_queryset)
-        
-        # Cachear destinos por ID para acceso rápido
-        self.destinos_cache = {d.id: d for d in destinos}
-        
-        # Construir aristas entre todos los pares de destinos
-        for i, destino1 in enumerate(destinos):
-            for destino2 in destinos[i+1:]:  # Evitar duplicados y auto-comparación
-                peso = self._calcular_similitud(destino1, destino2)
-                
-                # Solo agregar aristas con similitud significativa (> 0.1)
-                if peso > 0.1:
-                    # Grafo no dirigido: agregar en ambas direcciones
-                    self.grafo[destino1.id].append((destino2.id, peso))
-                    self.grafo[destino2.id].append((destino1.id, peso))
-        
-        print(f"Grafo construido con {len(destinos)} nodos")
-        print(f"Total de aristas: {sum(len(v) for v in self.grafo.values()) // 2}")
+        with tramo('recomendaciones.grafo') as medicion:
+            # Obtener todos los destinos activos
+            if destinos_queryset is None:
+                destinos = list(Destino.objects.filter(activo=True).prefetch_related('actividades'))
+            else:
+                destinos = list(destinos_queryset)
+            
+            # Cachear destinos por ID para acceso rápido
+            self.destinos_cache = {d.id: d for d in destinos}
+            
+            # Construir aristas entre todos los pares de destinos
+            aristas = 0
+            for i, destino1 in enumerate(destinos):
+                for destino2 in destinos[i+1:]:  # Evitar duplicados y auto-comparación
+                    peso = self._calcular_similitud(destino1, destino2)
+                    
+                    # Solo agregar aristas con similitud significativa (> 0.1)
+                    if peso > 0.1:
+                        # Grafo no dirigido: agregar en ambas direcciones
+                        self.grafo[destino1.id].append((destino2.id, peso))
+                        self.grafo[destino2.id].append((destino1.id, peso))
+                        aristas += 1
+            
+            medicion.anotar(nodos=len(destinos), aristas=aristas)
     
     def _calcular_similitud(self, destino1, destino2):
       
@@ -78,25 +84,23 @@ class GrafoRecomendaciones:
     
     def recomendar(self, destino_id, n=5):
     
-        if destino_id not in self.grafo:
-            print(f"Destino {destino_id} no está en el grafo")
-            return []
-        
-        vecinos = self.grafo[destino_id]
+        # grafo es un defaultdict: un destino sin aristas no queda como clave
+        vecinos = self.grafo.get(destino_id)
         
         if not vecinos:
-            print(f"⚠ No hay vecinos para destino {destino_id}")
+            logger.debug('recomendaciones destino=%s sin vecinos en el grafo', destino_id)
             return []
         
-        top_n = heapq.nlargest(n, vecinos, key=lambda x: x[1])
-        
-        recomendaciones = []
-        for destino_vecino_id, peso in top_n:
-            destino_obj = self.destinos_cache.get(destino_vecino_id)
-            if destino_obj:
-                recomendaciones.append((destino_obj, peso))
+        with tramo('recomendaciones.seleccion', destino=destino_id) as medicion:
+            top_n = heapq.nlargest(n, vecinos, key=lambda x: x[1])
+            
+            recomendaciones = []
+            for destino_vecino_id, peso in top_n:
+                destino_obj = self.destinos_cache.get(destino_vecino_id)
+                if destino_obj:
+                    recomendaciones.append((destino_obj, peso))
+            medicion.anotar(vecinos=len(vecinos), recomendaciones=len(recomendaciones))
         
-        print(f"✓ Generadas {len(recomendaciones)} recomendaciones para destino {destino_id}")
         return recomendaciones
     
     def obtener_estadisticas(self, destino_id):
@@ -1,4 +1,9 @@
 from enum import Enum
+import logging
+
+from core.trazas import diagnostico_activo, tramo
+
+logger = logging.getLogger('ruber.diagnostico')
 
 
 class Color(Enum):
@@ -54,7 +59,24 @@ class ArbolRojoNegro:
     def insertar(self, destino):
  
         # Crear nuevo nodo (inicialmente rojo)
-        nuevo_nodo = Nodo(destino, Color.RED)
+        self._insertar_nodo(Nodo(destino, Color.RED))
+    
+    def _menor(self, nodo, otro):
+        """Orden del árbol (los árboles derivados lo redefinen)"""
+        return self._comparar(nodo.destino, otro.destino) < 0
+    
+    def _actualizar(self, nodo):
+        """
+        Recalcula el dato aumentado de un nodo a partir de sus hijos; se
+        llama tras cada rotación. Sin aumento no hace nada
+        """
+    
+    def _actualizar_hasta_raiz(self, nodo):
+        while nodo is not None and nodo != self.NIL:
+            self._actualizar(nodo)
+            nodo = nodo.padre
+    
+    def _insertar_nodo(self, nuevo_nodo):
         nuevo_nodo.izquierdo = self.NIL
         nuevo_nodo.derecho = self.NIL
         
@@ -64,7 +86,7 @@ class ArbolRojoNegro:
         
         while actual != self.NIL:
             padre = actual
-            if self._comparar(nuevo_nodo.destino, actual.destino) < 0:
+            if self._menor(nuevo_nodo, actual):
                 actual = actual.izquierdo
             else:
                 actual = actual.derecho
@@ -76,7 +98,7 @@ class ArbolRojoNegro:
         if padre is None:
             # Árbol estaba vacío
             self.raiz = nuevo_nodo
-        elif self._comparar(nuevo_nodo.destino, padre.destino) < 0:
+        elif self._menor(nuevo_nodo, padre):
             padre.izquierdo = nuevo_nodo
         else:
             padre.derecho = nuevo_nodo
@@ -86,6 +108,66 @@ class ArbolRojoNegro:
         # Restaurar propiedades del árbol rojo-negro
         self._arreglar_insercion(nuevo_nodo)
     
+    def _eliminar_nodo(self, nodo):
+        """Quita un nodo del árbol (CLRS) y restaura las propiedades"""
+        reemplazo = nodo
+        color_original = reemplazo.color
+        
+        if nodo.izquierdo == self.NIL:
+            hijo = nodo.derecho
+            self._trasplantar(nodo, nodo.derecho)
+        elif nodo.derecho == self.NIL:
+            hijo = nodo.izquierdo
+            self._trasplantar(nodo, nodo.izquierdo)
+        else:
+            reemplazo = self._minimo(nodo.derecho)
+            color_original = reemplazo.color
+            hijo = reemplazo.derecho
+            
+            if reemplazo.padre == nodo:
+                hijo.padre = reemplazo
+            else:
+                self._trasplantar(reemplazo, reemplazo.derecho)
+                reemplazo.derecho = nodo.derecho
+                reemplazo.derecho.padre = reemplazo
+            
+            self._trasplantar(nodo, reemplazo)
+            reemplazo.izquierdo = nodo.izquierdo
+            reemplazo.izquierdo.padre = reemplazo
+            reemplazo.color = nodo.color
+        
+        self.cantidad_nodos -= 1
+        
+        # Los datos aumentados cambian desde el punto más bajo que se movió
+        self._actualizar_hasta_raiz(hijo.padre)
+        
+        if color_original == Color.BLACK:
+            self._arreglar_eliminacion(hijo)
+    
+    def _trasplantar(self, nodo, reemplazo):
+        if nodo.padre is None:
+            self.raiz = reemplazo
+        elif nodo == nodo.padre.izquierdo:
+            nodo.padre.izquierdo = reemplazo
+        else:
+            nodo.padre.derecho = reemplazo
+        reemplazo.padre = nodo.padre
+    
+    def _minimo(self, nodo):
+        while nodo.izquierdo != self.NIL:
+            nodo = nodo.izquierdo
+        return nodo
+    
+    def _sucesor(self, nodo):
+        """Siguiente nodo en orden, o None"""
+        if nodo.derecho != self.NIL:
+            return self._minimo(nodo.derecho)
+        padre = nodo.padre
+        while padre is not None and nodo == padre.derecho:
+            nodo = padre
+            padre = padre.padre
+        return padre
+    
     def _arreglar_insercion(self, nodo):
  
         while nodo.padre and nodo.padre.color == Color.RED:
@@ -152,6 +234,9 @@ class ArbolRojoNegro:
         
         y.izquierdo = nodo
         nodo.padre = y
+        
+        self._actualizar(nodo)
+        self._actualizar(y)
     
     def _rotar_derecha(self, nodo):
    
@@ -172,6 +257,69 @@ class ArbolRojoNegro:
         
         x.derecho = nodo
         nodo.padre = x
+        
+        self._actualizar(nodo)
+        self._actualizar(x)
+    
+    def _arreglar_eliminacion(self, nodo):
+        
+        while nodo != self.raiz and nodo.color == Color.BLACK:
+            if nodo == nodo.padre.izquierdo:
+                # Nodo es hijo izquierdo
+                hermano = nodo.padre.derecho
+                
+                if hermano.color == Color.RED:
+                    # Caso 1: Hermano es rojo
+                    hermano.color = Color.BLACK
+                    nodo.padre.color = Color.RED
+                    self._rotar_izquierda(nodo.padre)
+                    hermano = nodo.padre.derecho
+                
+                if hermano.izquierdo.color == Color.BLACK and hermano.derecho.color == Color.BLACK:
+                    # Caso 2: Hermano negro con hijos negros
+                    hermano.color = Color.RED
+                    nodo = nodo.padre
+                else:
+                    if hermano.derecho.color == Color.BLACK:
+                        # Caso 3: Hijo lejano del hermano es negro
+                        hermano.izquierdo.color = Color.BLACK
+                        hermano.color = Color.RED
+                        self._rotar_derecha(hermano)
+                        hermano = nodo.padre.derecho
+                    
+                    # Caso 4: Hijo lejano del hermano es rojo
+                    hermano.color = nodo.padre.color
+                    nodo.padre.color = Color.BLACK
+                    hermano.derecho.color = Color.BLACK
+                    self._rotar_izquierda(nodo.padre)
+                    nodo = self.raiz
+            else:
+                # Nodo es hijo derecho (simétrico)
+                hermano = nodo.padre.izquierdo
+                
+                if hermano.color == Color.RED:
+                    hermano.color = Color.BLACK
+                    nodo.padre.color = Color.RED
+                    self._rotar_derecha(nodo.padre)
+                    hermano = nodo.padre.izquierdo
+                
+                if hermano.derecho.color == Color.BLACK and hermano.izquierdo.color == Color.BLACK:
+                    hermano.color = Color.RED
+                    nodo = nodo.padre
+                else:
+                    if hermano.izquierdo.color == Color.BLACK:
+                        hermano.derecho.color = Color.BLACK
+                        hermano.color = Color.RED
+                        self._rotar_izquierda(hermano)
+                        hermano = nodo.padre.izquierdo
+                    
+                    hermano.color = nodo.padre.color
+                    nodo.padre.color = Color.BLACK
+                    hermano.izquierdo.color = Color.BLACK
+                    self._rotar_derecha(nodo.padre)
+                    nodo = self.raiz
+        
+        nodo.color = Color.BLACK
     
     def recorrido_inorden(self):
 
@@ -325,29 +473,30 @@ class ArbolRojoNegro:
 # ===================================
 
 def ordenar_destinos_rb(destinos_queryset, criterio='nombre', reverso=False):
-    # Crear árbol
-    arbol = ArbolRojoNegro(criterio=criterio)
-    
-    # Insertar todos los destinos
-    for destino in destinos_queryset:
-        arbol.insertar(destino)
-    
-    # Obtener destinos ordenados
-    destinos_ordenados = arbol.recorrido_inorden()
+    with tramo('arbol_rb.construir', criterio=criterio) as medicion:
+        # Crear árbol
+        arbol = ArbolRojoNegro(criterio=criterio)
+        
+        # Insertar todos los destinos
+        for destino in destinos_queryset:
+            arbol.insertar(destino)
+        
+        # Obtener destinos ordenados
+        destinos_ordenados = arbol.recorrido_inorden()
+        medicion.anotar(nodos=arbol.cantidad_nodos)
     
     # Invertir si se requiere orden descendente
     if reverso:
         destinos_ordenados.reverse()
     
-    # Información de debug
-    print(f"✓ Árbol Rojo-Negro creado")
-    print(f"  - Criterio: {criterio}")
-    print(f"  - Nodos: {arbol.cantidad_nodos}")
-    print(f"  - Altura: {arbol.altura()}")
-    print(f"  - Altura máxima teórica: {2 * (arbol.cantidad_nodos + 1).bit_length()}")
-    
-    # Verificar validez
-    valido, mensaje = arbol.verificar_propiedades()
-    print(f"  - Válido: {valido} - {mensaje}")
+    # Recorrer el árbol entero para validarlo solo si se pidió el diagnóstico
+    if diagnostico_activo():
+        valido, mensaje = arbol.verificar_propiedades()
+        logger.log(
+            logging.DEBUG if valido else logging.WARNING,
+            'arbol_rb criterio=%s nodos=%s altura=%s altura_maxima=%s valido=%s mensaje="%s"',
+            criterio, arbol.cantidad_nodos, arbol.altura(),
+            2 * (arbol.cantidad_nodos + 1).bit_length(), valido, mensaje,
+        )
     
     return destinos_ordenados, arbol
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .busqueda import indexar_destino
+from .catalogo import incrementar_version_catalogo
+from .models import Destino, Actividad, Categoria, ImagenDestino
+
+
+@receiver([post_save, post_delete], sender=Destino)
+def indexar_cambio_destino(sender, instance, **kwargs):
+    """Mantiene el índice de búsqueda al crear, editar o borrar un destino"""
+    indexar_destino(instance.id)
+    incrementar_version_catalogo()
+
+
+@receiver([post_save, post_delete], sender=Actividad)
+def indexar_cambio_actividad(sender, instance, **kwargs):
+    """Los nombres de las actividades también se buscan, y el detalle en caché las muestra"""
+    indexar_destino(instance.destino_id)
+    incrementar_version_catalogo()
+
+
+@receiver([post_save, post_delete], sender=Actividad)
+def actualizar_agregados_actividad(sender, instance, **kwargs):
+    """Mantiene en el destino el número, costo mínimo y duración de sus actividades"""
+    Destino.recalcular_actividades(instance.destino_id)
+    
+    original = getattr(instance, '_destino_original', None)
+    if original and original != instance.destino_id:
+        # La actividad se movió a otro destino
+        Destino.recalcular_actividades(original)
+        indexar_destino(original)
+    instance._destino_original = instance.destino_id
+
+
+@receiver([post_save, post_delete], sender=Categoria)
+def cambio_categoria(sender, **kwargs):
+    """Las categorías también aparecen en el autocompletado"""
+    incrementar_version_catalogo()
+
+
+@receiver([post_save, post_delete], sender=ImagenDestino)
+def cambio_imagen(sender, **kwargs):
+    """La galería del detalle se sirve desde la caché"""
+    incrementar_version_catalogo()
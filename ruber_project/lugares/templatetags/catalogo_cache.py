@@ -0,0 +1,46 @@
+from django import template
+from django.core.cache import cache
+from lugares.cache_paginas import TIMEOUT_FRAGMENTO, clave_fragmento, registrar
+
+register = template.Library()
+
+
+class FragmentoCatalogoNode(template.Node):
+
+    def __init__(self, nodelist, nombre, variantes):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.variantes = variantes
+
+    def render(self, context):
+        variantes = [variante.resolve(context) for variante in self.variantes]
+        clave = clave_fragmento(self.nombre, *variantes, version=context.get('version_catalogo'))
+
+        contenido = cache.get(clave)
+        registrar(f'fragmento:{self.nombre}', contenido is not None)
+
+        if contenido is None:
+            contenido = self.nodelist.render(context)
+            cache.set(clave, contenido, TIMEOUT_FRAGMENTO)
+        return contenido
+
+
+@register.tag('fragmento_catalogo')
+def fragmento_catalogo(parser, token):
+    """
+    Cachea un fragmento mientras no cambie la versión del catálogo:
+
+        {% fragmento_catalogo tarjeta destino.id user.is_authenticated %}
+            ...
+        {% endfragmento_catalogo %}
+
+    El primer argumento nombra el fragmento (y su zona en las métricas);
+    el resto son las variables de las que depende su contenido.
+    """
+    partes = token.split_contents()
+    if len(partes) < 2:
+        raise template.TemplateSyntaxError(f"'{partes[0]}' necesita al menos el nombre del fragmento")
+
+    nodelist = parser.parse(('endfragmento_catalogo',))
+    parser.delete_first_token()
+    return FragmentoCatalogoNode(nodelist, partes[1], [parser.compile_filter(p) for p in partes[2:]])
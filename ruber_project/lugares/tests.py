@@ -1,3 +1,400 @@
+import re
+from decimal import Decimal
+from unittest import skipUnless
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from usuarios.models import Turista
+from .autocompletado import IndiceAutocompletado, obtener_indice
+from .busqueda import buscar, buscar_ids
+from .cache_paginas import metricas, reiniciar_metricas
+from .catalogo import olvidar_version_leida, version_catalogo
+from .geo import RADIO_DEFECTO_KM, haversine_km
+from .models import Actividad, Categoria, Destino, VersionCatalogo
 
-# Create your tests here.
+
+class PlanesConsultaMixin:
+    """
+    Verifica con EXPLAIN QUERY PLAN (SQLite) que las consultas capturadas
+    de una vista lean la tabla por un índice y no ordenen en memoria
+    """
+
+    def capturar(self, funcion, *args, **kwargs):
+        with CaptureQueriesContext(connection) as capturadas:
+            resultado = funcion(*args, **kwargs)
+        return resultado, [consulta['sql'] for consulta in capturadas.captured_queries]
+
+    def consultas_de(self, consultas, tabla, contiene=''):
+        return [sql for sql in consultas if f'FROM "{tabla}"' in sql and contiene in sql]
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [fila[-1] for fila in cursor.fetchall()]
+
+    def assertUsaIndice(self, sql, tabla, indice=None):
+        plan = self.plan(sql)
+        pasos = [paso for paso in plan if re.search(rf'\b{tabla}\b', paso)]
+
+        self.assertTrue(pasos, f'{tabla} no aparece en el plan: {plan}')
+        for paso in pasos:
+            self.assertTrue(
+                paso.startswith('SEARCH') or ' INDEX ' in paso,
+                f'{tabla} se recorre completa: {plan}\n{sql}',
+            )
+        if indice:
+            self.assertTrue(any(f'INDEX {indice}' in paso for paso in pasos), f'no usa {indice}: {plan}')
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, f'ordena en memoria: {sql}')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Los planes se leen con EXPLAIN QUERY PLAN de SQLite')
+class IndicesCatalogoTests(PlanesConsultaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.museos = Categoria.objects.create(nombre='Museos')
+        cls.playas = Categoria.objects.create(nombre='Playas')
+
+        for i in range(30):
+            destino = Destino.objects.create(
+                nombre=f'Destino {i % 7} {"ABCDE"[i % 5]}',
+                descripcion='Lugar de prueba',
+                categoria=cls.museos if i % 2 else cls.playas,
+                latitud=Decimal('-12.1') + Decimal(i) / 100,
+                longitud=Decimal('-77.0') - Decimal(i % 6) / 100,
+                costo_entrada=Decimal(i % 4 * 10),
+                tiempo_visita_estimado=60,
+                calificacion=Decimal(i % 5),
+                activo=i % 10 != 0,
+            )
+            for costo in (30, 10, 20):
+                Actividad.objects.create(
+                    destino=destino, nombre=f'Actividad {costo}', tipo='cultural',
+                    descripcion='', costo=Decimal(costo), duracion_minutos=60,
+                )
+
+    def setUp(self):
+        # Las páginas anónimas quedan en caché: cada prueba mide la página generada
+        cache.clear()
+
+    def listar(self, **parametros):
+        respuesta, consultas = self.capturar(self.client.get, reverse('lugares:lista_destinos'), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, consultas
+
+    def test_paginas_del_listado_usan_el_indice_de_su_orden(self):
+        indices = {
+            'nombre': 'destino_activo_nombre_idx',
+            'calificacion': 'destino_activo_calif_idx',
+            'precio': 'destino_activo_costo_idx',
+        }
+        for orden, indice in indices.items():
+            for direccion in ('asc', 'desc'):
+                with self.subTest(orden=orden, dir=direccion):
+                    respuesta, consultas = self.listar(orden=orden, dir=direccion)
+                    pagina, = self.consultas_de(consultas, 'lugares_destino', 'clave_orden')
+                    self.assertUsaIndice(pagina, 'lugares_destino', indice)
+
+                    # Página siguiente y vuelta atrás: búsqueda por rango en el mismo índice
+                    siguiente = dict(re.findall(r'(\w+)=([^&]+)', respuesta.context['url_siguiente']))
+                    respuesta, consultas = self.listar(**siguiente)
+                    pagina, = self.consultas_de(consultas, 'lugares_destino', 'clave_orden')
+                    self.assertUsaIndice(pagina, 'lugares_destino', indice)
+                    self.assertIn(f'SEARCH lugares_destino USING INDEX {indice}', ' '.join(self.plan(pagina)))
+
+                    anterior = dict(re.findall(r'(\w+)=([^&]+)', respuesta.context['url_anterior']))
+                    _, consultas = self.listar(**anterior)
+                    pagina, = self.consultas_de(consultas, 'lugares_destino', 'clave_orden')
+                    self.assertUsaIndice(pagina, 'lugares_destino', indice)
+
+    def test_filtro_por_categoria_y_precio(self):
+        _, consultas = self.listar(categoria=self.museos.id, orden='precio')
+        pagina, = self.consultas_de(consultas, 'lugares_destino', 'clave_orden')
+        self.assertUsaIndice(pagina, 'lugares_destino', 'destino_activo_cat_costo_idx')
+
+    def test_indicador_de_precio_es_un_agregado_indexado(self):
+        _, consultas = self.listar()
+        agregado, = self.consultas_de(consultas, 'lugares_destino', 'MAX(')
+        self.assertUsaIndice(agregado, 'lugares_destino')
+
+    def test_destacados_de_la_portada(self):
+        _, consultas = self.capturar(self.client.get, reverse('core:home'))
+        destacados, = self.consultas_de(consultas, 'lugares_destino', 'LIMIT 6')
+        self.assertUsaIndice(destacados, 'lugares_destino')
+
+    def test_detalle_actividades_y_recomendaciones(self):
+        destino = Destino.objects.filter(activo=True).first()
+        respuesta, consultas = self.capturar(
+            self.client.get, reverse('lugares:detalle_destino', args=[destino.id])
+        )
+        self.assertEqual(respuesta.status_code, 200)
+
+        actividades = self.consultas_de(consultas, 'lugares_actividad', '"disponible"')
+        self.assertTrue(actividades)
+        for sql in actividades:
+            self.assertUsaIndice(sql, 'lugares_actividad')
+
+        # Candidatos de recomendación en el orden por defecto (-calificacion, nombre)
+        ranking, = self.consultas_de(consultas, 'lugares_destino', 'ORDER BY "lugares_destino"."calificacion" DESC')
+        self.assertUsaIndice(ranking, 'lugares_destino', 'destino_activo_ranking_idx')
+
+    def test_actividades_disponibles_por_costo(self):
+        destino = Destino.objects.filter(activo=True).first()
+        consulta = destino.actividades.filter(disponible=True).order_by('costo')
+        self.assertUsaIndice(str(consulta.query), 'lugares_actividad', 'actividad_disp_costo_idx')
+
+    def test_cercania_prefiltra_por_indice_y_ordena_por_distancia(self):
+        cercanos = Destino.objects.filter(activo=True).cerca_de(-12.0, -77.02, 5)
+        # La distancia se calcula por fila: el orden final es en memoria, sobre los candidatos de la caja
+        self.assertUsaIndice(str(cercanos.order_by().query), 'lugares_destino', 'destino_activo_geo_idx')
+
+        esperados = sorted(
+            (haversine_km(-12.0, -77.02, float(d.latitud), float(d.longitud)), d.id)
+            for d in Destino.objects.filter(activo=True)
+        )
+        esperados = [id_destino for distancia, id_destino in esperados if distancia <= 5]
+        self.assertTrue(esperados)
+        self.assertEqual([d.id for d in cercanos], esperados)
+
+        respuesta, _ = self.listar(lat='-12.0', lng='-77.02', radio='5')
+        self.assertEqual(respuesta.context['orden_actual'], 'distancia')
+        self.assertEqual([d.id for d in respuesta.context['destinos']], esperados[:len(respuesta.context['destinos'])])
+
+    def test_radio_no_finito_usa_el_radio_por_defecto(self):
+        for radio in ('nan', 'inf', '-inf'):
+            respuesta, _ = self.listar(lat='-12.0', lng='-77.02', radio=radio)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta.context['radio_actual'], RADIO_DEFECTO_KM)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'La búsqueda de texto completo usa FTS5 de SQLite')
+class BusquedaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Cultura')
+        datos = [
+            ('Museo Larco', 'Cerámica precolombina en Pueblo Libre'),
+            ('Parque de la Reserva', 'Circuito mágico del agua; cerca hay un museo'),
+            ('Huaca Pucllana', 'Pirámide de adobe en Miraflores'),
+        ]
+        cls.larco, cls.parque, cls.huaca = (
+            Destino.objects.create(
+                nombre=nombre, descripcion=descripcion, categoria=categoria,
+                latitud=Decimal('-12.1'), longitud=Decimal('-77.0'), tiempo_visita_estimado=60,
+            )
+            for nombre, descripcion in datos
+        )
+        Actividad.objects.create(
+            destino=cls.huaca, nombre='Recorrido nocturno', tipo='cultural',
+            descripcion='', costo=Decimal('15'), duracion_minutos=60,
+        )
+
+    def test_nombre_pesa_mas_que_la_descripcion(self):
+        # Los dos mencionan "museo", pero solo en uno está en el nombre
+        self.assertEqual(buscar_ids('museo'), [self.larco.id, self.parque.id])
+        self.assertEqual(list(buscar(Destino.objects.all(), 'MUSEO')), [self.larco, self.parque])
+
+    def test_prefijos_tildes_y_actividades(self):
+        self.assertEqual(buscar_ids('ceram'), [self.larco.id])
+        self.assertEqual(buscar_ids('magico agua'), [self.parque.id])
+        self.assertEqual(buscar_ids('nocturno'), [self.huaca.id])
+        self.assertEqual(buscar_ids('"; DROP'), [])
+
+    def test_editar_un_destino_lo_reindexa(self):
+        self.huaca.nombre = 'Huaca Huallamarca'
+        self.huaca.save()
+        self.assertEqual(buscar_ids('pucllana'), [])
+        self.assertEqual(buscar_ids('huallamarca'), [self.huaca.id])
+
+        self.huaca.delete()
+        self.assertEqual(buscar_ids('nocturno'), [])
+
+
+class CachePaginasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Huacas')
+        cls.destinos = [
+            Destino.objects.create(
+                nombre=f'Huaca {i}', descripcion='Sitio arqueológico', categoria=categoria,
+                latitud=Decimal('-12.1'), longitud=Decimal('-77.0'), tiempo_visita_estimado=60,
+            )
+            for i in range(3)
+        ]
+        cls.turista = Turista.objects.create_user(username='con_sesion', password='clave-segura')
+
+    def setUp(self):
+        cache.clear()
+        reiniciar_metricas()
+
+    def test_anonimo_recibe_la_pagina_en_cache(self):
+        url = reverse('lugares:lista_destinos')
+        self.assertEqual(self.client.get(url, {'orden': 'nombre', 'direccion': 'asc'})['X-Cache'], 'MISS')
+        # El orden de los parámetros no cambia la clave
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(f'{url}?direccion=asc&orden=nombre')
+        self.assertEqual(respuesta['X-Cache'], 'HIT')
+        self.assertContains(respuesta, 'Huaca 0')
+        self.assertFalse([c for c in consultas.captured_queries if 'lugares_destino' in c['sql']])
+
+        zona = metricas()['vista:lista_destinos']
+        self.assertEqual((zona['aciertos'], zona['fallos'], zona['tasa']), (1, 1, 0.5))
+
+    def test_con_sesion_no_usa_la_cache_de_vistas(self):
+        self.client.force_login(self.turista)
+        url = reverse('lugares:lista_destinos')
+        for _ in range(2):
+            self.assertNotIn('X-Cache', self.client.get(url))
+
+        zona = metricas()['vista:lista_destinos']
+        self.assertEqual((zona['aciertos'], zona['fallos']), (0, 0))
+
+    def test_guardar_un_destino_invalida_vistas_y_fragmentos(self):
+        destino = self.destinos[0]
+        url = reverse('lugares:detalle_destino', args=[destino.id])
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        version = version_catalogo()
+        destino.nombre = 'Huaca Pucllana'
+        destino.save()
+        self.assertNotEqual(version_catalogo(), version)
+
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta['X-Cache'], 'MISS')
+        self.assertContains(respuesta, 'Huaca Pucllana')
+        # Los fragmentos de la versión anterior tampoco se reutilizan
+        self.assertEqual(metricas()['fragmento:galeria']['aciertos'], 0)
+        self.assertEqual(metricas()['fragmento:galeria']['fallos'], 2)
+
+    def test_fragmentos_se_reutilizan_con_sesion(self):
+        self.client.force_login(self.turista)
+        url = reverse('lugares:detalle_destino', args=[self.destinos[1].id])
+        self.client.get(url)
+        self.client.get(url)
+
+        zona = metricas()['fragmento:recomendaciones']
+        self.assertEqual((zona['aciertos'], zona['fallos']), (1, 1))
+
+
+class AutocompletadoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.museos = Categoria.objects.create(nombre='Museos')
+        cls.destinos = {
+            nombre: Destino.objects.create(
+                nombre=nombre, descripcion='Lugar', categoria=cls.museos, calificacion=Decimal(calificacion),
+                latitud=Decimal('-12.1'), longitud=Decimal('-77.0'), tiempo_visita_estimado=60,
+            )
+            for nombre, calificacion in (
+                ('Museo Larco', '4.8'), ('Museo de Arte de Lima', '4.5'), ('Mercado de Surquillo', '4.1'),
+                ('Malecón de Miraflores', '4.9'),
+            )
+        }
+
+    def setUp(self):
+        olvidar_version_leida()
+
+    def nombres(self, texto, limite=10):
+        return [sugerencia['nombre'] for sugerencia in obtener_indice().buscar(texto, limite)]
+
+    def test_prefijo_de_cualquier_palabra_ordenado_por_calificacion(self):
+        # La categoría se ordena por la calificación media de sus destinos (4.58)
+        self.assertEqual(self.nombres('m'), [
+            'Malecón de Miraflores', 'Museo Larco', 'Museos', 'Museo de Arte de Lima', 'Mercado de Surquillo',
+        ])
+        self.assertEqual(self.nombres('mu'), ['Museo Larco', 'Museos', 'Museo de Arte de Lima'])
+        self.assertEqual(self.nombres('larc'), ['Museo Larco'])
+        self.assertEqual(self.nombres('malecon'), ['Malecón de Miraflores'])
+        self.assertEqual(self.nombres('museo li'), ['Museo de Arte de Lima'])
+        self.assertEqual(self.nombres('mu', limite=1), ['Museo Larco'])
+        self.assertEqual(self.nombres('zz'), [])
+
+    def test_rangos_grandes_coinciden_con_el_recorrido_directo(self):
+        sugerencias = [
+            {'tipo': 'destino', 'id': i, 'nombre': f'Plaza {i % 50} Norte {i}', 'categoria': None,
+             'calificacion': float(i % 7), 'url': ''}
+            for i in range(2000)
+        ]
+        indice = IndiceAutocompletado(sugerencias)
+        for texto in ('plaza', 'plaza 1', 'norte 19', 'pla nor'):
+            esperado = sorted(
+                (s for s in sugerencias
+                 if all(any(p.startswith(t) for p in s['nombre'].lower().split()) for t in texto.split())),
+                key=lambda s: (-s['calificacion'], s['nombre'].lower()),
+            )[:10]
+            self.assertEqual(indice.buscar(texto), esperado, texto)
+
+    def test_editar_un_destino_reconstruye_el_indice(self):
+        indice = obtener_indice()
+        destino = self.destinos['Mercado de Surquillo']
+        destino.nombre = 'Mercado N.º 1 de Surquillo'
+        destino.save()
+
+        self.assertIsNot(obtener_indice(), indice)
+        self.assertEqual(self.nombres('mercado'), ['Mercado N.º 1 de Surquillo'])
+
+    def test_version_compartida_entre_procesos(self):
+        indice = obtener_indice()
+        # Otro proceso edita el catálogo: solo cambia la fila de la base de datos
+        VersionCatalogo.objects.filter(pk=1).update(version=F('version') + 1)
+        self.assertIs(obtener_indice(), indice)
+
+        # Pasado TTL_VERSION_LOCAL este proceso vuelve a leer la versión
+        olvidar_version_leida()
+        self.assertIsNot(obtener_indice(), indice)
+
+
+class AgregadosActividadesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Parques')
+        cls.destino = Destino.objects.create(
+            nombre='Parque Kennedy', descripcion='Parque', categoria=categoria,
+            latitud=Decimal('-12.12'), longitud=Decimal('-77.03'), tiempo_visita_estimado=45,
+        )
+
+    def agregar_actividad(self, costo):
+        return Actividad.objects.create(
+            destino=self.destino, nombre=f'Paseo {costo}', tipo='cultural',
+            descripcion='', costo=Decimal(costo), duracion_minutos=30,
+        )
+
+    def test_instancia_vieja_no_pisa_los_agregados(self):
+        vieja = Destino.objects.get(pk=self.destino.pk)
+        actividad = self.agregar_actividad('12')
+
+        vieja.nombre = 'Parque Central'
+        vieja.save()
+        # La instancia queda con los agregados de la fila
+        self.assertEqual((vieja.num_actividades, vieja.actividad_minima_id), (1, actividad.id))
+
+        guardado = Destino.objects.get(pk=self.destino.pk)
+        self.assertEqual(guardado.nombre, 'Parque Central')
+        self.assertEqual(guardado.costo_minimo_actividad, Decimal('12.00'))
+        self.assertEqual(guardado.num_actividades, 1)
+
+    def test_clonar_inserta_un_destino_nuevo(self):
+        self.agregar_actividad('8')
+        copia = Destino.objects.get(pk=self.destino.pk)
+        copia.pk = None
+        copia.nombre = 'Parque Kennedy (copia)'
+        copia.save()
+
+        self.assertNotEqual(copia.pk, self.destino.pk)
+        self.assertEqual(Destino.objects.count(), 2)
+        self.assertEqual(Destino.objects.get(pk=self.destino.pk).nombre, 'Parque Kennedy')
+
+    def test_guardar_una_fila_borrada_la_vuelve_a_insertar(self):
+        destino = Destino.objects.get(pk=self.destino.pk)
+        Destino.objects.filter(pk=destino.pk).delete()
+
+        destino.save()
+        self.assertTrue(Destino.objects.filter(pk=destino.pk, nombre='Parque Kennedy').exists())
@@ -6,5 +6,6 @@ app_name = 'lugares'
 urlpatterns = [
     path('', views.lista_destinos, name='lista_destinos'),
     path('<int:destino_id>/', views.detalle_destino, name='detalle_destino'),
+    path('autocompletar/', views.autocompletar, name='autocompletar'),
     
 ]
\ No newline at end of file
@@ -1,26 +1,37 @@
+import json
+import math
 from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.functional import SimpleLazyObject
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Max, Prefetch, Q, prefetch_related_objects
 from .recomendations import obtener_recomendaciones
 from .models import Destino, Categoria, Actividad
+from .busqueda import buscar
+from .geo import RADIO_DEFECTO_KM, RADIO_MAXIMO_KM, centro_caja, leer_caja, leer_punto
+from .paginacion import CAMPOS_LISTADO, paginar_desplazamiento, paginar_keyset
+from .autocompletado import MAX_SUGERENCIAS, obtener_indice
+from .cache_paginas import cache_anonimo
+from .catalogo import version_catalogo
 from .red_black_tree import ordenar_destinos_rb
+from core.trazas import diagnostico_activo
 # IMPORTANTE: Importar el formulario de itinerarios
 from itinerarios.forms import AgregarActividadForm
 
 
+@cache_anonimo('vista:lista_destinos')
 def lista_destinos(request):
-    """Lista de destinos con filtros"""
+    """
+    Lista de destinos con filtros, paginada por clave (ver paginacion.py):
+    cada página trae solo sus filas y las columnas que usa la tarjeta
+    """
     destinos = Destino.objects.filter(activo=True)
     
     preferencias_usuario = []
     
     if request.user.is_authenticated:
-        print(request.user.username)
         preferencias_usuario = request.user.preferencias
-    else:
-        print("Usuario no logueado (Anónimo)")
-
-    A=[]
     
     # Filtros
     categoria_id = request.GET.get('categoria')
@@ -30,31 +41,40 @@ def lista_destinos(request):
     if categoria_id:
         destinos = destinos.filter(categoria_id=categoria_id)
     
+    # Cercanía: círculo alrededor de lat/lng o rectángulo del mapa (caja)
+    punto, radio, caja = _filtro_geografico(request)
+    if radio:
+        destinos = destinos.cerca_de(*punto, radio)
+    elif caja:
+        destinos = destinos.en_caja(*caja).con_distancia(*punto)
+    
+    # Búsqueda de texto completo ordenada por relevancia (BM25) si hay índice
+    resultados = buscar(destinos, busqueda) if busqueda else None
+    por_relevancia = resultados is not None
+    
     if busqueda:
-        destinos = destinos.filter(
-            Q(nombre__icontains=busqueda) | 
-            Q(descripcion__icontains=busqueda)
-        )
+        if por_relevancia:
+            destinos = resultados
+        else:
+            destinos = destinos.filter(
+                Q(nombre__icontains=busqueda) | 
+                Q(descripcion__icontains=busqueda)
+            )
     
     if preferencia and preferencias_usuario:
+        # Algún tag igual a una preferencia, filtrado en la base de datos
+        # (el JSON guarda cada tag entre comillas y con el mismo escape)
+        coincide = Q()
         for e in preferencias_usuario:
-            for i in destinos:
-                if e in i.tags_preferencias:
-                    A.append(i.nombre)
-                    
-        pref=Destino.objects.none()
-        for e in A:
-            pref = pref | Destino.objects.filter(nombre=e)
-
-        print(pref)
-        destinos=pref
-
-    print(A)
+            coincide |= Q(tags_preferencias__icontains=json.dumps(e))
+        destinos = destinos.filter(coincide)
+
     categorias = Categoria.objects.all()
-    print(destinos)
 
-    # Árbol Rojo-Negro
-    orden = request.GET.get('orden', 'nombre')
+    # Un solo agregado en lugar de recorrer todos los destinos
+    hay_precios_mayores_a_cero = (destinos.aggregate(maximo=Max('costo_entrada'))['maximo'] or 0) > 0
+
+    orden = request.GET.get('orden', 'distancia' if punto else 'relevancia' if por_relevancia else 'nombre')
     direccion = request.GET.get('dir', 'asc')
     
     opciones_orden = {
@@ -66,42 +86,68 @@ def lista_destinos(request):
     criterio = opciones_orden.get(orden, 'nombre')
     reverso = (direccion == 'desc')
 
-    usar_rb_tree = request.GET.get('usar_rb', 'true') == 'true'
+    destinos = destinos.select_related('categoria').only(*CAMPOS_LISTADO)
+
+    if orden == 'relevancia' and por_relevancia:
+        # El queryset ya viene ordenado por el índice (más relevante primero)
+        try:
+            desde = int(request.GET.get('desde', 0))
+        except ValueError:
+            desde = 0
+        pagina, siguiente, anterior = paginar_desplazamiento(destinos, desde)
+        url_siguiente = _url_pagina(request, desde=siguiente) if siguiente is not None else None
+        url_anterior = _url_pagina(request, desde=anterior) if anterior is not None else None
+        usar_rb_tree = False
+    elif orden == 'distancia' and punto:
+        # La distancia se calcula por consulta: desplazamiento sobre los candidatos de la caja
+        try:
+            desde = int(request.GET.get('desde', 0))
+        except ValueError:
+            desde = 0
+        pagina, siguiente, anterior = paginar_desplazamiento(destinos.order_by('distancia_km', 'id'), desde)
+        url_siguiente = _url_pagina(request, desde=siguiente) if siguiente is not None else None
+        url_anterior = _url_pagina(request, desde=anterior) if anterior is not None else None
+        usar_rb_tree = False
+    else:
+        pagina, siguiente, anterior = paginar_keyset(
+            destinos, criterio, reverso,
+            despues=request.GET.get('despues'), antes=request.GET.get('antes'),
+        )
+        url_siguiente = _url_pagina(request, despues=siguiente) if siguiente else None
+        url_anterior = _url_pagina(request, antes=anterior) if anterior else None
+        usar_rb_tree = request.GET.get('usar_rb', 'true') == 'true'
 
     info_arbol = {'usado': False}
 
-    if usar_rb_tree and destinos.exists():
-        print(f"\n🌳 Usando Árbol Rojo-Negro para ordenar")
-        print(f"   Criterio: {criterio}")
-        print(f"   Dirección: {'Descendente' if reverso else 'Ascendente'}")
-        
-        destinos_ordenados, arbol = ordenar_destinos_rb(destinos, criterio, reverso)
-        destinos = destinos_ordenados
+    # Árbol Rojo-Negro sobre la página (la base de datos ya la recortó en orden)
+    if usar_rb_tree and pagina:
+        # Insertar en orden ascendente para que los empates conserven el orden por id
+        entrada = list(reversed(pagina)) if reverso else pagina
+        pagina, arbol = ordenar_destinos_rb(entrada, criterio, reverso)
         
         info_arbol = {
             'usado': True,
             'nodos': arbol.cantidad_nodos,
-            'altura': arbol.altura(),
             'altura_maxima': 2 * (arbol.cantidad_nodos + 1).bit_length(),
             'criterio': criterio,
-            'visualizacion': arbol.visualizar(),
         }
+        # Recorren el árbol entero: solo con TRAZAS_DIAGNOSTICO
+        if diagnostico_activo():
+            info_arbol['altura'] = arbol.altura()
+            info_arbol['visualizacion'] = arbol.visualizar()
 
-    print(destinos)
-    if isinstance(destinos, list):
-        print(f"Total de destinos después de filtros: {len(destinos)}")
-        if destinos:
-            print(f"Primer destino: {destinos[0].nombre}")
-    else:
-        print(f"Total de destinos después de filtros: {destinos.count()}")
-        if destinos.exists():
-            print(f"Primer destino: {destinos.first().nombre}")
-
-
-    hay_precios_mayores_a_cero = any(destino.costo_entrada > 0 for destino in destinos) #Esto es lo que puso jeremy que dijismo both changes
+    # El modal de cada tarjeta usa la primera actividad y los itinerarios activos
+    itinerarios_activos = []
+    if request.user.is_authenticated:
+        prefetch_related_objects(pagina, Prefetch(
+            'actividades',
+            queryset=Actividad.objects.only('id', 'destino_id', 'nombre', 'costo', 'duracion_minutos').order_by('id'),
+            to_attr='actividades_lista',
+        ))
+        itinerarios_activos = list(request.user.itinerarios.filter(estado__in=['borrador', 'confirmado']))
     
     context = {
-        'destinos': destinos,
+        'destinos': pagina,
         'categorias': categorias,
         'categoria_actual': categoria_id,
         'preferencias_usuario': preferencias_usuario,
@@ -109,31 +155,68 @@ def lista_destinos(request):
         'orden_actual': orden,
         'direccion_actual': direccion,
         'info_arbol': info_arbol,
-        'mostrar_opcion_precio': hay_precios_mayores_a_cero
+        'mostrar_opcion_precio': hay_precios_mayores_a_cero,
+        'url_siguiente': url_siguiente,
+        'url_anterior': url_anterior,
+        'itinerarios_activos': itinerarios_activos,
+        'filtro_geografico': bool(punto),
+        'radio_actual': radio,
+        'version_catalogo': version_catalogo(),
     }
     return render(request, 'lugares/lista_destinos.html', context)
 
 
+def _filtro_geografico(request):
+    """
+    Punto de referencia, radio y caja de la petición:
+    - lat, lng y radio (km, por defecto RADIO_DEFECTO_KM): círculo
+    - caja=sur,oeste,norte,este: rectángulo, con distancias al centro
+
+    Returns:
+        (punto o None, radio o None, caja o None)
+    """
+    punto = leer_punto(request.GET.get('lat'), request.GET.get('lng'))
+    if punto:
+        try:
+            radio = float(request.GET.get('radio') or RADIO_DEFECTO_KM)
+        except ValueError:
+            radio = RADIO_DEFECTO_KM
+        # float() acepta 'nan' e 'inf', que no sirven de radio
+        if not math.isfinite(radio):
+            radio = RADIO_DEFECTO_KM
+        radio = min(max(radio, 0.1), RADIO_MAXIMO_KM)
+        return punto, radio, None
+    
+    caja = leer_caja(request.GET.get('caja'))
+    if caja:
+        return centro_caja(*caja), None, caja
+    return None, None, None
+
+
+def _url_pagina(request, **cursor):
+    """Query string actual con el cursor de otra página (sin los cursores previos)"""
+    parametros = request.GET.copy()
+    for clave in ('despues', 'antes', 'desde'):
+        parametros.pop(clave, None)
+    for clave, valor in cursor.items():
+        if valor:
+            parametros[clave] = valor
+    return f'?{parametros.urlencode()}'
+
+
+@cache_anonimo('vista:detalle_destino')
 def detalle_destino(request, destino_id):
     """Detalle de un destino con actividades y formulario para agregar"""
     destino = get_object_or_404(Destino, id=destino_id, activo=True)
     actividades = destino.actividades.filter(disponible=True)
     imagenes = destino.imagenes.all()
 
-    # Calcular información adicional
-    costo_total_actividades = sum(act.costo for act in actividades)
-    tiempo_total_actividades = sum(act.duracion_minutos for act in actividades)
-    
-    print(f"1) {costo_total_actividades}")
-    print(f"2) {tiempo_total_actividades}")
+    # Totales de las actividades disponibles, precalculados en el destino
+    costo_total_actividades = destino.costo_total_actividades
+    tiempo_total_actividades = destino.duracion_total_actividades
     
-    recomendaciones = obtener_recomendaciones(destino, 5)
-
-    print(f"Mostrando detalle de: {destino.nombre}")
-    print(f"Actividades disponibles: {actividades.count()}")
-    print(f"Imágenes en galería: {imagenes.count()}")
-    print(f"Recomendaciones generadas: {len(recomendaciones)}")
-    print(recomendaciones)
+    # Las recomendaciones y la galería se calculan solo si su fragmento no está en caché
+    recomendaciones = SimpleLazyObject(lambda: obtener_recomendaciones(destino, 5))
 
     # NUEVO: Crear formulario para agregar a itinerario
     form_agregar = None
@@ -148,5 +231,24 @@ def detalle_destino(request, destino_id):
         'tiempo_total_actividades': tiempo_total_actividades,
         'recomendaciones': recomendaciones,
         'form_agregar': form_agregar,  # NUEVO
+        'version_catalogo': version_catalogo(),
     }
-    return render(request, 'lugares/detalle_destino.html', context)
\ No newline at end of file
+    return render(request, 'lugares/detalle_destino.html', context)
+
+
+def autocompletar(request):
+    """
+    API JSON de sugerencias mientras se escribe (destinos y categorías),
+    servida desde el índice en memoria sin consultar la base de datos
+    """
+    texto = request.GET.get('q', '')
+    try:
+        limite = int(request.GET.get('limite', 8))
+    except ValueError:
+        limite = 8
+    
+    sugerencias = obtener_indice().buscar(texto, max(1, min(limite, MAX_SUGERENCIAS)))
+    
+    response = JsonResponse({'q': texto, 'sugerencias': sugerencias})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
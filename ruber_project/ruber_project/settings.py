@@ -32,6 +32,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Consultas SQL por petición (cabeceras en DEBUG, log y /admin/instrumentacion-sql/)
+    'core.instrumentacion.InstrumentacionSQLMiddleware',
+    # Comprime las respuestas (JSON de rutas y marcadores, páginas) si el cliente acepta gzip
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,6 +64,48 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ruber_project.wsgi.application'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Tramos por calles ya calculados (rutas/red_vial.py): sobreviven a reinicios
+    'geometria': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'geometria',
+        'TIMEOUT': None,
+    },
+}
+
+# Red vial offline para el trazado por calles (lista de aristas, ver rutas/red_vial.py)
+RED_VIAL_ARCHIVO = BASE_DIR / 'datos' / 'red_vial.csv'
+
+# Instrumentación SQL por petición (ver core/instrumentacion.py)
+INSTRUMENTACION_SQL_REGISTROS = 200
+INSTRUMENTACION_SQL_UMBRAL_CONSULTAS = 50
+
+# Tramos con nombre (core/trazas.py): histogramas de duración por proceso.
+# TRAZAS_DIAGNOSTICO activa las comprobaciones caras (p. ej. validar el
+# árbol Rojo-Negro en cada listado); solo para depurar
+TRAZAS_ACTIVAS = True
+TRAZAS_DIAGNOSTICO = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        # WARNING: peticiones que superan los umbrales; DEBUG: una línea por petición
+        # y por tramo. Se puede afinar por área: 'ruber.sql', 'ruber.trazas',
+        # 'ruber.diagnostico', 'ruber.recomendaciones', 'ruber.itinerarios', 'ruber.rutas'
+        'ruber': {'handlers': ['consola'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
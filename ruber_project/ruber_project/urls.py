@@ -2,8 +2,10 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.admin import instrumentacion_sql
 
 urlpatterns = [
+    path('admin/instrumentacion-sql/', admin.site.admin_view(instrumentacion_sql), name='instrumentacion_sql'),
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
     path('usuarios/', include('usuarios.urls')),
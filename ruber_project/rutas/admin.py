@@ -15,6 +15,10 @@ class RutaAdmin(admin.ModelAdmin):
         ('Detalles de la Ruta', {
             'fields': ('distancia_km', 'tiempo_minutos', 'medio_transporte', 'costo_transporte')
         }),
+        ('Tráfico por hora', {
+            'fields': ('perfil_velocidad',),
+            'description': 'Vacío = perfil por defecto del medio de transporte',
+        }),
         ('Estado', {
             'fields': ('activo',)
         }),
@@ -0,0 +1,173 @@
+"""
+Ciudad sintética para medir el ruteo.
+
+Los destinos se reparten como en una ciudad real: la mayoría agrupados
+en barrios (distribución normal alrededor de centros al azar, unos más
+densos que otros) y el resto dispersos. Cada destino se conecta con sus
+vecinos más cercanos (buscados en una grilla de celdas); el medio de
+transporte depende de la distancia y el tiempo base sale de la velocidad
+típica del medio con un recargo por desvíos.
+
+Se puede usar en memoria (rutas sin guardar, para GrafoTiempoDependiente)
+o guardar en la base de datos con bulk_create. repartir_puntos sirve
+también para cargas masivas de destinos (poblar_datos --escala).
+"""
+from collections import defaultdict
+from decimal import Decimal
+import heapq
+import itertools
+import math
+import random
+
+from lugares.catalogo import incrementar_version_catalogo
+from lugares.models import Destino
+from rutas.algorithms_networkx import haversine
+from rutas.models import Ruta
+
+# km/h en ciudad
+VELOCIDADES = {'caminando': 4.5, 'bicicleta': 12, 'bus': 16, 'taxi': 22, 'auto': 22}
+COSTO_POR_KM = {'caminando': 0, 'bicicleta': 0, 'bus': Decimal('0.30'), 'taxi': Decimal('2.50'), 'auto': Decimal('1.20')}
+RECARGO_DESVIO = 1.3
+
+
+def repartir_puntos(rng, cantidad, centro=(-12.07, -77.04), radio_km=15, barrios=None, dispersos=0.15):
+    """
+    Genera (lat, lng) de a uno: la fracción dispersos uniforme en el
+    círculo de la ciudad y el resto en barrios de densidad desigual
+    (con barrios=0, todos uniformes)
+    """
+    escala_lng = 111.0 * math.cos(math.radians(centro[0]))
+
+    def al_azar():
+        angulo, distancia = rng.uniform(0, 2 * math.pi), radio_km * math.sqrt(rng.random())
+        return distancia * math.sin(angulo), distancia * math.cos(angulo)
+
+    centros = []
+    for _ in range(max(3, round(cantidad ** (1 / 3))) if barrios is None else barrios):
+        # Posición, peso (densidad) y dispersión de cada barrio
+        centros.append((*al_azar(), rng.paretovariate(1.5), rng.uniform(0.3, 1.5)))
+    acumulados = list(itertools.accumulate(peso for _, _, peso, _ in centros))
+
+    for _ in range(cantidad):
+        if not centros or rng.random() < dispersos:
+            norte, este = al_azar()
+        else:
+            norte, este, _, dispersion = rng.choices(centros, cum_weights=acumulados)[0]
+            norte, este = rng.gauss(norte, dispersion), rng.gauss(este, dispersion)
+        yield centro[0] + norte / 111.0, centro[1] + este / escala_lng
+
+
+class CiudadSintetica:
+
+    def __init__(self, cantidad, semilla=42, vecinos=4, centro=(-12.07, -77.04), radio_km=15, barrios=None):
+        """
+        Args:
+            cantidad: número de destinos
+            semilla: misma semilla, misma ciudad
+            vecinos: conexiones de cada destino con los más cercanos
+            centro, radio_km: área de la ciudad
+            barrios: número de barrios (por defecto ~raíz cúbica de la cantidad)
+        """
+        self.rng = random.Random(semilla)
+        self.centro = centro
+        self.radio_km = radio_km
+        self.puntos = list(repartir_puntos(self.rng, cantidad, centro, radio_km, barrios))
+        self.conexiones = self._conectar(vecinos)
+
+    def __len__(self):
+        return len(self.puntos)
+
+    def _conectar(self, vecinos):
+        """(i, j, distancia_km, tiempo_minutos, medio) con los vecinos más cercanos de cada punto"""
+        celda = 0.1 / 111.0  # ~100 m: pocos candidatos incluso en los barrios densos
+        escala_lng = math.cos(math.radians(self.centro[0])) ** 2
+        grilla = defaultdict(list)
+        for indice, (lat, lng) in enumerate(self.puntos):
+            grilla[(int(lat // celda), int(lng // celda))].append(indice)
+
+        conexiones = {}
+        for indice, (lat, lng) in enumerate(self.puntos):
+            fila, columna = int(lat // celda), int(lng // celda)
+
+            # Distancia plana (basta a escala de ciudad); haversine solo a los elegidos
+            def distancia2(otro):
+                return (self.puntos[otro][0] - lat) ** 2 + (self.puntos[otro][1] - lng) ** 2 * escala_lng
+
+            def candidatos_en(alcance):
+                return [
+                    otro
+                    for f in range(fila - alcance, fila + alcance + 1)
+                    for c in range(columna - alcance, columna + alcance + 1)
+                    for otro in grilla.get((f, c), ())
+                    if otro != indice
+                ]
+
+            # Anillos de celdas hasta juntar candidatos suficientes
+            candidatos, alcance = [], 1
+            while len(candidatos) < vecinos and alcance <= 1024:
+                candidatos = candidatos_en(alcance)
+                alcance *= 2
+            alcance //= 2
+            cercanos = heapq.nsmallest(vecinos, candidatos, key=distancia2)
+
+            # El cuadrado solo garantiza los puntos a menos de `alcance` celdas
+            # (más angostas en longitud): un punto fuera de él puede estar más
+            # cerca que uno de sus esquinas
+            if len(cercanos) == vecinos and alcance <= 1024:
+                cubierto = alcance * celda * math.sqrt(escala_lng)
+                lejano = math.sqrt(distancia2(cercanos[-1]))
+                if lejano >= cubierto:
+                    alcance = math.ceil(lejano / (celda * math.sqrt(escala_lng))) + 1
+                    cercanos = heapq.nsmallest(vecinos, candidatos_en(alcance), key=distancia2)
+
+            for otro in cercanos:
+                par = (min(indice, otro), max(indice, otro))
+                if par not in conexiones:
+                    conexiones[par] = self._conexion(par, haversine(lat, lng, *self.puntos[otro]))
+        return list(conexiones.values())
+
+    def _conexion(self, par, distancia):
+        if distancia < 1:
+            medio = 'caminando'
+        elif distancia < 3:
+            medio = self.rng.choice(['bicicleta', 'taxi', 'bus'])
+        else:
+            medio = self.rng.choice(['auto', 'taxi', 'bus'])
+        tiempo = max(1, math.ceil(distancia * RECARGO_DESVIO / VELOCIDADES[medio] * 60))
+        return par[0], par[1], distancia, tiempo, medio
+
+    def _ruta(self, i, j, distancia, tiempo, medio, ids):
+        return Ruta(
+            origen_id=ids[i], destino_id=ids[j], medio_transporte=medio,
+            distancia_km=Decimal(str(round(distancia, 2))), tiempo_minutos=tiempo,
+            costo_transporte=(COSTO_POR_KM[medio] * Decimal(str(round(distancia, 2)))).quantize(Decimal('0.01')),
+        )
+
+    def rutas_en_memoria(self, ids=None):
+        """Rutas sin guardar; los destinos se numeran 1..N salvo que se den sus ids"""
+        ids = ids or list(range(1, len(self.puntos) + 1))
+        return [self._ruta(*conexion, ids) for conexion in self.conexiones]
+
+    def guardar(self, lote=1000):
+        """
+        Crea los destinos y rutas con bulk_create (sin señales: se
+        incrementa la versión del catálogo al final)
+
+        Returns:
+            ids de los destinos creados
+        """
+        destinos = Destino.objects.bulk_create(
+            [
+                Destino(
+                    nombre=f'Sintético {indice}', descripcion='Destino de la ciudad sintética',
+                    latitud=Decimal(f'{lat:.6f}'), longitud=Decimal(f'{lng:.6f}'),
+                    tiempo_visita_estimado=60,
+                )
+                for indice, (lat, lng) in enumerate(self.puntos)
+            ],
+            batch_size=lote,
+        )
+        ids = [destino.id for destino in destinos]
+        Ruta.objects.bulk_create(self.rutas_en_memoria(ids), batch_size=lote)
+        incrementar_version_catalogo()
+        return ids
@@ -0,0 +1,140 @@
+"""
+Formatos compactos de la ruta calculada y su geometría local.
+
+La respuesta clásica repite id, nombre, lat y lng por cada parada. Con
+?formato=polyline la geometría viaja como polyline codificada (algoritmo
+de Google, precisión 5: ~1 m) y las paradas solo con id y nombre; con
+?formato=geojson es un FeatureCollection con la línea y las paradas.
+
+Cada tramo entre paradas consecutivas toma distancia, tiempo y medio de
+transporte de la tabla Ruta cuando existe la conexión (la de menor
+distancia entre sus medios); si no, la distancia en línea recta. La
+línea sigue las calles de la red vial offline (red_vial.py) cuando hay
+una; si no, une las paradas en línea recta.
+"""
+from django.db.models import Q
+
+from rutas.algorithms_networkx import haversine
+from rutas.models import Ruta
+from rutas.red_vial import trazar_tramo
+
+PRECISION_POLYLINE = 5
+FORMATOS = ('polyline', 'geojson')
+
+
+def codificar_polyline(coordenadas, precision=PRECISION_POLYLINE):
+    """Polyline codificada de una lista de (lat, lng)"""
+    factor = 10 ** precision
+    resultado = []
+    anterior_lat = anterior_lng = 0
+
+    for lat, lng in coordenadas:
+        lat, lng = round(lat * factor), round(lng * factor)
+        for delta in (lat - anterior_lat, lng - anterior_lng):
+            # Signo en el bit menos significativo y grupos de 5 bits
+            valor = ~(delta << 1) if delta < 0 else delta << 1
+            while valor >= 0x20:
+                resultado.append(chr((0x20 | (valor & 0x1f)) + 63))
+                valor >>= 5
+            resultado.append(chr(valor + 63))
+        anterior_lat, anterior_lng = lat, lng
+
+    return ''.join(resultado)
+
+
+def tramos_ruta(camino):
+    """
+    Tramos entre paradas consecutivas del camino (dicts con id, lat, lng),
+    con los datos de Ruta si la conexión está registrada (una consulta)
+    """
+    pares = [
+        (desde['id'], hasta['id']) for desde, hasta in zip(camino, camino[1:])
+        if desde['id'] != 'user' and hasta['id'] != 'user'
+    ]
+
+    conexiones = {}
+    if pares:
+        filtro = Q()
+        for origen, destino in pares:
+            filtro |= Q(origen_id=origen, destino_id=destino) | Q(origen_id=destino, destino_id=origen)
+        for ruta in Ruta.objects.filter(filtro, activo=True).order_by('distancia_km'):
+            # Las conexiones sirven en ambos sentidos; la primera es la más corta
+            conexiones.setdefault(frozenset((ruta.origen_id, ruta.destino_id)), ruta)
+
+    tramos = []
+    for desde, hasta in zip(camino, camino[1:]):
+        ruta = conexiones.get(frozenset((desde['id'], hasta['id'])))
+        if ruta:
+            tramos.append({
+                'distancia_km': float(ruta.distancia_km),
+                'tiempo_minutos': ruta.tiempo_minutos,
+                'medio_transporte': ruta.medio_transporte,
+            })
+        else:
+            tramos.append({
+                'distancia_km': round(haversine(desde['lat'], desde['lng'], hasta['lat'], hasta['lng']), 3),
+                'tiempo_minutos': None,
+                'medio_transporte': None,
+            })
+    return tramos
+
+
+def geometria_ruta(camino):
+    """
+    Coordenadas (lat, lng) de la línea de la ruta y si sigue las calles
+    (todos los tramos trazados sobre la red vial)
+
+    Returns:
+        (coordenadas, por_calles)
+    """
+    if len(camino) < 2:
+        return [(parada['lat'], parada['lng']) for parada in camino], False
+
+    coordenadas = [(camino[0]['lat'], camino[0]['lng'])]
+    por_calles = True
+    for desde, hasta in zip(camino, camino[1:]):
+        tramo = trazar_tramo(desde['lat'], desde['lng'], hasta['lat'], hasta['lng'])
+        if tramo is None:
+            por_calles = False
+            tramo = [(desde['lat'], desde['lng']), (hasta['lat'], hasta['lng'])]
+        coordenadas.extend(tramo[1:])
+    return coordenadas, por_calles
+
+
+def como_polyline(distancia, camino):
+    coordenadas, por_calles = geometria_ruta(camino)
+    return {
+        'success': True,
+        'distancia_km': round(distancia, 2),
+        'paradas': [[parada['id'], parada['nombre']] for parada in camino],
+        'polyline': codificar_polyline(coordenadas),
+        'precision': PRECISION_POLYLINE,
+        'por_calles': por_calles,
+        'tramos': tramos_ruta(camino),
+    }
+
+
+def como_geojson(distancia, camino):
+    """FeatureCollection: la línea de la ruta y un punto por parada ([lng, lat] según GeoJSON)"""
+    coordenadas, por_calles = geometria_ruta(camino)
+    linea = {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'LineString',
+            'coordinates': [[round(lng, 6), round(lat, 6)] for lat, lng in coordenadas],
+        },
+        'properties': {
+            'distancia_km': round(distancia, 2),
+            'por_calles': por_calles,
+            'tramos': tramos_ruta(camino),
+        },
+    }
+    paradas = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(parada['lng'], 6), round(parada['lat'], 6)]},
+            'properties': {'id': parada['id'], 'nombre': parada['nombre']},
+        }
+        for parada in camino
+    ]
+    return {'type': 'FeatureCollection', 'features': [linea] + paradas}
@@ -0,0 +1,154 @@
+import json
+import random
+import statistics
+import time as reloj
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from lugares.catalogo import incrementar_version_catalogo
+from rutas.ciudad_sintetica import CiudadSintetica
+from rutas.tiempo_dependiente import GrafoTiempoDependiente, construir_grafo, obtener_grafo
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el ruteo por hora de salida sobre ciudades sintéticas de varios tamaños: '
+        'construcción del grafo, consulta punto a punto, uno a muchos y grafo en caché'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='1000,10000,50000',
+                            help='Cantidades de destinos separadas por coma')
+        parser.add_argument('--consultas', type=int, default=200, help='Consultas punto a punto por tamaño')
+        parser.add_argument('--uno-a-muchos', type=int, default=20, help='Consultas uno a muchos por tamaño')
+        parser.add_argument('--construcciones', type=int, default=3, help='Veces que se construye el grafo')
+        parser.add_argument('--vecinos', type=int, default=4, help='Conexiones por destino')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--en-bd', action='store_true',
+                            help='Guardar la ciudad en la base de datos (se descarta al terminar) '
+                                 'y cargar el grafo con su consulta real')
+        parser.add_argument('--salida', help='Archivo JSON con el reporte (para seguir la tendencia)')
+
+    def handle(self, *args, **options):
+        try:
+            tamanos = [int(tamano) for tamano in options['tamanos'].split(',') if tamano.strip()]
+        except ValueError:
+            raise CommandError('--tamanos debe ser una lista de números separados por coma')
+
+        modo = 'base de datos' if options['en_bd'] else 'memoria'
+        self.stdout.write(f'🧪 Benchmark de rutas ({modo}), semilla {options["semilla"]}\n')
+
+        resultados = []
+        for tamano in tamanos:
+            resultados.append(self._medir_tamano(tamano, options))
+
+        reporte = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'modo': 'bd' if options['en_bd'] else 'memoria',
+            'semilla': options['semilla'],
+            'vecinos': options['vecinos'],
+            'resultados': resultados,
+        }
+
+        self.stdout.write(f'\n  {"destinos":>9} {"rutas":>8} {"construir":>11} '
+                          f'{"consulta p50/p95/p99":>24} {"uno a muchos p50/p95/p99":>28} {"caché p50":>10}')
+        for fila in resultados:
+            cache = f'{fila["acierto_cache_ms"]["p50"]:.4f}' if fila['acierto_cache_ms'] else '-'
+            self.stdout.write(
+                f'  {fila["destinos"]:>9} {fila["rutas"]:>8} {fila["construccion_ms"]["p50"]:>8.1f} ms '
+                f'{self._formatear(fila["consulta_ms"], 2):>24} '
+                f'{self._formatear(fila["uno_a_muchos_ms"], 1):>28} {cache:>10}'
+            )
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f'\n📄 Reporte guardado en {options["salida"]}')
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark completado'))
+
+    def _medir_tamano(self, tamano, options):
+        rng = random.Random(options['semilla'])
+
+        inicio = reloj.perf_counter()
+        ciudad = CiudadSintetica(tamano, semilla=options['semilla'], vecinos=options['vecinos'])
+        generacion = (reloj.perf_counter() - inicio) * 1000
+        self.stdout.write(f'🏙️ {tamano} destinos, {len(ciudad.conexiones)} rutas generadas en {generacion:.0f} ms')
+
+        if options['en_bd']:
+            with transaction.atomic():
+                ids = ciudad.guardar()
+                fila = self._medir_grafo(construir_grafo, ids, rng, options)
+
+                # Grafo del proceso ya construido para esta versión del catálogo
+                obtener_grafo()
+                fila['acierto_cache_ms'] = self._percentiles(self._cronometrar(obtener_grafo, 1000))
+
+                # La ciudad sintética no se guarda
+                transaction.set_rollback(True)
+            # El grafo del proceso tenía la ciudad descartada
+            incrementar_version_catalogo()
+        else:
+            ids = list(range(1, tamano + 1))
+            rutas = ciudad.rutas_en_memoria(ids)
+            fila = self._medir_grafo(lambda: GrafoTiempoDependiente(rutas), ids, rng, options)
+            fila['acierto_cache_ms'] = None
+
+        fila.update({'destinos': tamano, 'rutas': len(ciudad.conexiones), 'generacion_ms': round(generacion, 2)})
+        return fila
+
+    def _medir_grafo(self, construir, ids, rng, options):
+        construcciones = []
+        for _ in range(max(1, options['construcciones'])):
+            inicio = reloj.perf_counter()
+            grafo = construir()
+            construcciones.append((reloj.perf_counter() - inicio) * 1000)
+
+        # Salidas a cualquier hora del día: las horas punta cambian los tiempos de las aristas
+        pares = [(rng.choice(ids), rng.choice(ids), rng.uniform(0, 1440)) for _ in range(options['consultas'])]
+        consultas = self._cronometrar_lista(lambda par: grafo.mas_rapida(*par), pares)
+
+        origenes = [(rng.choice(ids), rng.uniform(0, 1440)) for _ in range(options['uno_a_muchos'])]
+        uno_a_muchos = self._cronometrar_lista(lambda origen: grafo.tiempos_desde(*origen), origenes)
+
+        return {
+            'construccion_ms': self._percentiles(construcciones),
+            'consulta_ms': self._percentiles(consultas),
+            'uno_a_muchos_ms': self._percentiles(uno_a_muchos),
+        }
+
+    def _cronometrar(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = reloj.perf_counter()
+            funcion()
+            tiempos.append((reloj.perf_counter() - inicio) * 1000)
+        return tiempos
+
+    def _cronometrar_lista(self, funcion, argumentos):
+        tiempos = []
+        for argumento in argumentos:
+            inicio = reloj.perf_counter()
+            funcion(argumento)
+            tiempos.append((reloj.perf_counter() - inicio) * 1000)
+        return tiempos
+
+    def _formatear(self, percentiles, decimales):
+        """p50/p95/p99 para la tabla; '-' si la sección no tuvo muestras"""
+        if not percentiles:
+            return '-'
+        return '/'.join(f'{percentiles[clave]:.{decimales}f}' for clave in ('p50', 'p95', 'p99')) + ' ms'
+
+    def _percentiles(self, tiempos):
+        """p50/p95/p99, media y muestras en ms; None si no hubo muestras (p. ej. --consultas 0)"""
+        if not tiempos:
+            return None
+        if len(tiempos) > 1:
+            cortes = statistics.quantiles(tiempos, n=100, method='inclusive')
+            p50, p95, p99 = cortes[49], cortes[94], cortes[98]
+        else:
+            p50 = p95 = p99 = tiempos[0]
+        return {
+            'p50': round(p50, 4), 'p95': round(p95, 4), 'p99': round(p99, 4),
+            'media': round(statistics.fmean(tiempos), 4), 'muestras': len(tiempos),
+        }
@@ -0,0 +1,58 @@
+import os
+import xml.etree.ElementTree as ET
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rutas.red_vial import RedVial, leer_aristas
+
+# Vías de OpenStreetMap por las que se traza (se omiten caminos peatonales internos, rieles, etc.)
+TIPOS_VIA = {
+    'motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'unclassified', 'residential',
+    'motorway_link', 'trunk_link', 'primary_link', 'secondary_link', 'tertiary_link',
+    'living_street', 'service', 'pedestrian',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Convierte un extracto de OpenStreetMap (.osm XML) en la lista de aristas '
+        'que usa el trazado por calles (settings.RED_VIAL_ARCHIVO)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('extracto', help='Archivo .osm exportado de OpenStreetMap')
+        parser.add_argument('--salida', help='Archivo de aristas (por defecto RED_VIAL_ARCHIVO)')
+
+    def handle(self, *args, **options):
+        salida = options['salida'] or settings.RED_VIAL_ARCHIVO
+        if not os.path.exists(options['extracto']):
+            raise CommandError(f'No existe {options["extracto"]}')
+
+        self.stdout.write(f'🗺️ Leyendo {options["extracto"]}...')
+        nodos = {}
+        aristas = 0
+        os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            archivo.write('# lat_desde,lng_desde,lat_hasta,lng_hasta\n')
+
+            # En el XML de OSM los nodos vienen antes que las vías
+            for _, elemento in ET.iterparse(options['extracto'], events=('end',)):
+                if elemento.tag == 'node':
+                    nodos[elemento.get('id')] = (elemento.get('lat'), elemento.get('lon'))
+                elif elemento.tag == 'way':
+                    etiquetas = {tag.get('k'): tag.get('v') for tag in elemento.iter('tag')}
+                    if etiquetas.get('highway') in TIPOS_VIA:
+                        puntos = [nodos[nd.get('ref')] for nd in elemento.iter('nd') if nd.get('ref') in nodos]
+                        for (lat1, lng1), (lat2, lng2) in zip(puntos, puntos[1:]):
+                            archivo.write(f'{lat1},{lng1},{lat2},{lng2}\n')
+                            aristas += 1
+                else:
+                    continue
+                elemento.clear()
+
+        if not aristas:
+            raise CommandError('El extracto no tiene vías transitables')
+
+        red = RedVial(leer_aristas(salida))
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {aristas} aristas escritas en {salida}'))
+        self.stdout.write(f'   {len(red)} intersecciones, {red.num_aristas} calles en el grafo')
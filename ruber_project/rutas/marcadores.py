@@ -0,0 +1,181 @@
+"""
+Marcadores del mapa por área visible, agrupados en zoom bajo.
+
+Los destinos activos se proyectan en la grilla de teselas del mapa
+(Web Mercator, como Leaflet) con CELDAS_POR_TESELA celdas por lado. Para
+cada zoom menor que ZOOM_DETALLE se precalculan las celdas ocupadas con
+la cantidad de destinos, su centro promedio y su caja; cada nivel se
+arma sumando las cuatro celdas hijas del siguiente (un quadtree), así
+que construir todos los niveles cuesta lo mismo que recorrer los puntos
+una vez. Una consulta solo visita las celdas dentro del área visible.
+
+Desde ZOOM_DETALLE se devuelven los destinos individuales con una
+consulta por caja sobre el índice geográfico de Destino.
+
+El índice se reconstruye cuando cambia la versión del catálogo.
+"""
+import math
+import threading
+
+from lugares.catalogo import version_catalogo
+from lugares.models import Destino
+
+ZOOM_DETALLE = 15
+CELDAS_POR_TESELA = 4
+MAX_MARCADORES = 500
+
+LATITUD_MAXIMA = 85.05112878
+
+
+def proyectar(lat, lng, zoom):
+    """Coordenadas (x, y) de celda del punto en el zoom dado"""
+    celdas = CELDAS_POR_TESELA * 2 ** zoom
+    lat = max(-LATITUD_MAXIMA, min(LATITUD_MAXIMA, lat))
+    x = (lng + 180) / 360 * celdas
+    y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * celdas
+    return min(int(x), celdas - 1), min(int(y), celdas - 1)
+
+
+class IndiceMarcadores:
+
+    def __init__(self, puntos):
+        """
+        Args:
+            puntos: lista de (id, nombre, lat, lng) de los destinos activos
+        """
+        self.puntos = puntos
+        self.niveles = [None] * ZOOM_DETALLE
+
+        # Nivel más fino desde los puntos; cada grupo es
+        # [cantidad, suma lat, suma lng, sur, oeste, norte, este, punto de ejemplo]
+        celdas = {}
+        for punto in puntos:
+            _, _, lat, lng = punto
+            clave = proyectar(lat, lng, ZOOM_DETALLE - 1)
+            grupo = celdas.get(clave)
+            if grupo is None:
+                celdas[clave] = [1, lat, lng, lat, lng, lat, lng, punto]
+            else:
+                self._sumar(grupo, [1, lat, lng, lat, lng, lat, lng, punto])
+        self.niveles[ZOOM_DETALLE - 1] = celdas
+
+        # Cada nivel superior suma las cuatro celdas hijas
+        for zoom in range(ZOOM_DETALLE - 2, -1, -1):
+            padres = {}
+            for (x, y), grupo in self.niveles[zoom + 1].items():
+                clave = (x // 2, y // 2)
+                if clave in padres:
+                    self._sumar(padres[clave], grupo)
+                else:
+                    padres[clave] = list(grupo)
+            self.niveles[zoom] = padres
+
+    @staticmethod
+    def _sumar(grupo, otro):
+        grupo[0] += otro[0]
+        grupo[1] += otro[1]
+        grupo[2] += otro[2]
+        grupo[3] = min(grupo[3], otro[3])
+        grupo[4] = min(grupo[4], otro[4])
+        grupo[5] = max(grupo[5], otro[5])
+        grupo[6] = max(grupo[6], otro[6])
+
+    def __len__(self):
+        return len(self.puntos)
+
+    def grupos(self, sur, oeste, norte, este, zoom):
+        """
+        Marcadores de las celdas del área visible en un zoom menor que
+        ZOOM_DETALLE: un grupo por celda, o el destino si está solo
+        """
+        zoom = max(0, min(zoom, ZOOM_DETALLE - 1))
+        celdas = self.niveles[zoom]
+
+        x_min, y_min = proyectar(norte, oeste, zoom)
+        x_max, y_max = proyectar(sur, este, zoom)
+        if oeste <= este:
+            columnas = [range(x_min, x_max + 1)]
+        else:
+            # Cruza el antimeridiano
+            columnas = [range(x_min, CELDAS_POR_TESELA * 2 ** zoom), range(0, x_max + 1)]
+
+        # Con muchas celdas visibles y pocas ocupadas conviene recorrer las ocupadas
+        visibles = sum(len(rango) for rango in columnas) * (y_max - y_min + 1)
+        if visibles > len(celdas):
+            claves = [
+                (x, y) for x, y in celdas
+                if y_min <= y <= y_max and any(x in rango for rango in columnas)
+            ]
+        else:
+            claves = [
+                (x, y) for rango in columnas for x in rango
+                for y in range(y_min, y_max + 1) if (x, y) in celdas
+            ]
+
+        marcadores = []
+        for clave in claves:
+            cantidad, suma_lat, suma_lng, g_sur, g_oeste, g_norte, g_este, ejemplo = celdas[clave]
+            if cantidad == 1:
+                marcadores.append(marcador_destino(*ejemplo))
+            else:
+                marcadores.append({
+                    'tipo': 'grupo',
+                    'lat': round(suma_lat / cantidad, 6),
+                    'lng': round(suma_lng / cantidad, 6),
+                    'cantidad': cantidad,
+                    'caja': [g_sur, g_oeste, g_norte, g_este],
+                })
+        return marcadores
+
+
+def marcador_destino(id_destino, nombre, lat, lng):
+    return {'tipo': 'destino', 'id': id_destino, 'nombre': nombre, 'lat': lat, 'lng': lng}
+
+
+def destinos_en_caja(sur, oeste, norte, este, limite=MAX_MARCADORES):
+    """Destinos individuales del área visible (consulta por el índice geográfico)"""
+    filas = (
+        Destino.objects.filter(activo=True)
+        .en_caja(sur, oeste, norte, este)
+        .order_by()
+        .values_list('id', 'nombre', 'latitud', 'longitud')[:limite]
+    )
+    return [marcador_destino(i, nombre, float(lat), float(lng)) for i, nombre, lat, lng in filas]
+
+
+def construir_indice():
+    """Destinos activos (una consulta)"""
+    puntos = [
+        (i, nombre, float(lat), float(lng))
+        for i, nombre, lat, lng in Destino.objects.filter(activo=True).order_by().values_list(
+            'id', 'nombre', 'latitud', 'longitud'
+        )
+    ]
+    return IndiceMarcadores(puntos)
+
+
+_indice = None
+_version_indice = None
+_lock = threading.Lock()
+
+
+def obtener_indice():
+    """Índice del proceso; se reconstruye si cambió la versión del catálogo"""
+    global _indice, _version_indice
+
+    version = version_catalogo()
+    if _indice is not None and _version_indice == version:
+        return _indice
+
+    with _lock:
+        if _indice is None or _version_indice != version:
+            _indice = construir_indice()
+            _version_indice = version
+        return _indice
+
+
+def marcadores(sur, oeste, norte, este, zoom):
+    """Grupos por celda en zoom bajo; destinos individuales desde ZOOM_DETALLE"""
+    if zoom >= ZOOM_DETALLE:
+        return destinos_en_caja(sur, oeste, norte, este)
+    return obtener_indice().grupos(sur, oeste, norte, este, zoom)
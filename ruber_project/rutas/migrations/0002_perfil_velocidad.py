@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-19 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ruta',
+            name='perfil_velocidad',
+            field=models.JSONField(blank=True, help_text='Ej: [[0, 1.0], [8, 0.5], [10, 0.9], [24, 1.0]]', null=True),
+        ),
+    ]
@@ -1,5 +1,10 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from lugares.models import Destino
+import logging
+
+logger = logging.getLogger('ruber.rutas')
+
 
 class Ruta(models.Model):
     """
@@ -22,8 +27,23 @@ class Ruta(models.Model):
     medio_transporte = models.CharField(max_length=20, choices=MEDIO_TRANSPORTE_CHOICES)
     costo_transporte = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     
+    # Velocidad relativa a tiempo_minutos según la hora, como puntos [hora, factor]
+    # de una función lineal por tramos (1.0 = sin tráfico, 0.5 = tarda el doble);
+    # vacío = perfil de su medio de transporte (PERFILES_VELOCIDAD)
+    perfil_velocidad = models.JSONField(null=True, blank=True,
+                                        help_text="Ej: [[0, 1.0], [8, 0.5], [10, 0.9], [24, 1.0]]")
+    
     activo = models.BooleanField(default=True)
     
+    # Horas punta de Lima: mañana (7:30) y tarde (17:30)
+    PERFILES_VELOCIDAD = {
+        'auto': ((0, 1.0), (6, 1.0), (7.5, 0.55), (9.5, 0.8), (13, 0.75), (17.5, 0.5), (20, 0.8), (22, 1.0), (24, 1.0)),
+        'taxi': ((0, 1.0), (6, 1.0), (7.5, 0.55), (9.5, 0.8), (13, 0.75), (17.5, 0.5), (20, 0.8), (22, 1.0), (24, 1.0)),
+        'bus': ((0, 0.9), (5, 1.0), (7.5, 0.5), (9.5, 0.75), (13, 0.7), (17.5, 0.45), (20, 0.75), (23, 0.85), (24, 0.9)),
+        'bicicleta': ((0, 1.0), (24, 1.0)),
+        'caminando': ((0, 1.0), (24, 1.0)),
+    }
+    
     class Meta:
         verbose_name = "Ruta"
         verbose_name_plural = "Rutas"
@@ -31,4 +51,52 @@ class Ruta(models.Model):
     
     def __str__(self):
         return f"{self.origen.nombre} → {self.destino.nombre} ({self.medio_transporte})"
+    
+    def clean(self):
+        if self.perfil_velocidad:
+            self.perfil_velocidad = self.validar_perfil(self.perfil_velocidad)
+    
+    def save(self, *args, **kwargs):
+        # También fuera del admin (shell, scripts): un perfil inválido no se guarda
+        if self.perfil_velocidad:
+            self.perfil_velocidad = self.validar_perfil(self.perfil_velocidad)
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def validar_perfil(perfil):
+        """
+        Puntos [hora, factor] ordenados de 0 a 24 con factores positivos
+
+        Returns:
+            tupla de (hora, factor) en float
+        """
+        try:
+            puntos = tuple((float(hora), float(factor)) for hora, factor in perfil)
+        except (TypeError, ValueError):
+            raise ValidationError({'perfil_velocidad': 'Debe ser una lista de pares [hora, factor].'})
+        
+        horas = [hora for hora, _ in puntos]
+        if len(puntos) < 2 or horas[0] != 0 or horas[-1] != 24 or horas != sorted(horas):
+            raise ValidationError({'perfil_velocidad': 'Las horas deben ir en orden de 0 a 24.'})
+        if any(factor <= 0 for _, factor in puntos):
+            raise ValidationError({'perfil_velocidad': 'Los factores de velocidad deben ser positivos.'})
+        return puntos
+    
+    def perfil(self):
+        """
+        Perfil propio de la ruta o el de su medio de transporte
+
+        Un perfil guardado sin pasar por save() (bulk_create, update,
+        migraciones) puede ser inválido: se registra y se usa el del medio
+        de transporte, para no tumbar la construcción del grafo
+        """
+        if self.perfil_velocidad:
+            try:
+                return self.validar_perfil(self.perfil_velocidad)
+            except ValidationError as error:
+                logger.warning(
+                    'ruta=%s perfil_velocidad inválido (%s); se usa el de %s',
+                    self.pk, '; '.join(error.messages), self.medio_transporte,
+                )
+        return self.PERFILES_VELOCIDAD.get(self.medio_transporte, ((0, 1.0), (24, 1.0)))
 
@@ -0,0 +1,220 @@
+"""
+Trazado por calles desde una red vial offline.
+
+Reemplaza la llamada del navegador al servidor público de OSRM. La red
+se lee de settings.RED_VIAL_ARCHIVO: una lista de aristas (por ejemplo
+un extracto de OpenStreetMap convertido con el comando preparar_red_vial),
+una calle por línea:
+
+    lat_desde,lng_desde,lat_hasta,lng_hasta
+
+Las intersecciones se unifican por coordenada (6 decimales) y el grafo
+se guarda compacto en arreglos: coordenadas de los nodos y adyacencia en
+formato CSR (desplazamientos, vecinos y distancias en km). Cada extremo
+del tramo se ajusta a la intersección más cercana con una grilla de
+celdas y el camino se busca con A* (heurística: haversine al destino).
+
+Los tramos ya calculados se guardan en la caché 'geometria' (en
+archivos, sobrevive a reinicios); la clave incluye la huella del archivo
+de la red, así una red nueva no usa tramos viejos.
+Si no hay red o los puntos quedan lejos de ella, trazar_tramo devuelve
+None y la ruta usa la línea recta.
+"""
+from array import array
+from collections import defaultdict
+import hashlib
+import heapq
+import math
+import os
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rutas.algorithms_networkx import haversine
+
+# Lado de la celda de la grilla de búsqueda de la intersección más cercana (grados, ~1 km)
+TAMANO_CELDA = 0.01
+# Más lejos que esto de toda calle, el punto no se ajusta a la red
+DISTANCIA_MAXIMA_AJUSTE_KM = 1.0
+PRECISION_CLAVE = 5
+
+
+class RedVial:
+
+    def __init__(self, aristas, huella=None):
+        """
+        Args:
+            aristas: iterable de (lat_desde, lng_desde, lat_hasta, lng_hasta)
+            huella: versión del archivo del que se leyó (clave de la caché)
+        """
+        self.huella = huella
+        indices = {}
+        self.lats = array('d')
+        self.lngs = array('d')
+        adyacencia = defaultdict(dict)
+
+        def nodo(lat, lng):
+            clave = (round(lat, 6), round(lng, 6))
+            indice = indices.get(clave)
+            if indice is None:
+                indice = indices[clave] = len(self.lats)
+                self.lats.append(clave[0])
+                self.lngs.append(clave[1])
+            return indice
+
+        for lat1, lng1, lat2, lng2 in aristas:
+            a, b = nodo(lat1, lng1), nodo(lat2, lng2)
+            if a == b:
+                continue
+            distancia = haversine(self.lats[a], self.lngs[a], self.lats[b], self.lngs[b])
+            # Calles en ambos sentidos; si se repite una arista queda la más corta
+            adyacencia[a][b] = min(distancia, adyacencia[a].get(b, distancia))
+            adyacencia[b][a] = adyacencia[a][b]
+
+        self.desplazamientos = array('l', [0])
+        self.vecinos = array('l')
+        self.distancias = array('d')
+        for indice in range(len(self.lats)):
+            for vecino, distancia in adyacencia.get(indice, {}).items():
+                self.vecinos.append(vecino)
+                self.distancias.append(distancia)
+            self.desplazamientos.append(len(self.vecinos))
+
+        self.celdas = defaultdict(list)
+        for indice in range(len(self.lats)):
+            self.celdas[self._celda(self.lats[indice], self.lngs[indice])].append(indice)
+
+    def __len__(self):
+        return len(self.lats)
+
+    @property
+    def num_aristas(self):
+        return len(self.vecinos) // 2
+
+    @staticmethod
+    def _celda(lat, lng):
+        return int(math.floor(lat / TAMANO_CELDA)), int(math.floor(lng / TAMANO_CELDA))
+
+    def mas_cercano(self, lat, lng, maximo_km=DISTANCIA_MAXIMA_AJUSTE_KM):
+        """Intersección más cercana al punto, o None si está a más de maximo_km"""
+        fila, columna = self._celda(lat, lng)
+        # Celdas suficientes para cubrir maximo_km alrededor (más anchas en longitud lejos del ecuador)
+        alcance_lat = int(math.ceil(maximo_km / 111.0 / TAMANO_CELDA))
+        alcance_lng = int(math.ceil(maximo_km / (111.0 * max(math.cos(math.radians(lat)), 0.01)) / TAMANO_CELDA))
+
+        mejor, mejor_distancia = None, maximo_km
+        for f in range(fila - alcance_lat, fila + alcance_lat + 1):
+            for c in range(columna - alcance_lng, columna + alcance_lng + 1):
+                for indice in self.celdas.get((f, c), ()):
+                    distancia = haversine(lat, lng, self.lats[indice], self.lngs[indice])
+                    if distancia <= mejor_distancia:
+                        mejor, mejor_distancia = indice, distancia
+        return mejor
+
+    def camino(self, origen, destino):
+        """Nodos del camino más corto (A*), o None si no están conectados"""
+        lat_destino, lng_destino = self.lats[destino], self.lngs[destino]
+        distancias = {origen: 0.0}
+        previos = {origen: None}
+        abiertos = [(haversine(self.lats[origen], self.lngs[origen], lat_destino, lng_destino), 0.0, origen)]
+
+        while abiertos:
+            _, distancia, actual = heapq.heappop(abiertos)
+            if actual == destino:
+                nodos = []
+                while actual is not None:
+                    nodos.append(actual)
+                    actual = previos[actual]
+                return nodos[::-1]
+            if distancia > distancias[actual]:
+                continue
+
+            for posicion in range(self.desplazamientos[actual], self.desplazamientos[actual + 1]):
+                vecino = self.vecinos[posicion]
+                nueva = distancia + self.distancias[posicion]
+                if nueva < distancias.get(vecino, math.inf):
+                    distancias[vecino] = nueva
+                    previos[vecino] = actual
+                    estimado = nueva + haversine(self.lats[vecino], self.lngs[vecino], lat_destino, lng_destino)
+                    heapq.heappush(abiertos, (estimado, nueva, vecino))
+        return None
+
+    def trazar(self, lat1, lng1, lat2, lng2):
+        """Coordenadas (lat, lng) por calles entre dos puntos, o None"""
+        origen = self.mas_cercano(lat1, lng1)
+        destino = self.mas_cercano(lat2, lng2)
+        if origen is None or destino is None:
+            return None
+
+        nodos = self.camino(origen, destino)
+        if nodos is None:
+            return None
+        return [(lat1, lng1)] + [(self.lats[n], self.lngs[n]) for n in nodos] + [(lat2, lng2)]
+
+
+def leer_aristas(ruta_archivo):
+    """Aristas del archivo (se ignoran líneas vacías, comentarios # y filas mal formadas)"""
+    with open(ruta_archivo, encoding='utf-8') as archivo:
+        for linea in archivo:
+            linea = linea.strip()
+            if not linea or linea.startswith('#'):
+                continue
+            try:
+                lat1, lng1, lat2, lng2 = (float(valor) for valor in linea.split(',')[:4])
+            except ValueError:
+                continue
+            yield lat1, lng1, lat2, lng2
+
+
+def huella_archivo(ruta_archivo):
+    """Identifica la versión del archivo de la red (ruta, tamaño y fecha), o None si no existe"""
+    try:
+        estado = os.stat(ruta_archivo)
+    except OSError:
+        return None
+    return hashlib.md5(f'{ruta_archivo}|{estado.st_size}|{estado.st_mtime_ns}'.encode('utf-8')).hexdigest()[:12]
+
+
+_red = None
+_lock = threading.Lock()
+
+
+def obtener_red():
+    """Red del proceso; se vuelve a leer si el archivo cambió. None si no hay archivo"""
+    global _red
+
+    ruta_archivo = getattr(settings, 'RED_VIAL_ARCHIVO', None)
+    huella = huella_archivo(ruta_archivo) if ruta_archivo else None
+    if huella is None:
+        return None
+    if _red is not None and _red.huella == huella:
+        return _red
+
+    with _lock:
+        if _red is None or _red.huella != huella:
+            _red = RedVial(leer_aristas(ruta_archivo), huella)
+        return _red
+
+
+def trazar_tramo(lat1, lng1, lat2, lng2):
+    """
+    Coordenadas por calles del tramo (caché en archivos primero), o None
+    si no hay red vial o el tramo no se puede trazar sobre ella
+    """
+    red = obtener_red()
+    if red is None:
+        return None
+
+    puntos = ','.join(f'{valor:.{PRECISION_CLAVE}f}' for valor in (lat1, lng1, lat2, lng2))
+    clave = f'tramo:{red.huella}:{puntos}'
+    cache = caches['geometria']
+
+    guardado = cache.get(clave)
+    if guardado is not None:
+        # [] = ya se intentó y no hay camino por calles
+        return [tuple(punto) for punto in guardado] or None
+
+    coordenadas = red.trazar(lat1, lng1, lat2, lng2)
+    cache.set(clave, coordenadas or [])
+    return coordenadas
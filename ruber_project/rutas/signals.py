@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from lugares.catalogo import incrementar_version_catalogo
+from .models import Ruta
+
+
+@receiver([post_save, post_delete], sender=Ruta)
+def cambio_ruta(sender, instance, **kwargs):
+    """Los tramos de las rutas calculadas usan estas conexiones (ETag de la ruta)"""
+    incrementar_version_catalogo()
@@ -1,3 +1,474 @@
-from django.test import TestCase
+from datetime import time
+from decimal import Decimal
+from io import StringIO
+import heapq
+import json
+import math
+import os
+import random
+import tempfile
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from lugares.models import Categoria, Destino
+from .algorithms_networkx import haversine
+from .ciudad_sintetica import CiudadSintetica
+from .geometria import codificar_polyline, geometria_ruta, tramos_ruta
+from .marcadores import ZOOM_DETALLE, IndiceMarcadores, marcadores, obtener_indice, proyectar
+from .models import Ruta
+from .red_vial import RedVial, leer_aristas, trazar_tramo
+from .tiempo_dependiente import (
+    CASILLAS, MINUTOS_DIA, RESOLUCION_MINUTOS, GrafoTiempoDependiente, tabla_tiempos, tiempo_en_tabla,
+)
 
-# Create your tests here.
+
+class MarcadoresTests(SimpleTestCase):
+
+    # Dos barrios de Lima a ~10 km y un punto en Cusco
+    PUNTOS = [
+        (1, 'Larco', -12.0722, -77.0707),
+        (2, 'Huaca Pucllana', -12.1107, -77.0335),
+        (3, 'Parque del Amor', -12.1268, -77.0370),
+        (4, 'Sacsayhuamán', -13.5087, -71.9817),
+    ]
+
+    def setUp(self):
+        self.indice = IndiceMarcadores(self.PUNTOS)
+
+    def test_cada_nivel_conserva_todos_los_destinos(self):
+        self.assertEqual(len(self.indice), 4)
+        for zoom in range(ZOOM_DETALLE):
+            self.assertEqual(sum(grupo[0] for grupo in self.indice.niveles[zoom].values()), 4)
+            # Las celdas de un nivel son las de su hijo divididas entre dos
+            if zoom + 1 < ZOOM_DETALLE:
+                self.assertEqual(
+                    set(self.indice.niveles[zoom]),
+                    {(x // 2, y // 2) for x, y in self.indice.niveles[zoom + 1]},
+                )
+
+    def test_agrupa_segun_el_zoom(self):
+        peru = (-20, -82, 0, -68)
+
+        lejos = self.indice.grupos(*peru, 3)
+        self.assertEqual(len(lejos), 1)
+        grupo, = lejos
+        self.assertEqual(grupo['tipo'], 'grupo')
+        self.assertEqual(grupo['cantidad'], 4)
+        self.assertEqual(grupo['caja'], [-13.5087, -77.0707, -12.0722, -71.9817])
+        self.assertAlmostEqual(grupo['lat'], sum(p[2] for p in self.PUNTOS) / 4, places=5)
+
+        # Lima y Cusco se separan; el destino solo se devuelve como destino
+        medio = sorted(self.indice.grupos(*peru, 8), key=lambda m: m['lng'])
+        self.assertEqual([m['tipo'] for m in medio], ['grupo', 'destino'])
+        self.assertEqual(medio[0]['cantidad'], 3)
+        self.assertEqual(medio[1]['id'], 4)
+
+        cerca = self.indice.grupos(*peru, ZOOM_DETALLE - 1)
+        self.assertEqual(sorted(m['id'] for m in cerca), [1, 2, 3, 4])
+        self.assertTrue(all(m['tipo'] == 'destino' for m in cerca))
+
+    def test_solo_devuelve_el_area_visible(self):
+        cusco = (-14, -72.5, -13, -71.5)
+        self.assertEqual([m['id'] for m in self.indice.grupos(*cusco, 10)], [4])
+        self.assertEqual(self.indice.grupos(40, 0, 50, 10, 10), [])
+
+        # Caja que cruza el antimeridiano
+        fiyi = IndiceMarcadores([(9, 'Suva', -18.14, 178.44), (10, 'Apia', -13.83, -171.76)])
+        self.assertEqual(sorted(m['id'] for m in fiyi.grupos(-25, 170, -10, -165, 6)), [9, 10])
+        self.assertEqual([m['id'] for m in fiyi.grupos(-25, 170, -10, 179, 6)], [9])
+
+    def test_proyeccion_acotada(self):
+        self.assertEqual(proyectar(0, -180, 0), (0, 2))
+        x, y = proyectar(90, 180, 2)
+        self.assertEqual((x, y), (15, 0))
+        self.assertEqual(proyectar(-90, 180, 2), (15, 15))
+
+
+class IndiceMarcadoresCatalogoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Miradores')
+        cls.destinos = [
+            Destino.objects.create(
+                nombre=f'Mirador {i}', descripcion='Vista', categoria=categoria,
+                latitud=Decimal('-12.12') + Decimal(i) / 1000, longitud=Decimal('-77.03'),
+                tiempo_visita_estimado=30,
+            )
+            for i in range(3)
+        ]
+
+    def test_desde_zoom_detalle_usa_la_base_de_datos(self):
+        caja = (-12.2, -77.1, -12.0, -77.0)
+        with self.assertNumQueries(1):
+            individuales = marcadores(*caja, ZOOM_DETALLE)
+        self.assertEqual(sorted(m['id'] for m in individuales), [d.id for d in self.destinos])
+
+        grupo, = marcadores(*caja, 10)
+        self.assertEqual(grupo['cantidad'], 3)
+
+    def test_el_indice_se_reconstruye_al_editar_el_catalogo(self):
+        indice = obtener_indice()
+        self.assertIs(obtener_indice(), indice)
+
+        destino = self.destinos[0]
+        destino.activo = False
+        destino.save()
+        self.assertIsNot(obtener_indice(), indice)
+        self.assertEqual(len(obtener_indice()), 2)
+
+
+def decodificar_polyline(texto, precision=5):
+    """Inverso de codificar_polyline (solo para las pruebas)"""
+    puntos, valores, valor, desplazamiento = [], [], 0, 0
+    for caracter in texto:
+        grupo = ord(caracter) - 63
+        valor |= (grupo & 0x1f) << desplazamiento
+        desplazamiento += 5
+        if grupo < 0x20:
+            valores.append(~(valor >> 1) if valor & 1 else valor >> 1)
+            valor = desplazamiento = 0
+    lat = lng = 0
+    for delta_lat, delta_lng in zip(valores[::2], valores[1::2]):
+        lat, lng = lat + delta_lat, lng + delta_lng
+        puntos.append((lat / 10 ** precision, lng / 10 ** precision))
+    return puntos
+
+
+class PolylineTests(SimpleTestCase):
+
+    def test_vector_de_referencia_de_google(self):
+        puntos = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.assertEqual(codificar_polyline(puntos), '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+
+    def test_ida_y_vuelta(self):
+        puntos = [(-12.046374, -77.042793), (-12.046374, -77.042793), (0.0, 0.0), (-0.00001, 179.99999)]
+        decodificados = decodificar_polyline(codificar_polyline(puntos))
+        self.assertEqual(len(decodificados), len(puntos))
+        for (lat, lng), (lat_d, lng_d) in zip(puntos, decodificados):
+            self.assertAlmostEqual(lat, lat_d, places=5)
+            self.assertAlmostEqual(lng, lng_d, places=5)
+        self.assertEqual(codificar_polyline([]), '')
+
+
+@override_settings(RED_VIAL_ARCHIVO='/no/existe/red_vial.csv')
+class FormatosRutaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Plazas')
+        cls.plaza, cls.parque, cls.museo = (
+            Destino.objects.create(
+                nombre=nombre, descripcion='Lugar', categoria=categoria,
+                latitud=Decimal(lat), longitud=Decimal('-77.03'), tiempo_visita_estimado=30,
+            )
+            for nombre, lat in (('Plaza', '-12.05'), ('Parque', '-12.06'), ('Museo', '-12.08'))
+        )
+        Ruta.objects.create(origen=cls.plaza, destino=cls.parque, distancia_km=Decimal('1.3'),
+                            tiempo_minutos=6, medio_transporte='auto')
+        Ruta.objects.create(origen=cls.plaza, destino=cls.parque, distancia_km=Decimal('1.2'),
+                            tiempo_minutos=15, medio_transporte='caminando')
+
+    def parada(self, destino):
+        return {'id': destino.id, 'nombre': destino.nombre,
+                'lat': float(destino.latitud), 'lng': float(destino.longitud)}
+
+    def test_tramos_toman_la_conexion_mas_corta_o_la_linea_recta(self):
+        # La conexión registrada sirve en el sentido contrario
+        camino = [self.parada(self.parque), self.parada(self.plaza), self.parada(self.museo)]
+        with self.assertNumQueries(1):
+            primero, segundo = tramos_ruta(camino)
+        self.assertEqual(primero, {'distancia_km': 1.2, 'tiempo_minutos': 15, 'medio_transporte': 'caminando'})
+        self.assertIsNone(segundo['medio_transporte'])
+        self.assertAlmostEqual(segundo['distancia_km'], 3.336, places=2)
+
+        coordenadas, por_calles = geometria_ruta(camino)
+        self.assertFalse(por_calles)
+        self.assertEqual(coordenadas, [(p['lat'], p['lng']) for p in camino])
+
+    def test_respuestas_compactas_con_etag(self):
+        url = reverse('rutas:mapa_rutas')
+        parametros = {'lat': '-12.049', 'lng': '-77.03', 'destino': self.parque.id}
+
+        respuesta = self.client.get(url, {**parametros, 'formato': 'polyline'})
+        datos = respuesta.json()
+        self.assertTrue(datos['success'])
+        self.assertEqual(datos['paradas'][-1], [self.parque.id, 'Parque'])
+        self.assertEqual(len(decodificar_polyline(datos['polyline'])), len(datos['paradas']))
+
+        # Misma ruta y catálogo sin cambios: 304 sin cuerpo
+        etag = respuesta['ETag']
+        self.assertEqual(self.client.get(url, {**parametros, 'formato': 'polyline'},
+                                         HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        geojson = self.client.get(url, {**parametros, 'formato': 'geojson'})
+        self.assertEqual(geojson['Content-Type'], 'application/geo+json')
+        self.assertNotEqual(geojson['ETag'], etag)
+        linea = geojson.json()['features'][0]
+        self.assertEqual(linea['geometry']['coordinates'][-1], [-77.03, -12.06])
+
+        self.assertEqual(self.client.get(url, {**parametros, 'formato': 'kml'}).status_code, 400)
+
+        # Editar una ruta cambia el ETag
+        Ruta.objects.filter(medio_transporte='auto').get().save()
+        self.assertEqual(self.client.get(url, {**parametros, 'formato': 'polyline'},
+                                         HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+def grilla_calles(filas, columnas, paso=0.002, quitar=0.25, semilla=7):
+    """Aristas de una cuadrícula de calles con algunas cuadras cortadas y esquinas movidas"""
+    azar = random.Random(semilla)
+    esquinas = {
+        (f, c): (-12.1 + f * paso + azar.uniform(-paso, paso) / 4, -77.05 + c * paso + azar.uniform(-paso, paso) / 4)
+        for f in range(filas) for c in range(columnas)
+    }
+    aristas = []
+    for (f, c), (lat, lng) in esquinas.items():
+        for vecina in ((f + 1, c), (f, c + 1)):
+            if vecina in esquinas and azar.random() >= quitar:
+                aristas.append((lat, lng) + esquinas[vecina])
+    return aristas
+
+
+def dijkstra_aristas(red, aristas, origen, destino):
+    """Distancia mínima sin heurística sobre la lista de aristas (referencia)"""
+    adyacencia = {}
+    for lat1, lng1, lat2, lng2 in aristas:
+        a = red.mas_cercano(lat1, lng1, maximo_km=0.001)
+        b = red.mas_cercano(lat2, lng2, maximo_km=0.001)
+        distancia = haversine(red.lats[a], red.lngs[a], red.lats[b], red.lngs[b])
+        adyacencia.setdefault(a, []).append((b, distancia))
+        adyacencia.setdefault(b, []).append((a, distancia))
+    distancias = {origen: 0.0}
+    pendientes = [(0.0, origen)]
+    while pendientes:
+        distancia, actual = heapq.heappop(pendientes)
+        if actual == destino:
+            return distancia
+        if distancia > distancias[actual]:
+            continue
+        for vecino, peso in adyacencia.get(actual, ()):
+            if distancia + peso < distancias.get(vecino, math.inf):
+                distancias[vecino] = distancia + peso
+                heapq.heappush(pendientes, (distancia + peso, vecino))
+    return None
+
+
+class RedVialTests(SimpleTestCase):
+
+    def longitud(self, red, nodos):
+        return sum(haversine(red.lats[a], red.lngs[a], red.lats[b], red.lngs[b]) for a, b in zip(nodos, nodos[1:]))
+
+    def test_csr_unifica_intersecciones_y_aristas(self):
+        red = RedVial([
+            (-12.0, -77.0, -12.0, -77.01),
+            (-12.0000001, -77.0, -12.01, -77.0),      # misma esquina a 6 decimales
+            (-12.0, -77.01, -12.0, -77.0),            # repetida en el otro sentido
+            (-12.01, -77.0, -12.01, -77.0),           # lazo: se descarta
+        ])
+        self.assertEqual(len(red), 3)
+        self.assertEqual(red.num_aristas, 2)
+        self.assertEqual(list(red.desplazamientos), [0, 2, 3, 4])
+        self.assertEqual(sorted(red.vecinos[0:2]), [1, 2])
+        self.assertEqual(list(red.vecinos[2:]), [0, 0])
+        for posicion in range(len(red.vecinos)):
+            self.assertGreater(red.distancias[posicion], 1.0)
+
+    def test_a_estrella_coincide_con_dijkstra(self):
+        aristas = grilla_calles(12, 12)
+        red = RedVial(aristas)
+        azar = random.Random(3)
+        for _ in range(40):
+            origen, destino = azar.randrange(len(red)), azar.randrange(len(red))
+            esperada = dijkstra_aristas(red, aristas, origen, destino)
+            nodos = red.camino(origen, destino)
+            if esperada is None:
+                self.assertIsNone(nodos)
+                continue
+            self.assertEqual((nodos[0], nodos[-1]), (origen, destino))
+            for a, b in zip(nodos, nodos[1:]):
+                self.assertIn(b, red.vecinos[red.desplazamientos[a]:red.desplazamientos[a + 1]])
+            self.assertAlmostEqual(self.longitud(red, nodos), esperada, places=9)
+
+    def test_trazar_ajusta_a_la_esquina_mas_cercana(self):
+        red = RedVial([(-12.0, -77.0, -12.0, -77.01), (-12.0, -77.01, -12.01, -77.01)])
+        self.assertEqual(
+            red.trazar(-12.0001, -77.0001, -12.0101, -77.0101),
+            [(-12.0001, -77.0001), (-12.0, -77.0), (-12.0, -77.01), (-12.01, -77.01), (-12.0101, -77.0101)],
+        )
+        # Lejos de toda calle no se ajusta
+        self.assertIsNone(red.mas_cercano(-12.5, -77.0))
+        self.assertIsNone(red.trazar(-12.5, -77.0, -12.0, -77.0))
+
+    def test_leer_aristas_y_trazar_tramo_con_cache(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo = os.path.join(carpeta, 'red.csv')
+            with open(archivo, 'w', encoding='utf-8') as salida:
+                salida.write('# lat_desde,lng_desde,lat_hasta,lng_hasta\n\n'
+                             '-12.0,-77.0,-12.0,-77.01\n'
+                             'sin,numeros,en,la fila\n'
+                             '-12.0,-77.01,-12.01,-77.01,calle extra\n')
+            self.assertEqual(list(leer_aristas(archivo)),
+                             [(-12.0, -77.0, -12.0, -77.01), (-12.0, -77.01, -12.01, -77.01)])
+
+            cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-red'}
+            with override_settings(RED_VIAL_ARCHIVO=archivo, CACHES={'default': cache, 'geometria': cache}):
+                tramo = trazar_tramo(-12.0, -77.0, -12.01, -77.01)
+                self.assertEqual(len(tramo), 5)
+                self.assertEqual(trazar_tramo(-12.0, -77.0, -12.01, -77.01), tramo)
+                self.assertIsNone(trazar_tramo(-13.0, -77.0, -12.0, -77.0))
+
+        with override_settings(RED_VIAL_ARCHIVO=os.path.join(carpeta, 'red.csv')):
+            self.assertIsNone(trazar_tramo(-12.0, -77.0, -12.01, -77.01))
+
+
+class CiudadSinteticaTests(SimpleTestCase):
+
+    def test_misma_semilla_misma_ciudad(self):
+        ciudad = CiudadSintetica(300, semilla=5)
+        otra = CiudadSintetica(300, semilla=5)
+        self.assertEqual(ciudad.puntos, otra.puntos)
+        self.assertEqual(ciudad.conexiones, otra.conexiones)
+        self.assertNotEqual(CiudadSintetica(300, semilla=6).puntos, ciudad.puntos)
+
+    def test_cada_destino_se_conecta_con_sus_k_mas_cercanos(self):
+        ciudad = CiudadSintetica(400, semilla=11, vecinos=3)
+        conectados = {i: set() for i in range(len(ciudad))}
+        for i, j, distancia, tiempo, medio in ciudad.conexiones:
+            self.assertLess(i, j)
+            conectados[i].add(j)
+            conectados[j].add(i)
+            self.assertGreaterEqual(tiempo, 1)
+            self.assertEqual(medio == 'caminando', distancia < 1)
+
+        for indice, (lat, lng) in enumerate(ciudad.puntos):
+            # Referencia por fuerza bruta con la misma distancia plana que la grilla
+            escala = math.cos(math.radians(ciudad.centro[0])) ** 2
+            cercanos = sorted(
+                (otro for otro in range(len(ciudad)) if otro != indice),
+                key=lambda otro: (ciudad.puntos[otro][0] - lat) ** 2 + (ciudad.puntos[otro][1] - lng) ** 2 * escala,
+            )[:3]
+            self.assertGreaterEqual(len(conectados[indice]), 3)
+            self.assertLessEqual(set(cercanos), conectados[indice], indice)
+
+    def test_rutas_en_memoria_usan_los_ids_dados(self):
+        ciudad = CiudadSintetica(50, semilla=3)
+        rutas = ciudad.rutas_en_memoria()
+        self.assertEqual(len(rutas), len(ciudad.conexiones))
+        self.assertEqual(
+            [(ruta.origen_id, ruta.destino_id) for ruta in rutas],
+            [(i + 1, j + 1) for i, j, *_ in ciudad.conexiones],
+        )
+
+        ids = [1000 + 7 * i for i in range(len(ciudad))]
+        propias = ciudad.rutas_en_memoria(ids)
+        self.assertEqual(
+            [(ruta.origen_id, ruta.destino_id) for ruta in propias],
+            [(ids[i], ids[j]) for i, j, *_ in ciudad.conexiones],
+        )
+        for ruta, (_, _, distancia, tiempo, medio) in zip(propias, ciudad.conexiones):
+            self.assertEqual((ruta.tiempo_minutos, ruta.medio_transporte), (tiempo, medio))
+            self.assertEqual(ruta.distancia_km, Decimal(str(round(distancia, 2))))
+
+
+class BenchmarkRutasTests(TestCase):
+
+    def test_guardar_y_descartar_la_ciudad(self):
+        ciudad = CiudadSintetica(40, semilla=8)
+        ids = ciudad.guardar(lote=15)
+        self.assertEqual(Destino.objects.filter(id__in=ids).count(), 40)
+        self.assertEqual(
+            set(Ruta.objects.values_list('origen_id', 'destino_id')),
+            {(ids[i], ids[j]) for i, j, *_ in ciudad.conexiones},
+        )
+
+    def test_sin_consultas_reporta_secciones_vacias(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            salida = os.path.join(carpeta, 'reporte.json')
+            call_command('benchmark_rutas', tamanos='60', consultas=0, uno_a_muchos=0, construcciones=1,
+                         en_bd=True, salida=salida, stdout=StringIO())
+            with open(salida, encoding='utf-8') as archivo:
+                fila, = json.load(archivo)['resultados']
+
+        self.assertIsNone(fila['consulta_ms'])
+        self.assertIsNone(fila['uno_a_muchos_ms'])
+        self.assertEqual(fila['construccion_ms']['muestras'], 1)
+        self.assertIsNotNone(fila['acierto_cache_ms'])
+        # La ciudad se guardó dentro de una transacción descartada
+        self.assertFalse(Destino.objects.exists())
+
+
+class TiempoDependienteTests(SimpleTestCase):
+
+    def test_tabla_cumple_fifo(self):
+        # Una caída brusca de velocidad: salir un poco después no puede llegar antes
+        perfil = ((0, 1.0), (8, 1.0), (8.1, 0.2), (12, 0.2), (12.1, 1.0), (24, 1.0))
+        for base in (5, 45, 300):
+            tabla = tabla_tiempos(perfil, base)
+            self.assertEqual(len(tabla), CASILLAS)
+            llegadas = [k * RESOLUCION_MINUTOS + tabla[k] for k in range(CASILLAS)]
+            llegadas.append(MINUTOS_DIA + tabla[0])
+            for anterior, siguiente in zip(llegadas, llegadas[1:]):
+                self.assertLessEqual(anterior, siguiente + 1e-9)
+            # Ningún viaje es más rápido que sin tráfico
+            self.assertGreaterEqual(min(tabla), base - 1e-9)
+
+    def test_interpolacion_entre_casillas(self):
+        tabla = tabla_tiempos(((0, 1.0), (24, 0.5)), 60)
+        self.assertAlmostEqual(tiempo_en_tabla(tabla, 0), 60)
+        medio = tiempo_en_tabla(tabla, RESOLUCION_MINUTOS / 2)
+        self.assertTrue(tabla[0] <= medio <= tabla[1])
+
+    def test_mas_rapida_depende_de_la_hora(self):
+        hora_punta = ((0, 1.0), (17, 1.0), (17.5, 0.25), (19, 0.25), (19.5, 1.0), (24, 1.0))
+        grafo = GrafoTiempoDependiente([
+            Ruta(id=1, origen_id=1, destino_id=2, tiempo_minutos=20, medio_transporte='auto',
+                 perfil_velocidad=hora_punta),
+            Ruta(id=2, origen_id=1, destino_id=3, tiempo_minutos=15, medio_transporte='bicicleta'),
+            Ruta(id=3, origen_id=3, destino_id=2, tiempo_minutos=15, medio_transporte='bicicleta'),
+        ])
+
+        madrugada = grafo.mas_rapida(1, 2, time(3, 0))
+        self.assertEqual(madrugada['camino'], [1, 2])
+        self.assertAlmostEqual(madrugada['duracion_minutos'], 20)
+
+        punta = grafo.mas_rapida(1, 2, time(18, 0))
+        self.assertEqual(punta['camino'], [1, 3, 2])
+        self.assertAlmostEqual(punta['duracion_minutos'], 30)
+        self.assertEqual([tramo['medio_transporte'] for tramo in punta['tramos']], ['bicicleta', 'bicicleta'])
+
+        # Las conexiones sirven en ambos sentidos; los medios se pueden restringir
+        self.assertEqual(grafo.mas_rapida(2, 1, time(18, 0), medios={'auto'})['camino'], [2, 1])
+        self.assertIsNone(grafo.mas_rapida(1, 99, time(18, 0)))
+        self.assertEqual(grafo.tiempo_viaje(1, 1, time(18, 0)), 0.0)
+
+
+class PerfilVelocidadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Plazas')
+        cls.origen, cls.destino = (
+            Destino.objects.create(
+                nombre=nombre, descripcion='Plaza', categoria=categoria,
+                latitud=Decimal('-12.05'), longitud=Decimal('-77.03'), tiempo_visita_estimado=30,
+            )
+            for nombre in ('Plaza A', 'Plaza B')
+        )
+
+    def nueva_ruta(self, **campos):
+        return Ruta(origen=self.origen, destino=self.destino, distancia_km=Decimal('2'),
+                    tiempo_minutos=10, medio_transporte='auto', **campos)
+
+    def test_save_rechaza_un_perfil_invalido(self):
+        with self.assertRaises(ValidationError):
+            self.nueva_ruta(perfil_velocidad=[[0, 1.0], [12, 0], [24, 1.0]]).save()
+        self.assertFalse(Ruta.objects.exists())
+
+    def test_perfil_invalido_guardado_usa_el_del_medio(self):
+        # bulk_create no pasa por save()
+        ruta, = Ruta.objects.bulk_create([self.nueva_ruta(perfil_velocidad=[[5, 1.0]])])
+        with self.assertLogs('ruber.rutas', 'WARNING'):
+            perfil = Ruta.objects.get(pk=ruta.pk).perfil()
+        self.assertEqual(perfil, Ruta.PERFILES_VELOCIDAD['auto'])
@@ -0,0 +1,231 @@
+"""
+Rutas más rápidas según la hora de salida.
+
+Cada Ruta tarda tiempo_minutos sin tráfico; su perfil de velocidad (el
+propio o el de su medio de transporte, ver Ruta.PERFILES_VELOCIDAD) dice
+qué tan lento se avanza a cada hora. Al construir el grafo cada par
+(perfil, tiempo base) se convierte una sola vez en una tabla de tiempos
+de viaje cada RESOLUCION_MINUTOS minutos del día, compartida por todas
+las aristas iguales; una consulta interpola entre dos casillas, así que
+relajar una arista cuesta casi lo mismo que en el Dijkstra estático.
+
+Las tablas cumplen FIFO (salir más tarde nunca llega antes: se puede
+esperar), condición para que Dijkstra por hora de llegada sea exacto.
+Las conexiones sirven en ambos sentidos, como en geometria.py.
+
+El grafo se reconstruye cuando cambia la versión del catálogo.
+"""
+from array import array
+from datetime import datetime, time
+import heapq
+import math
+import threading
+
+from lugares.catalogo import version_catalogo
+from rutas.models import Ruta
+
+RESOLUCION_MINUTOS = 5
+MINUTOS_DIA = 24 * 60
+CASILLAS = MINUTOS_DIA // RESOLUCION_MINUTOS
+
+
+def a_minutos(salida):
+    """Minutos desde la medianoche de un time, datetime o número"""
+    if isinstance(salida, datetime):
+        salida = salida.time()
+    if isinstance(salida, time):
+        return salida.hour * 60 + salida.minute + salida.second / 60
+    return float(salida)
+
+
+def factor_velocidad(perfil, hora):
+    """Interpolación lineal del perfil [(hora, factor), ...] en la hora dada (0-24)"""
+    for (h1, f1), (h2, f2) in zip(perfil, perfil[1:]):
+        if h1 <= hora <= h2:
+            return f1 if h2 == h1 else f1 + (f2 - f1) * (hora - h1) / (h2 - h1)
+    return perfil[-1][1]
+
+
+def tabla_tiempos(perfil, base):
+    """
+    Minutos de viaje al salir al inicio de cada casilla del día, con
+    FIFO: si esperar a la casilla siguiente llega antes, se espera
+    """
+    tiempos = [base / factor_velocidad(perfil, k * RESOLUCION_MINUTOS / 60) for k in range(CASILLAS)]
+
+    # De atrás hacia adelante, dos vueltas porque el día es circular
+    for _ in range(2):
+        siguiente = MINUTOS_DIA + tiempos[0]
+        for k in range(CASILLAS - 1, -1, -1):
+            llegada = min(k * RESOLUCION_MINUTOS + tiempos[k], siguiente)
+            tiempos[k] = llegada - k * RESOLUCION_MINUTOS
+            siguiente = llegada
+    return array('d', tiempos)
+
+
+def tiempo_en_tabla(tabla, minuto):
+    """Minutos de viaje al salir en el minuto dado (interpolado entre casillas)"""
+    minuto %= MINUTOS_DIA
+    casilla = int(minuto // RESOLUCION_MINUTOS)
+    fraccion = (minuto - casilla * RESOLUCION_MINUTOS) / RESOLUCION_MINUTOS
+    actual = tabla[casilla]
+    return actual + (tabla[(casilla + 1) % CASILLAS] - actual) * fraccion
+
+
+class GrafoTiempoDependiente:
+
+    def __init__(self, rutas):
+        """
+        Args:
+            rutas: iterable de Ruta activas
+        """
+        self.ids = []
+        self.indices = {}
+        self.tablas = []
+        tablas_por_clave = {}
+        adyacencia = []
+
+        def nodo(destino_id):
+            indice = self.indices.get(destino_id)
+            if indice is None:
+                indice = self.indices[destino_id] = len(self.ids)
+                self.ids.append(destino_id)
+                adyacencia.append([])
+            return indice
+
+        for ruta in rutas:
+            clave = (ruta.perfil(), ruta.tiempo_minutos)
+            tabla = tablas_por_clave.get(clave)
+            if tabla is None:
+                tabla = tablas_por_clave[clave] = len(self.tablas)
+                self.tablas.append(tabla_tiempos(*clave))
+
+            a, b = nodo(ruta.origen_id), nodo(ruta.destino_id)
+            adyacencia[a].append((b, tabla, ruta.medio_transporte))
+            adyacencia[b].append((a, tabla, ruta.medio_transporte))
+
+        # Adyacencia compacta (CSR)
+        self.desplazamientos = array('l', [0])
+        self.vecinos = array('l')
+        self.tabla_arista = array('l')
+        self.medios = []
+        for aristas in adyacencia:
+            for vecino, tabla, medio in aristas:
+                self.vecinos.append(vecino)
+                self.tabla_arista.append(tabla)
+                self.medios.append(medio)
+            self.desplazamientos.append(len(self.vecinos))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _dijkstra(self, origen, salida, destino=None, medios=None):
+        """Llegada más temprana a cada nodo saliendo del origen en el minuto salida"""
+        llegadas = {origen: salida}
+        previos = {origen: None}
+        abiertos = [(salida, origen)]
+
+        while abiertos:
+            llegada, actual = heapq.heappop(abiertos)
+            if actual == destino:
+                break
+            if llegada > llegadas[actual]:
+                continue
+
+            for posicion in range(self.desplazamientos[actual], self.desplazamientos[actual + 1]):
+                if medios and self.medios[posicion] not in medios:
+                    continue
+                vecino = self.vecinos[posicion]
+                nueva = llegada + tiempo_en_tabla(self.tablas[self.tabla_arista[posicion]], llegada)
+                if nueva < llegadas.get(vecino, math.inf):
+                    llegadas[vecino] = nueva
+                    previos[vecino] = (actual, posicion, llegada)
+                    heapq.heappush(abiertos, (nueva, vecino))
+        return llegadas, previos
+
+    def mas_rapida(self, origen_id, destino_id, salida, medios=None):
+        """
+        Ruta más rápida saliendo a la hora dada
+
+        Args:
+            origen_id, destino_id: ids de Destino
+            salida: time, datetime o minutos desde la medianoche
+            medios: medios de transporte permitidos (None = todos)
+
+        Returns:
+            dict con duracion_minutos, llegada (minutos, puede pasar de 1440),
+            camino (ids) y tramos; o None si no hay conexión
+        """
+        origen, destino = self.indices.get(origen_id), self.indices.get(destino_id)
+        if origen is None or destino is None:
+            return None
+
+        minuto = a_minutos(salida)
+        llegadas, previos = self._dijkstra(origen, minuto, destino, medios)
+        if destino not in llegadas:
+            return None
+
+        tramos = []
+        actual = destino
+        while previos[actual] is not None:
+            anterior, posicion, salida_tramo = previos[actual]
+            tramos.append({
+                'desde': self.ids[anterior],
+                'hasta': self.ids[actual],
+                'medio_transporte': self.medios[posicion],
+                'salida': salida_tramo,
+                'llegada': llegadas[actual],
+            })
+            actual = anterior
+        tramos.reverse()
+
+        return {
+            'duracion_minutos': llegadas[destino] - minuto,
+            'llegada': llegadas[destino],
+            'camino': [origen_id] + [tramo['hasta'] for tramo in tramos],
+            'tramos': tramos,
+        }
+
+    def tiempos_desde(self, origen_id, salida, medios=None):
+        """Minutos de viaje del origen a cada destino alcanzable (uno a muchos)"""
+        origen = self.indices.get(origen_id)
+        if origen is None:
+            return {}
+
+        minuto = a_minutos(salida)
+        llegadas, _ = self._dijkstra(origen, minuto, medios=medios)
+        return {self.ids[indice]: llegada - minuto for indice, llegada in llegadas.items()}
+
+    def tiempo_viaje(self, origen_id, destino_id, salida, medios=None):
+        """Minutos de viaje más rápidos, 0 si es el mismo destino, o None si no hay conexión"""
+        if origen_id == destino_id:
+            return 0.0
+        ruta = self.mas_rapida(origen_id, destino_id, salida, medios)
+        return ruta['duracion_minutos'] if ruta else None
+
+
+def construir_grafo():
+    """Rutas activas entre destinos activos (una consulta)"""
+    return GrafoTiempoDependiente(
+        Ruta.objects.filter(activo=True, origen__activo=True, destino__activo=True).order_by('id')
+    )
+
+
+_grafo = None
+_version_grafo = None
+_lock = threading.Lock()
+
+
+def obtener_grafo():
+    """Grafo del proceso; se reconstruye si cambió la versión del catálogo"""
+    global _grafo, _version_grafo
+
+    version = version_catalogo()
+    if _grafo is not None and _version_grafo == version:
+        return _grafo
+
+    with _lock:
+        if _grafo is None or _version_grafo != version:
+            _grafo = construir_grafo()
+            _version_grafo = version
+        return _grafo
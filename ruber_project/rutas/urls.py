@@ -5,4 +5,5 @@ app_name = 'rutas'
 
 urlpatterns = [
     path('mapa/', views.mapa_rutas, name='mapa_rutas'),
+    path('mapa/marcadores.json', views.marcadores_mapa, name='marcadores'),
 ]
\ No newline at end of file
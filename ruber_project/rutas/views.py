@@ -1,12 +1,26 @@
+import hashlib
 import json
+import logging
 from django.http import JsonResponse
 from django.shortcuts import render
-from django.core.serializers.json import DjangoJSONEncoder
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import etag, require_GET
 
+from lugares.catalogo import version_catalogo
+from lugares.geo import leer_caja
 from rutas.models import Destino
 from rutas.algorithms_networkx import dijkstra_networkx
+from rutas.geometria import FORMATOS, como_geojson, como_polyline
+from rutas.marcadores import ZOOM_DETALLE, marcadores
+from rutas.red_vial import huella_archivo
+from core.trazas import tramo
 
 from django.views.decorators.csrf import csrf_exempt
+
+logger = logging.getLogger('ruber.rutas')
+
+
 def extraer_param(request):
     """
     Extrae latitud, longitud y destino_id desde:
@@ -44,11 +58,28 @@ def extraer_param(request):
 
     return lat, lon, destino
 
+def _etag_ruta(request):
+    """
+    ETag de la ruta: depende de los parámetros, de la versión del
+    catálogo (destinos y rutas) y del archivo de la red vial; la página
+    del mapa no lleva ETag
+    """
+    lat, lon, destino_id = extraer_param(request)
+    if not (lat and lon and destino_id):
+        return None
+    parametros = f'{lat}|{lon}|{destino_id}|{request.GET.get("formato", "")}'
+    red = huella_archivo(settings.RED_VIAL_ARCHIVO) or 'sin-red'
+    return f'ruta-v{version_catalogo()}-{red}-{hashlib.md5(parametros.encode("utf-8")).hexdigest()}'
+
+
 @csrf_exempt
+@etag(_etag_ruta)
 def mapa_rutas(request):
     """
     Vista principal del mapa.
-    - Si llegan parámetros lat/lon/destino → calcula ruta (API)
+    - Si llegan parámetros lat/lon/destino → calcula ruta (API);
+      ?formato=polyline o ?formato=geojson para la respuesta compacta
+      (ver geometria.py)
     - Si no → renderiza la página del mapa
     """
 
@@ -67,11 +98,19 @@ def mapa_rutas(request):
                 'error': 'Parámetros no numéricos.'
             })
 
+        formato = request.GET.get('formato')
+        if formato and formato not in FORMATOS:
+            return JsonResponse({
+                'success': False,
+                'error': f'Formato no soportado (use {", ".join(FORMATOS)}).'
+            }, status=400)
+
         # Ejecutar el algoritmo
         try:
-            distancia, ruta = dijkstra_networkx(lat, lon, destino_id)
+            with tramo('rutas.dijkstra', destino=destino_id):
+                distancia, ruta = dijkstra_networkx(lat, lon, destino_id)
         except Exception as e:
-            print("Error ejecutando Dijkstra:", e)
+            logger.exception('Error ejecutando Dijkstra destino=%s', destino_id)
             return JsonResponse({
                 'success': False,
                 'error': f'Error interno: {e}'
@@ -83,6 +122,11 @@ def mapa_rutas(request):
                 'error': 'No se pudo encontrar una ruta válida.'
             })
 
+        if formato == 'polyline':
+            return JsonResponse(como_polyline(distancia, ruta))
+        if formato == 'geojson':
+            return JsonResponse(como_geojson(distancia, ruta), content_type='application/geo+json')
+
         return JsonResponse({
             'success': True,
             'distancia_km': round(distancia, 2),
@@ -92,13 +136,45 @@ def mapa_rutas(request):
     # ---------------------------
     #  Petición normal → renderizar mapa
     # ---------------------------
-    destinos = list(Destino.objects.values(
-        'id', 'nombre', 'latitud', 'longitud'
-    ))
+    # Los marcadores los pide el mapa por área visible (marcadores_mapa)
+    destinos = Destino.objects.filter(activo=True).order_by('nombre').values('id', 'nombre')
 
     context = {
         'destinos': destinos,
-        'destinos_json': json.dumps(destinos, ensure_ascii=False, cls=DjangoJSONEncoder),
     }
 
     return render(request, 'rutas/mapa_rutas.html', context)
+
+
+def _etag_marcadores(request):
+    """Los marcadores solo cambian con el catálogo"""
+    return f'marcadores-v{version_catalogo()}'
+
+
+@require_GET
+@etag(_etag_marcadores)
+def marcadores_mapa(request):
+    """
+    API JSON con los marcadores del área visible del mapa:
+    ?caja=sur,oeste,norte,este&zoom=N
+
+    En zoom bajo devuelve grupos precalculados por celda de la grilla
+    (ver marcadores.py); desde ZOOM_DETALLE, los destinos individuales
+    """
+    caja = leer_caja(request.GET.get('caja'))
+    if not caja:
+        return JsonResponse({'success': False, 'error': 'Parámetro caja inválido.'}, status=400)
+
+    try:
+        zoom = int(request.GET.get('zoom', ZOOM_DETALLE))
+    except ValueError:
+        zoom = ZOOM_DETALLE
+
+    response = JsonResponse({
+        'success': True,
+        'zoom': zoom,
+        'marcadores': marcadores(*caja, zoom),
+    })
+    # El mapa pide cajas alineadas a la grilla: al volver a un área ya vista responde el navegador
+    patch_cache_control(response, public=True, max_age=300)
+    return response
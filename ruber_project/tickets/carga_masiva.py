@@ -0,0 +1,340 @@
+from array import array
+from datetime import date, time, timedelta
+from decimal import Decimal
+import itertools
+import random
+import time as reloj
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from itinerarios.models import Itinerario, ItemItinerario, ResumenDiaItinerario
+from lugares.busqueda import reconstruir_indice
+from lugares.catalogo import incrementar_version_catalogo
+from lugares.models import Actividad, Categoria, Destino, ImagenDestino
+from rutas.ciudad_sintetica import repartir_puntos
+from usuarios.models import Turista
+
+# Preferencias que suele tener un destino de cada categoría
+TAGS_CATEGORIA = {
+    'Playas': ['playa', 'relax'],
+    'Museos': ['museos'],
+    'Gastronomía': ['gastronomia'],
+    'Aventura': ['aventura'],
+    'Vida Nocturna': ['vida_nocturna'],
+    'Naturaleza': ['naturaleza', 'relax'],
+}
+LUGARES = ['Parque', 'Museo', 'Mercado', 'Playa', 'Mirador', 'Plaza', 'Huaca', 'Galería', 'Malecón', 'Café']
+ZONAS = ['Miraflores', 'Barranco', 'San Isidro', 'Surco', 'Cercado', 'Pueblo Libre', 'Chorrillos',
+         'Magdalena', 'Lince', 'La Molina', 'San Miguel', 'Rímac']
+ESTADOS_ITINERARIO = [('borrador', 5), ('confirmado', 3), ('en_proceso', 1), ('completado', 3), ('cancelado', 1)]
+
+HORA_INICIO_DIA = 9 * 60
+HORA_FIN_DIA = 22 * 60
+TIEMPO_ENTRE_PARADAS = 30
+
+
+class CargaMasiva:
+    """
+    Genera un catálogo y una base de usuarios sintéticos de gran tamaño
+    para pruebas de carga:
+    - destinos repartidos por la ciudad (en barrios o uniformes), con
+      actividades e imágenes
+    - turistas con preferencias y presupuesto
+    - itinerarios con items y resumen por día ya calculados, visitando
+      destinos con popularidad desigual (tipo Zipf)
+
+    Todo se inserta con bulk_create por lotes, un lote por transacción.
+    Como bulk_create no dispara señales, al terminar se recalculan los
+    agregados de actividades (por lote), se reconstruye el índice de
+    búsqueda y se incrementa la versión del catálogo.
+    """
+
+    TAMANO_LOTE = 5000
+
+    def __init__(self, destinos, actividades=3.0, imagenes=2.0, usuarios=None, itinerarios=1.0,
+                 distribucion='barrios', sesgo=1.0, semilla=42, tamano_lote=None):
+        """
+        Args:
+            destinos: número de destinos a crear
+            actividades, imagenes: promedio por destino (distribución exponencial)
+            usuarios: turistas a crear (por defecto uno cada diez destinos)
+            itinerarios: promedio de itinerarios por turista
+            distribucion: 'barrios' o 'uniforme' (ubicación de los destinos)
+            sesgo: exponente de popularidad de los destinos (0 = todos iguales)
+            semilla: misma semilla, mismos datos
+        """
+        self.destinos = destinos
+        self.actividades = actividades
+        self.imagenes = imagenes
+        self.usuarios = destinos // 10 if usuarios is None else usuarios
+        self.itinerarios = itinerarios
+        self.distribucion = distribucion
+        self.sesgo = sesgo
+        self.semilla = semilla
+        self.tamano_lote = tamano_lote or self.TAMANO_LOTE
+        self.rng = random.Random(semilla)
+
+        # Destinos creados (para los itinerarios): id, costo de entrada y minutos de visita
+        self.ids_destinos = array('l')
+        self.costos_destinos = array('d')
+        self.visitas_destinos = array('l')
+
+    def ejecutar(self, progreso=None):
+        """
+        Args:
+            progreso: función opcional llamada tras cada lote con
+                (fase, filas hechas, total de la fase, segundos de la fase)
+
+        Returns:
+            dict con filas por tabla y segundos por fase
+        """
+        self.estadisticas = {'filas': dict.fromkeys(
+            ['destinos', 'actividades', 'imagenes', 'turistas', 'itinerarios', 'items', 'resumenes'], 0
+        ), 'fases': {}}
+        self.progreso = progreso
+
+        self._fase('destinos', self._cargar_destinos)
+        self._fase('turistas', self._cargar_turistas)
+        self._fase('itinerarios', self._cargar_itinerarios)
+        self._fase('indices', self._finalizar)
+        return self.estadisticas
+
+    def _fase(self, nombre, funcion):
+        inicio = reloj.perf_counter()
+        self._inicio_fase = inicio
+        funcion()
+        self.estadisticas['fases'][nombre] = reloj.perf_counter() - inicio
+
+    def _avisar(self, fase, hechos, total):
+        if self.progreso:
+            self.progreso(fase, hechos, total, reloj.perf_counter() - self._inicio_fase)
+
+    def _cantidad(self, media, maximo):
+        """Entero con promedio ~media y cola larga (algunos destinos con muchas)"""
+        if media <= 0:
+            return 0
+        return min(int(self.rng.expovariate(1 / media) + 0.5), maximo)
+
+    def _decimal(self, valor):
+        return Decimal(f'{valor:.2f}')
+
+    # ----- Destinos, actividades e imágenes -----
+
+    def _cargar_destinos(self):
+        categorias = list(Categoria.objects.all())
+        preferencias = [clave for clave, _ in Turista.PREFERENCIAS_CHOICES]
+        barrios = 0 if self.distribucion == 'uniforme' else None
+        puntos = repartir_puntos(self.rng, self.destinos, barrios=barrios)
+
+        creados = 0
+        while creados < self.destinos:
+            lote = list(itertools.islice(puntos, self.tamano_lote))
+            destinos = [self._destino(creados + i, lat, lng, categorias, preferencias)
+                        for i, (lat, lng) in enumerate(lote)]
+
+            with transaction.atomic():
+                Destino.objects.bulk_create(destinos)
+                actividades, imagenes = [], []
+                for destino in destinos:
+                    actividades.extend(self._actividades(destino))
+                    imagenes.extend(self._imagenes(destino))
+                Actividad.objects.bulk_create(actividades)
+                ImagenDestino.objects.bulk_create(imagenes)
+                # Los ids de un bulk_create son crecientes: basta el rango
+                Destino.recalcular_actividades_masivo(
+                    Destino.objects.filter(id__gte=destinos[0].id, id__lte=destinos[-1].id)
+                )
+
+            for destino in destinos:
+                self.ids_destinos.append(destino.id)
+                self.costos_destinos.append(float(destino.costo_entrada))
+                self.visitas_destinos.append(destino.tiempo_visita_estimado)
+
+            creados += len(destinos)
+            filas = self.estadisticas['filas']
+            filas['destinos'] += len(destinos)
+            filas['actividades'] += len(actividades)
+            filas['imagenes'] += len(imagenes)
+            self._avisar('destinos', creados, self.destinos)
+
+    def _destino(self, numero, lat, lng, categorias, preferencias):
+        rng = self.rng
+        categoria = rng.choice(categorias) if categorias else None
+        tags = list(TAGS_CATEGORIA.get(categoria.nombre, []) if categoria else [])
+        if rng.random() < 0.4:
+            tags.append(rng.choice(preferencias))
+        lugar, zona = rng.choice(LUGARES), rng.choice(ZONAS)
+
+        return Destino(
+            nombre=f'{lugar} {zona} {numero + 1}',
+            descripcion=f'{lugar} en {zona}. Destino sintético de la carga masiva (semilla {self.semilla}).',
+            categoria=categoria,
+            latitud=Decimal(f'{lat:.6f}'),
+            longitud=Decimal(f'{lng:.6f}'),
+            direccion=f'Av. {rng.choice(ZONAS)} {rng.randint(100, 2999)}, {zona}',
+            # La mitad es gratis; el resto con cola larga de precios
+            costo_entrada=Decimal('0.00') if rng.random() < 0.5 else self._decimal(min(rng.lognormvariate(2.5, 0.8), 500)),
+            tiempo_visita_estimado=rng.choice([30, 45, 60, 90, 120, 180]),
+            calificacion=Decimal(f'{rng.triangular(2.5, 5.0, 4.3):.1f}'),
+            tags_preferencias=sorted(set(tags)),
+            imagen_principal=f'https://picsum.photos/seed/ruber-{self.semilla}-{numero}/800/600',
+        )
+
+    def _actividades(self, destino):
+        rng = self.rng
+        tipos = Actividad.TIPO_CHOICES
+        for numero in range(self._cantidad(self.actividades, 30)):
+            tipo, nombre = rng.choice(tipos)
+            yield Actividad(
+                destino=destino,
+                nombre=f'{nombre} {numero + 1}',
+                tipo=tipo,
+                descripcion=f'{nombre} en {destino.nombre}',
+                costo=self._decimal(rng.choice([0, 10, 15, 20, 25, 30, 50, 80, 120])),
+                duracion_minutos=rng.choice([30, 45, 60, 90, 120, 180]),
+                disponible=rng.random() < 0.9,
+            )
+
+    def _imagenes(self, destino):
+        for orden in range(self._cantidad(self.imagenes, 12)):
+            yield ImagenDestino(
+                destino=destino,
+                imagen=f'https://picsum.photos/seed/ruber-{destino.id}-{orden}/800/600',
+                descripcion=f'{destino.nombre} ({orden + 1})',
+                orden=orden,
+            )
+
+    # ----- Turistas -----
+
+    def _cargar_turistas(self):
+        rng = self.rng
+        preferencias = [clave for clave, _ in Turista.PREFERENCIAS_CHOICES]
+        # Una sola contraseña para todos: hashear cada una tardaría más que la carga entera
+        password = make_password('turista123')
+        base = (Turista.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0) + 1
+
+        creados = 0
+        self.ids_turistas = array('l')
+        while creados < self.usuarios:
+            cantidad = min(self.tamano_lote, self.usuarios - creados)
+            turistas = []
+            for numero in range(base + creados, base + creados + cantidad):
+                turistas.append(Turista(
+                    username=f'carga{numero}',
+                    email=f'carga{numero}@ejemplo.com',
+                    password=password,
+                    first_name=f'Turista {numero}',
+                    preferencias=rng.sample(preferencias, rng.randint(0, 3)),
+                    presupuesto_max=self._decimal(rng.choice([100, 200, 300, 500, 1000])) if rng.random() < 0.7 else None,
+                    tiempo_disponible_dias=rng.randint(1, 7),
+                ))
+
+            with transaction.atomic():
+                Turista.objects.bulk_create(turistas)
+
+            self.ids_turistas.extend(turista.id for turista in turistas)
+            creados += cantidad
+            self.estadisticas['filas']['turistas'] += cantidad
+            self._avisar('turistas', creados, self.usuarios)
+
+    # ----- Itinerarios -----
+
+    def _cargar_itinerarios(self):
+        if not self.ids_destinos or not self.ids_turistas:
+            return
+
+        # Popularidad tipo Zipf sobre un orden al azar de los destinos
+        pesos = [1 / (rango + 1) ** self.sesgo for rango in range(len(self.ids_destinos))]
+        self.rng.shuffle(pesos)
+        self.acumulados = list(itertools.accumulate(pesos))
+        del pesos
+
+        hechos = 0
+        total = len(self.ids_turistas)
+        for inicio in range(0, total, self.tamano_lote):
+            planes = []
+            for turista_id in self.ids_turistas[inicio:inicio + self.tamano_lote]:
+                for _ in range(self._cantidad(self.itinerarios, 10)):
+                    planes.append(self._plan(turista_id))
+
+            with transaction.atomic():
+                itinerarios = Itinerario.objects.bulk_create([itinerario for itinerario, _, _ in planes])
+                items, resumenes = [], []
+                for itinerario, items_plan, resumenes_plan in planes:
+                    for item in items_plan:
+                        item.itinerario_id = itinerario.id
+                    for resumen in resumenes_plan:
+                        resumen.itinerario_id = itinerario.id
+                    items.extend(items_plan)
+                    resumenes.extend(resumenes_plan)
+                ItemItinerario.objects.bulk_create(items)
+                ResumenDiaItinerario.objects.bulk_create(resumenes)
+
+            hechos = min(inicio + self.tamano_lote, total)
+            filas = self.estadisticas['filas']
+            filas['itinerarios'] += len(itinerarios)
+            filas['items'] += len(items)
+            filas['resumenes'] += len(resumenes)
+            self._avisar('itinerarios', hechos, total)
+
+    def _plan(self, turista_id):
+        """Itinerario con sus items y resumen por día (totales coherentes, como calcular_totales)"""
+        rng = self.rng
+        dias = rng.randint(1, 3)
+        fecha_inicio = date.today() + timedelta(days=rng.randint(-180, 180))
+
+        items, resumenes = [], []
+        destinos_visitados = set()
+        orden = 0
+        for dia in range(1, dias + 1):
+            minuto = HORA_INICIO_DIA
+            costo_dia, tiempo_dia, items_dia = Decimal('0.00'), 0, 0
+            paradas = rng.choices(range(len(self.ids_destinos)), cum_weights=self.acumulados, k=rng.randint(2, 5))
+            for posicion in paradas:
+                visita = self.visitas_destinos[posicion]
+                if minuto + visita > HORA_FIN_DIA:
+                    break
+                hora_inicio, hora_fin = self._hora(minuto), self._hora(minuto + visita)
+                costo = self._decimal(self.costos_destinos[posicion])
+                duracion = ItemItinerario.calcular_duracion(hora_inicio, hora_fin)
+
+                orden += 1
+                items.append(ItemItinerario(
+                    destino_id=self.ids_destinos[posicion], orden=orden, dia=dia,
+                    hora_inicio=hora_inicio, hora_fin=hora_fin, costo=costo, duracion_minutos=duracion,
+                ))
+                destinos_visitados.add(self.ids_destinos[posicion])
+                costo_dia += costo
+                tiempo_dia += duracion
+                items_dia += 1
+                minuto += visita + TIEMPO_ENTRE_PARADAS
+
+            if items_dia:
+                resumenes.append(ResumenDiaItinerario(
+                    dia=dia, num_actividades=items_dia, costo=costo_dia, tiempo_minutos=tiempo_dia,
+                ))
+
+        itinerario = Itinerario(
+            turista_id=turista_id,
+            nombre=f'Plan de {dias} día{"s" if dias > 1 else ""}',
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_inicio + timedelta(days=dias - 1),
+            costo_total=sum((item.costo for item in items), Decimal('0.00')),
+            tiempo_total_minutos=sum(item.duracion_minutos for item in items),
+            distancia_total_km=Itinerario.estimar_distancia(len(destinos_visitados)),
+            estado=rng.choices([estado for estado, _ in ESTADOS_ITINERARIO],
+                               weights=[peso for _, peso in ESTADOS_ITINERARIO])[0],
+        )
+        return itinerario, items, resumenes
+
+    @staticmethod
+    def _hora(minutos):
+        return time(minutos // 60, minutos % 60)
+
+    # ----- Después de la carga -----
+
+    def _finalizar(self):
+        # bulk_create no dispara señales: índice de búsqueda y cachés del catálogo
+        reconstruir_indice()
+        incrementar_version_catalogo()
@@ -1,12 +1,36 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from lugares.models import Categoria, Destino, Actividad
 from rutas.models import Ruta
+from tickets.carga_masiva import CargaMasiva
 from decimal import Decimal
 
 class Command(BaseCommand):
-    help = 'Poblar base de datos con datos de prueba de Lima'
+    help = (
+        'Poblar base de datos con datos de prueba de Lima; con --escala genera '
+        'un catálogo sintético grande (destinos, actividades, imágenes, turistas e itinerarios)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=int,
+                            help='Destinos sintéticos a generar (p. ej. 10000 a 1000000)')
+        parser.add_argument('--actividades', type=float, default=3.0, help='Actividades promedio por destino')
+        parser.add_argument('--imagenes', type=float, default=2.0, help='Imágenes promedio por destino')
+        parser.add_argument('--usuarios', type=int, help='Turistas a crear (por defecto escala / 10)')
+        parser.add_argument('--itinerarios', type=float, default=1.0, help='Itinerarios promedio por turista')
+        parser.add_argument('--distribucion', choices=['barrios', 'uniforme'], default='barrios',
+                            help='Ubicación de los destinos en la ciudad')
+        parser.add_argument('--sesgo', type=float, default=1.0,
+                            help='Exponente de popularidad de los destinos en los itinerarios (0 = uniforme)')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=CargaMasiva.TAMANO_LOTE,
+                            help='Filas por lote (una transacción por lote)')
+
+    def handle(self, *args, **options):
+        if options['escala'] is not None and options['escala'] < 1:
+            raise CommandError('--escala debe ser al menos 1')
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser al menos 1')
 
-    def handle(self, *args, **kwargs):
         self.stdout.write('🚀 Iniciando carga de datos de prueba...')
         
         # ===== CREAR CATEGORÍAS =====
@@ -20,23 +44,28 @@ class Command(BaseCommand):
             {'nombre': 'Naturaleza', 'icono': 'fas fa-tree', 'descripcion': 'Parques y naturaleza'},
         ]
         
+        categorias = {}
         for cat_data in categorias_data:
             cat, created = Categoria.objects.get_or_create(
                 nombre=cat_data['nombre'],
                 defaults=cat_data
             )
+            categorias[cat.nombre] = cat
             if created:
                 self.stdout.write(f'  ✓ {cat.nombre}')
         
+        if options['escala']:
+            self._carga_masiva(options)
+            return
+        
         # ===== CREAR DESTINOS =====
         self.stdout.write('📍 Creando destinos turísticos...')
         
-        # Obtener categorías
-        playa_cat = Categoria.objects.get(nombre='Playas')
-        museo_cat = Categoria.objects.get(nombre='Museos')
-        gastro_cat = Categoria.objects.get(nombre='Gastronomía')
-        aventura_cat = Categoria.objects.get(nombre='Aventura')
-        naturaleza_cat = Categoria.objects.get(nombre='Naturaleza')
+        playa_cat = categorias['Playas']
+        museo_cat = categorias['Museos']
+        gastro_cat = categorias['Gastronomía']
+        aventura_cat = categorias['Aventura']
+        naturaleza_cat = categorias['Naturaleza']
         
         destinos_data = [
             {
@@ -113,22 +142,22 @@ class Command(BaseCommand):
             },
         ]
         
-        destinos_creados = []
+        destinos_creados = {}
         for dest_data in destinos_data:
             destino, created = Destino.objects.get_or_create(
                 nombre=dest_data['nombre'],
                 defaults=dest_data
             )
-            destinos_creados.append(destino)
+            destinos_creados[destino.nombre] = destino
             if created:
                 self.stdout.write(f'  ✓ {destino.nombre}')
         
         # ===== CREAR ACTIVIDADES =====
         self.stdout.write(' Creando actividades...')
         
-        playa_costa_verde = Destino.objects.get(nombre='Playa Costa Verde')
-        museo_larco = Destino.objects.get(nombre='Museo Larco')
-        mercado = Destino.objects.get(nombre='Mercado de Surquillo')
+        playa_costa_verde = destinos_creados['Playa Costa Verde']
+        museo_larco = destinos_creados['Museo Larco']
+        mercado = destinos_creados['Mercado de Surquillo']
         
         actividades_data = [
             {
@@ -210,4 +239,41 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'   📊 {Categoria.objects.count()} categorías'))
         self.stdout.write(self.style.SUCCESS(f'   📍 {Destino.objects.count()} destinos'))
         self.stdout.write(self.style.SUCCESS(f'   🎯 {Actividad.objects.count()} actividades'))
-        self.stdout.write(self.style.SUCCESS(f'   🛣️ {Ruta.objects.count()} rutas'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'   🛣️ {Ruta.objects.count()} rutas'))
+    
+    def _carga_masiva(self, options):
+        carga = CargaMasiva(
+            options['escala'],
+            actividades=options['actividades'],
+            imagenes=options['imagenes'],
+            usuarios=options['usuarios'],
+            itinerarios=options['itinerarios'],
+            distribucion=options['distribucion'],
+            sesgo=options['sesgo'],
+            semilla=options['semilla'],
+            tamano_lote=options['lote'],
+        )
+        self.stdout.write(
+            f'🏙️ Carga masiva: {carga.destinos} destinos ({carga.distribucion}), {carga.usuarios} turistas, '
+            f'semilla {carga.semilla}, lotes de {carga.tamano_lote}'
+        )
+        estadisticas = carga.ejecutar(progreso=self._mostrar_progreso)
+        
+        filas, fases = estadisticas['filas'], estadisticas['fases']
+        total_filas = sum(filas.values())
+        total_segundos = sum(fases.values()) or 1e-9
+        
+        self.stdout.write(self.style.SUCCESS('\n✅ ¡Carga masiva completada!'))
+        for tabla, cantidad in filas.items():
+            self.stdout.write(self.style.SUCCESS(f'   {tabla:<12} {cantidad:>10}'))
+        for fase, segundos in fases.items():
+            self.stdout.write(f'   ⏱️ {fase:<12} {segundos:>8.2f} s')
+        self.stdout.write(self.style.SUCCESS(
+            f'   📊 {total_filas} filas en {total_segundos:.2f} s ({total_filas / total_segundos:.0f} filas/s)'
+        ))
+    
+    def _mostrar_progreso(self, fase, hechos, total, segundos):
+        self.stdout.write(
+            f'  ✓ {fase}: {hechos}/{total} ({100 * hechos / (total or 1):.0f}%) · '
+            f'{hechos / (segundos or 1e-9):.0f}/s'
+        )
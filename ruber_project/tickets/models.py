@@ -48,12 +48,3 @@ class Ticket(models.Model):
         TODO: Marcar ticket como usado
         """
         pass
-
-
-print("✅ Modelos creados para todas las apps")
-print("\n📝 Incluye:")
-print("   - usuarios.Turista (usuario con preferencias)")
-print("   - lugares.Destino, Categoria, Actividad, ImagenDestino")
-print("   - rutas.Ruta (grafo de conexiones)")
-print("   - itinerarios.Itinerario, ItemItinerario")
-print("   - tickets.Ticket (con QR)")
\ No newline at end of file
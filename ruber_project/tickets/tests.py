@@ -1,3 +1,61 @@
+from unittest import skipUnless
+from django.db import connection
 from django.test import TestCase
+from itinerarios.models import Itinerario, ItemItinerario, ResumenDiaItinerario
+from lugares.busqueda import buscar_ids
+from lugares.models import Actividad, Categoria, Destino, ImagenDestino
+from usuarios.models import Turista
+from .carga_masiva import TAGS_CATEGORIA, CargaMasiva
 
-# Create your tests here.
+
+class CargaMasivaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for nombre in TAGS_CATEGORIA:
+            Categoria.objects.create(nombre=nombre)
+        # Lotes de 20 sobre 50 destinos: el último queda incompleto
+        cls.estadisticas = CargaMasiva(
+            destinos=50, usuarios=8, itinerarios=2.0, tamano_lote=20, semilla=3,
+        ).ejecutar()
+
+    def test_filas_reportadas(self):
+        filas = self.estadisticas['filas']
+        self.assertEqual(filas['destinos'], Destino.objects.count())
+        self.assertEqual(filas['destinos'], 50)
+        self.assertEqual(filas['actividades'], Actividad.objects.count())
+        self.assertEqual(filas['imagenes'], ImagenDestino.objects.count())
+        self.assertEqual(filas['turistas'], Turista.objects.count())
+        self.assertEqual(filas['itinerarios'], Itinerario.objects.count())
+        self.assertEqual(filas['items'], ItemItinerario.objects.count())
+        self.assertEqual(filas['resumenes'], ResumenDiaItinerario.objects.count())
+        self.assertTrue(filas['itinerarios'])
+        self.assertEqual(set(self.estadisticas['fases']), {'destinos', 'turistas', 'itinerarios', 'indices'})
+
+    def test_agregados_de_actividades(self):
+        campos = ['num_actividades', 'costo_minimo_actividad', 'actividad_minima_id',
+                  'costo_total_actividades', 'duracion_total_actividades']
+        for destino in Destino.objects.all():
+            self.assertEqual(
+                {campo: getattr(destino, campo) for campo in campos},
+                Destino.agregados_actividades(destino.id),
+                destino.nombre,
+            )
+
+    def test_totales_como_calcular_totales(self):
+        for itinerario in Itinerario.objects.all():
+            cargado = (
+                itinerario.costo_total, itinerario.tiempo_total_minutos, itinerario.distancia_total_km,
+                list(itinerario.resumen_dias.values_list('dia', 'num_actividades', 'costo', 'tiempo_minutos')),
+            )
+            itinerario.calcular_totales()
+            itinerario.refresh_from_db()
+            self.assertEqual(cargado, (
+                itinerario.costo_total, itinerario.tiempo_total_minutos, itinerario.distancia_total_km,
+                list(itinerario.resumen_dias.values_list('dia', 'num_actividades', 'costo', 'tiempo_minutos')),
+            ))
+
+    @skipUnless(connection.vendor == 'sqlite', 'La búsqueda de texto completo usa FTS5 de SQLite')
+    def test_indice_de_busqueda_reconstruido(self):
+        for destino in Destino.objects.order_by('id')[::10]:
+            self.assertIn(destino.id, buscar_ids(destino.nombre))